@@ -0,0 +1,168 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+import redis
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from backend import celery_config
+from backend.db.database import TransferJob
+from backend.tasks.transfer_tasks import INTERACTIVE_MAX_ITEMS
+
+# Items of running jobs still to be processed, across all jobs
+ADMISSION_MAX_OUTSTANDING_ITEMS = int(
+    os.getenv("ADMISSION_MAX_OUTSTANDING_ITEMS", "2000000")
+)
+ADMISSION_MAX_JOB_ITEMS = int(os.getenv("ADMISSION_MAX_JOB_ITEMS", "1000000"))
+ADMISSION_MAX_ACTIVE_JOBS = int(os.getenv("ADMISSION_MAX_ACTIVE_JOBS", "50"))
+# Messages waiting in the bulk queue
+ADMISSION_MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "20000"))
+ADMISSION_MAX_DB_ACTIVE_CONNECTIONS = int(
+    os.getenv("ADMISSION_MAX_DB_ACTIVE_CONNECTIONS", "80")
+)
+# "reject" answers 429 with Retry-After; "defer" creates the job and starts it later
+ADMISSION_OVERLOAD_ACTION = os.getenv("ADMISSION_OVERLOAD_ACTION", "reject")
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "30"))
+
+OVERLOAD_ACTIONS = ("reject", "defer")
+
+# pg_advisory_xact_lock key serializing admission decisions across processes
+ADMISSION_LOCK_KEY = 72_410_025
+
+_broker_redis: Optional[redis.Redis] = None
+
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    reason: Optional[str] = None
+    # False when the job could never be admitted, however long it waits
+    retryable: bool = True
+
+
+def _get_broker_redis() -> redis.Redis:
+    global _broker_redis
+    if _broker_redis is None:
+        _broker_redis = redis.Redis.from_url(
+            celery_config.broker_url, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+    return _broker_redis
+
+
+def queue_depth(queue: str) -> Optional[int]:
+    """Messages waiting in a queue over all its priority lists; None if unknown"""
+    options = celery_config.broker_transport_options
+    keys = [queue] + [
+        f"{queue}{options['sep']}{step}" for step in options["priority_steps"] if step
+    ]
+    try:
+        pipeline = _get_broker_redis().pipeline(transaction=False)
+        for key in keys:
+            pipeline.llen(key)
+        return sum(pipeline.execute())
+    except redis.RedisError as e:
+        print(f"Queue depth unavailable for {queue}: {e}")
+        return None
+
+
+def utilization(db: Session) -> dict[str, Any]:
+    """Current load next to the admission limits"""
+    active_jobs, outstanding_items = db.execute(
+        select(
+            func.count(),
+            func.coalesce(
+                func.sum(TransferJob.pending_count + TransferJob.processing_count), 0
+            ),
+        ).where(TransferJob.finished_at.is_(None), TransferJob.deferred_at.is_(None))
+    ).one()
+    deferred_jobs = deferred_ahead(db)
+    db_active_connections = db.scalar(
+        text(
+            "SELECT count(*) FROM pg_stat_activity "
+            "WHERE state = 'active' AND datname = current_database()"
+        )
+    )
+    queues = {
+        queue: queue_depth(queue)
+        for queue in (celery_config.INTERACTIVE_QUEUE, celery_config.BULK_QUEUE)
+    }
+
+    return {
+        "outstanding_items": int(outstanding_items),
+        "active_jobs": active_jobs,
+        "deferred_jobs": deferred_jobs,
+        "queue_depth": queues,
+        "db_active_connections": db_active_connections,
+        "limits": {
+            "max_outstanding_items": ADMISSION_MAX_OUTSTANDING_ITEMS,
+            "max_job_items": ADMISSION_MAX_JOB_ITEMS,
+            "max_active_jobs": ADMISSION_MAX_ACTIVE_JOBS,
+            "max_queue_depth": ADMISSION_MAX_QUEUE_DEPTH,
+            "max_db_active_connections": ADMISSION_MAX_DB_ACTIVE_CONNECTIONS,
+            # Interactive-sized jobs skip every limit but max_job_items
+            "exempt_max_items": INTERACTIVE_MAX_ITEMS,
+        },
+        "overload_action": ADMISSION_OVERLOAD_ACTION,
+    }
+
+
+def deferred_ahead(db: Session, deferred_at: Optional[datetime] = None) -> int:
+    """Deferred jobs still waiting that were deferred before `deferred_at`"""
+    query = select(func.count()).where(
+        TransferJob.finished_at.is_(None), TransferJob.deferred_at.is_not(None)
+    )
+    if deferred_at is not None:
+        query = query.where(TransferJob.deferred_at < deferred_at)
+    return db.scalar(query)
+
+
+def check(
+    db: Session, item_count: int, deferred_at: Optional[datetime] = None
+) -> AdmissionDecision:
+    """
+    Whether a job of `item_count` items may start now. `deferred_at` is set
+    when re-checking a deferred job, which then only waits for older ones.
+
+    Takes a transaction-level lock that is held until the caller commits, so
+    create or admit the job in the same transaction: two checks can then never
+    both admit against the same spare capacity.
+    """
+    if ADMISSION_OVERLOAD_ACTION not in OVERLOAD_ACTIONS:
+        raise ValueError(
+            f"Unsupported ADMISSION_OVERLOAD_ACTION: {ADMISSION_OVERLOAD_ACTION}"
+        )
+
+    if item_count > ADMISSION_MAX_JOB_ITEMS:
+        return AdmissionDecision(
+            False,
+            f"Job of {item_count} items exceeds the limit of {ADMISSION_MAX_JOB_ITEMS}",
+            retryable=False,
+        )
+    # Small jobs run on the reserved interactive workers, so they never wait
+    if item_count <= INTERACTIVE_MAX_ITEMS:
+        return AdmissionDecision(True)
+
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADMISSION_LOCK_KEY})
+    # Deferred jobs start in the order they were deferred
+    waiting = deferred_ahead(db, deferred_at)
+    if waiting:
+        return AdmissionDecision(
+            False, f"Transfers are at capacity: {waiting} older jobs are waiting"
+        )
+
+    usage = utilization(db)
+    bulk_depth = usage["queue_depth"][celery_config.BULK_QUEUE]
+    if usage["outstanding_items"] + item_count > ADMISSION_MAX_OUTSTANDING_ITEMS:
+        reason = f"{usage['outstanding_items']} items already outstanding"
+    elif usage["active_jobs"] >= ADMISSION_MAX_ACTIVE_JOBS:
+        reason = f"{usage['active_jobs']} jobs already running"
+    elif bulk_depth is not None and bulk_depth >= ADMISSION_MAX_QUEUE_DEPTH:
+        reason = f"{bulk_depth} tasks already queued"
+    elif usage["db_active_connections"] >= ADMISSION_MAX_DB_ACTIVE_CONNECTIONS:
+        reason = f"{usage['db_active_connections']} active database connections"
+    else:
+        return AdmissionDecision(True)
+
+    return AdmissionDecision(False, f"Transfers are at capacity: {reason}")
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Iterable, Optional, Union
+
+import redis
+import redis.asyncio
+
+# Redis for job state (cancel flags, task ids, scheduler, events), which must
+# never be evicted; defaults to the Celery broker
+STATE_REDIS_URL = os.getenv(
+    "STATE_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+)
+# Redis for cached pages and the version counters tagging them. Give it its own
+# instance with volatile-lru: only pages expire, so only pages are evicted
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", STATE_REDIS_URL)
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() in ("1", "true")
+# Entries of an older collection version are never read again, this just frees them
+PAGE_CACHE_TTL_SECONDS = int(os.getenv("PAGE_CACHE_TTL_SECONDS", "300"))
+# How long a job's cancel flag and batch task ids are kept
+JOB_STATE_TTL_SECONDS = int(os.getenv("JOB_STATE_TTL_SECONDS", "86400"))
+# Keep a slow or missing Redis from holding up requests
+CACHE_REDIS_TIMEOUT_SECONDS = float(os.getenv("CACHE_REDIS_TIMEOUT_SECONDS", "0.5"))
+
+CACHE_EPOCH_KEY = "cache_epoch"
+
+CollectionScope = Union[uuid.UUID, str]
+
+_redis: Optional[redis.Redis] = None
+_async_redis: Optional[redis.asyncio.Redis] = None
+_cache_redis: Optional[redis.Redis] = None
+_async_cache_redis: Optional[redis.asyncio.Redis] = None
+
+
+def _connect(url: str, client_class=redis.Redis):
+    return client_class.from_url(
+        url,
+        socket_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+        socket_connect_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+    )
+
+
+def get_redis() -> redis.Redis:
+    """Job state Redis"""
+    global _redis
+    if _redis is None:
+        _redis = _connect(STATE_REDIS_URL)
+    return _redis
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = _connect(STATE_REDIS_URL, redis.asyncio.Redis)
+    return _async_redis
+
+
+def get_cache_redis() -> redis.Redis:
+    """Page cache and version counter Redis"""
+    global _cache_redis
+    if _cache_redis is None:
+        _cache_redis = _connect(CACHE_REDIS_URL)
+    return _cache_redis
+
+
+def get_async_cache_redis() -> redis.asyncio.Redis:
+    global _async_cache_redis
+    if _async_cache_redis is None:
+        _async_cache_redis = _connect(CACHE_REDIS_URL, redis.asyncio.Redis)
+    return _async_cache_redis
+
+
+def collection_version_key(scope: CollectionScope) -> str:
+    return f"collection_version:{scope}"
+
+
+def transfer_job_version_key(job_id: Union[uuid.UUID, str]) -> str:
+    return f"transfer_job_version:{job_id}"
+
+
+def _new_epoch() -> str:
+    return uuid.uuid4().hex
+
+
+def _bump_versions(keys: list[str]):
+    client = get_cache_redis()
+    try:
+        pipeline = client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        # Counters start at 1 when first read, so 1 here means the key was gone
+        if 1 in pipeline.execute():
+            client.set(CACHE_EPOCH_KEY, _new_epoch())
+    except redis.RedisError as e:
+        print(f"Failed to bump versions {keys}: {e}")
+
+
+def bump_collection_versions(*scopes: Optional[CollectionScope]):
+    """
+    Invalidate every cached page that depends on these collections.
+    Call after the write has committed.
+    """
+    keys = [collection_version_key(scope) for scope in scopes if scope is not None]
+    if keys:
+        _bump_versions(keys)
+
+
+def bump_transfer_job_versions(*job_ids: uuid.UUID):
+    """Mark these jobs as changed"""
+    if job_ids:
+        _bump_versions([transfer_job_version_key(job_id) for job_id in job_ids])
+
+
+async def version_tag(keys: Iterable[str], params: dict[str, Any]) -> Optional[str]:
+    """
+    Digest of the version counters a response is built from plus its parameters.
+    Returns None when Redis is unreachable.
+    """
+    keys = sorted(set(keys))
+    client = get_async_cache_redis()
+    try:
+        epoch, *values = await client.mget([CACHE_EPOCH_KEY, *keys])
+        missing = [key for key, value in zip(keys, values) if value is None]
+        if epoch is None or missing:
+            # A counter that is gone (evicted, or a fresh Redis) restarts low,
+            # where an old tag could match it again: start a new epoch
+            pipeline = client.pipeline(transaction=False)
+            for key in missing:
+                pipeline.set(key, 1, nx=True)
+            pipeline.set(CACHE_EPOCH_KEY, _new_epoch())
+            await pipeline.execute()
+            epoch, *values = await client.mget([CACHE_EPOCH_KEY, *keys])
+    except redis.RedisError as e:
+        print(f"Version counters unavailable: {e}")
+        return None
+
+    fingerprint = json.dumps(
+        {
+            "epoch": (epoch or b"").decode(),
+            "versions": dict(zip(keys, (int(value or 0) for value in values))),
+            "params": params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+async def collection_page_tag(
+    scope: CollectionScope,
+    dependencies: Iterable[CollectionScope],
+    params: dict[str, Any],
+) -> Optional[str]:
+    """
+    Version tag of a page of `scope` that also reads `dependencies` (liked
+    flags, memberships). Any of their version bumps changes the tag.
+    """
+    keys = [collection_version_key(s) for s in (scope, *dependencies)]
+    return await version_tag(keys, {"scope": str(scope), **params})
+
+
+def job_events_channel(job_id: Union[uuid.UUID, str]) -> str:
+    return f"transfer_job_events:{job_id}"
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def publish_job_event(job_id: uuid.UUID, event_type: str, data: dict[str, Any]):
+    """Push an event to the job's live subscribers; nothing is kept for later"""
+    try:
+        get_redis().publish(
+            job_events_channel(job_id),
+            json.dumps({"type": event_type, **data}, default=_json_default),
+        )
+    except redis.RedisError as e:
+        print(f"Failed to publish {event_type} event for job {job_id}: {e}")
+
+
+def job_cancel_key(job_id: Union[uuid.UUID, str]) -> str:
+    return f"transfer_job_cancelled:{job_id}"
+
+
+def job_tasks_key(job_id: Union[uuid.UUID, str]) -> str:
+    return f"transfer_job_tasks:{job_id}"
+
+
+def set_job_cancelled(job_id: Union[uuid.UUID, str]):
+    """Flag the job so workers stop picking up its batches"""
+    try:
+        get_redis().set(job_cancel_key(job_id), 1, ex=JOB_STATE_TTL_SECONDS)
+    except redis.RedisError as e:
+        print(f"Failed to flag job {job_id} as cancelled: {e}")
+
+
+def is_job_cancelled(job_id: Union[uuid.UUID, str]) -> bool:
+    """
+    Fast check for workers between chunks. False when Redis is unreachable;
+    cancelled items are still skipped through their is_cancelled column.
+    """
+    try:
+        return bool(get_redis().exists(job_cancel_key(job_id)))
+    except redis.RedisError as e:
+        print(f"Cancel flag unavailable for job {job_id}: {e}")
+        return False
+
+
+def add_job_task_ids(job_id: Union[uuid.UUID, str], task_ids: Iterable[str]):
+    """Remember queued batch tasks so a cancel can revoke them"""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.sadd(job_tasks_key(job_id), *task_ids)
+        pipeline.expire(job_tasks_key(job_id), JOB_STATE_TTL_SECONDS)
+        pipeline.execute()
+    except redis.RedisError as e:
+        print(f"Failed to record batch tasks for job {job_id}: {e}")
+
+
+def pop_job_task_ids(job_id: Union[uuid.UUID, str]) -> list[str]:
+    try:
+        pipeline = get_redis().pipeline()
+        pipeline.smembers(job_tasks_key(job_id))
+        pipeline.delete(job_tasks_key(job_id))
+        task_ids, _ = pipeline.execute()
+    except redis.RedisError as e:
+        print(f"Batch tasks unavailable for job {job_id}: {e}")
+        return []
+    return [task_id.decode() for task_id in task_ids]
+
+
+def _page_key(scope: CollectionScope, tag: str) -> str:
+    return f"collection_page:{scope}:{tag}"
+
+
+async def get_page(scope: CollectionScope, tag: Optional[str]) -> Optional[str]:
+    if not PAGE_CACHE_ENABLED or tag is None:
+        return None
+    try:
+        cached = await get_async_cache_redis().get(_page_key(scope, tag))
+    except redis.RedisError as e:
+        print(f"Page cache read failed: {e}")
+        return None
+    return cached.decode() if cached is not None else None
+
+
+async def set_page(scope: CollectionScope, tag: Optional[str], payload: str):
+    if not PAGE_CACHE_ENABLED or tag is None:
+        return
+    try:
+        await get_async_cache_redis().set(
+            _page_key(scope, tag), payload, ex=PAGE_CACHE_TTL_SECONDS
+        )
+    except redis.RedisError as e:
+        print(f"Page cache write failed: {e}")
@@ -18,5 +18,8 @@ celery_app.autodiscover_tasks(["backend.tasks"])
 # Explicitly import transfer tasks to ensure they're registered
 import backend.tasks.transfer_tasks  # noqa: F401
 
+# Per-process engine setup and warm-up for prefork workers
+import backend.worker_lifecycle  # noqa: E402, F401
+
 if __name__ == "__main__":
     celery_app.start()
@@ -1,5 +1,7 @@
 import os
 
+from kombu import Queue
+
 # Celery Configuration
 broker_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 result_backend = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
@@ -9,6 +11,27 @@ task_serializer = "json"
 result_serializer = "json"
 accept_content = ["json"]
 
+# Queues: small jobs go to the interactive queue so they never wait behind the
+# batches of a bulk move; dedicated workers consume only the interactive queue
+INTERACTIVE_QUEUE = os.getenv("CELERY_INTERACTIVE_QUEUE", "interactive")
+BULK_QUEUE = os.getenv("CELERY_BULK_QUEUE", "bulk")
+
+task_default_queue = INTERACTIVE_QUEUE
+task_queues = (Queue(INTERACTIVE_QUEUE), Queue(BULK_QUEUE))
+task_routes = {
+    "backend.tasks.transfer_tasks.process_bulk_transfer_job": {"queue": BULK_QUEUE},
+    "backend.tasks.transfer_tasks.cleanup_old_transfers": {"queue": BULK_QUEUE},
+}
+
+# Redis emulates priorities with a list per step (0 is served first), and a
+# worker on several queues drains them in the order given to -Q
+broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+task_default_priority = 5
+
 # Task execution settings
 task_always_eager = False
 task_eager_propagates = True
@@ -16,7 +39,8 @@ task_eager_propagates = True
 # Worker settings
 worker_concurrency = 8  # Number of worker processes
 worker_prefetch_multiplier = 1
-worker_max_tasks_per_child = 100
+# Recycling a child throws away its warm connection and lookups
+worker_max_tasks_per_child = 1000
 
 # Task settings
 task_time_limit = 300  # 5 minutes
@@ -26,7 +50,16 @@ task_soft_time_limit = 240  # 4 minutes
 result_expires = 3600  # 1 hour
 
 # Beat settings (for periodic tasks)
-beat_schedule = {}
+beat_schedule = {
+    "dispatch-scheduled-batches": {
+        "task": "backend.tasks.transfer_tasks.dispatch_scheduled_batches",
+        "schedule": 60.0,
+    },
+    "admit-deferred-jobs": {
+        "task": "backend.tasks.transfer_tasks.admit_deferred_jobs",
+        "schedule": 30.0,
+    },
+}
 
 # Logging
 worker_hijack_root_logger = False
@@ -0,0 +1,251 @@
+import os
+import uuid
+from typing import Iterable, Optional
+
+from sqlalchemy import (
+    Integer,
+    all_,
+    any_,
+    bindparam,
+    column,
+    delete,
+    insert,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from backend.db import database
+from backend.db import search as search_backend
+
+STAGING_TABLE = "transfer_staging"
+# Company ids bound to a single DELETE when removing a list of companies
+REMOVE_CHUNK_SIZE = int(os.getenv("REMOVE_CHUNK_SIZE", "10000"))
+# Items merged per transaction by a bulk job; each chunk must finish well inside
+# the task time limit, including any per-row triggers on the associations
+MERGE_CHUNK_SIZE = int(os.getenv("BULK_MERGE_CHUNK_SIZE", "500"))
+
+
+class _CompanyIdStream:
+    """File-like object that feeds company ids to COPY without one big string"""
+
+    def __init__(self, company_ids: Iterable[int]):
+        self._company_ids = iter(company_ids)
+        self._buffer = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += f"{int(next(self._company_ids))}\n"
+            except StopIteration:
+                break
+
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def create_staging_table(db: Session):
+    """Create the per-transaction staging table (dropped on commit/rollback)"""
+    db.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            "(company_id integer NOT NULL) ON COMMIT DROP"
+        )
+    )
+
+
+def copy_company_ids_to_staging(db: Session, company_ids: Iterable[int]):
+    """Stream an iterable of company ids into the staging table with COPY"""
+    create_staging_table(db)
+
+    raw_connection = db.connection().connection
+    with raw_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} (company_id) FROM STDIN",
+            _CompanyIdStream(company_ids),
+        )
+
+
+def stage_collection_company_ids(db: Session, source_collection_id: uuid.UUID):
+    """Stage every company id of a collection without round-tripping through Python"""
+    create_staging_table(db)
+
+    db.execute(
+        text(
+            f"INSERT INTO {STAGING_TABLE} (company_id) "
+            "SELECT company_id FROM company_collection_associations "
+            "WHERE collection_id = :source_collection_id"
+        ),
+        {"source_collection_id": source_collection_id},
+    )
+
+
+def stage_matching_collection_company_ids(
+    db: Session,
+    collection_id: uuid.UUID,
+    search: Optional[str] = None,
+    exclude_company_ids: Iterable[int] = (),
+):
+    """Stage the companies of a collection matching the collection page's search"""
+    create_staging_table(db)
+
+    association = database.CompanyCollectionAssociation
+    matching = select(association.company_id).where(
+        association.collection_id == collection_id
+    )
+    if search:
+        matching = matching.where(
+            association.company_id == database.Company.id,
+            search_backend.company_name_filter(search),
+        )
+    exclude_company_ids = list(exclude_company_ids)
+    if exclude_company_ids:
+        matching = matching.where(
+            association.company_id != all_(_company_id_array(exclude_company_ids))
+        )
+
+    staging = table(STAGING_TABLE, column("company_id"))
+    db.execute(insert(staging).from_select(["company_id"], matching))
+
+
+def merge_staged_transfer_items(
+    db: Session,
+    job_id: uuid.UUID,
+    source_collection_id: Optional[uuid.UUID],
+    collection_id: uuid.UUID,
+    members_only: bool = False,
+) -> int:
+    """
+    Create one pending transfer item per staged company in a single statement.
+    Unknown company ids and duplicates are skipped, as are companies outside
+    the collection when `members_only` (for removals). Returns the number of items.
+    """
+    membership_join = (
+        "JOIN company_collection_associations AS member "
+        "ON member.company_id = staged.company_id "
+        "AND member.collection_id = :collection_id "
+        if members_only
+        else ""
+    )
+    result = db.execute(
+        text(
+            "INSERT INTO transfer_job_items "
+            "(id, job_id, company_id, source_collection_id, collection_id, "
+            "created_at, updated_at, status, attempt_count, is_cancelled) "
+            "SELECT gen_random_uuid(), :job_id, staged.company_id, "
+            ":source_collection_id, :collection_id, now() AT TIME ZONE 'utc', "
+            "now() AT TIME ZONE 'utc', 'pending', 0, false "
+            f"FROM (SELECT DISTINCT company_id FROM {STAGING_TABLE}) AS staged "
+            "JOIN companies ON companies.id = staged.company_id "
+            f"{membership_join}"
+        ),
+        {
+            "job_id": job_id,
+            "source_collection_id": source_collection_id,
+            "collection_id": collection_id,
+        },
+    )
+    return result.rowcount
+
+
+def merge_transfer_job_associations(
+    db: Session, job_id: uuid.UUID, chunk_size: Optional[int] = None
+) -> tuple[int, int]:
+    """
+    Add up to `chunk_size` pending items of a job to its target collection and
+    mark them as transferred, both as set-based statements. Call repeatedly,
+    committing in between, until nothing is transferred.
+    Returns (items transferred, associations inserted).
+    """
+    # One statement, so items cancelled meanwhile are neither marked nor added;
+    # rows locked by a cancel or a batch are left for them
+    transferred_count, inserted_count = db.execute(
+        text(
+            "WITH chunk AS ("
+            "SELECT id FROM transfer_job_items "
+            "WHERE job_id = :job_id AND status = 'pending' AND NOT is_cancelled "
+            "ORDER BY company_id LIMIT :chunk_size FOR UPDATE SKIP LOCKED"
+            "), transferred AS ("
+            "UPDATE transfer_job_items "
+            "SET status = 'success', error_message = NULL, "
+            "last_attempt_at = now() AT TIME ZONE 'utc', "
+            "updated_at = now() AT TIME ZONE 'utc', "
+            "attempt_count = attempt_count + 1 "
+            "FROM chunk WHERE transfer_job_items.id = chunk.id "
+            "RETURNING company_id, collection_id"
+            "), inserted AS ("
+            "INSERT INTO company_collection_associations "
+            "(company_id, collection_id, created_at) "
+            "SELECT DISTINCT company_id, collection_id, now() AT TIME ZONE 'utc' "
+            "FROM transferred "
+            "ON CONFLICT (company_id, collection_id) DO NOTHING "
+            "RETURNING 1"
+            ") "
+            "SELECT (SELECT count(*) FROM transferred), "
+            "(SELECT count(*) FROM inserted)"
+        ),
+        {"job_id": job_id, "chunk_size": chunk_size or MERGE_CHUNK_SIZE},
+    ).one()
+
+    return transferred_count, inserted_count
+
+
+def _company_id_array(company_ids: list[int]):
+    """Bind a list of ids as one array parameter instead of one per id"""
+    return bindparam("company_ids", company_ids, type_=ARRAY(Integer))
+
+
+def delete_collection_companies(
+    db: Session, collection_id: uuid.UUID, company_ids: list[int]
+) -> list[int]:
+    """
+    Remove companies from a collection with one DELETE ... RETURNING per
+    REMOVE_CHUNK_SIZE ids. Returns the ids that were in the collection.
+    """
+    association = database.CompanyCollectionAssociation
+    removed_company_ids = []
+    for start in range(0, len(company_ids), REMOVE_CHUNK_SIZE):
+        chunk = company_ids[start : start + REMOVE_CHUNK_SIZE]
+        removed_company_ids.extend(
+            db.execute(
+                delete(association)
+                .where(association.collection_id == collection_id)
+                .where(association.company_id == any_(_company_id_array(chunk)))
+                .returning(association.company_id)
+            ).scalars()
+        )
+    return removed_company_ids
+
+
+def delete_matching_collection_companies(
+    db: Session,
+    collection_id: uuid.UUID,
+    search: Optional[str] = None,
+    exclude_company_ids: Iterable[int] = (),
+) -> list[int]:
+    """
+    Remove every company of a collection that matches the collection page's
+    search filter, in a single DELETE ... RETURNING. Returns the removed ids.
+    """
+    association = database.CompanyCollectionAssociation
+    statement = delete(association).where(association.collection_id == collection_id)
+
+    if search:
+        statement = statement.where(
+            association.company_id == database.Company.id,
+            search_backend.company_name_filter(search),
+        )
+
+    exclude_company_ids = list(exclude_company_ids)
+    if exclude_company_ids:
+        statement = statement.where(
+            association.company_id != all_(_company_id_array(exclude_company_ids))
+        )
+
+    return list(db.execute(statement.returning(association.company_id)).scalars())
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+import uuid
+from typing import Optional, Union
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Query, Session
+
+from backend.db import database
+
+# How long a filtered or all-companies count may be served from memory
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+# Searches matching more rows than this report "SEARCH_COUNT_CAP+"
+SEARCH_COUNT_CAP = int(os.getenv("SEARCH_COUNT_CAP", "10000"))
+COUNT_CACHE_MAX_ENTRIES = 1024
+
+ALL_COMPANIES = "all-companies"
+
+_count_cache: dict[tuple, tuple[float, int, bool]] = {}
+_count_cache_lock = threading.Lock()
+
+
+def collection_size(db: Session, collection_id: uuid.UUID) -> int:
+    """Number of companies in a collection, read from the maintained counter"""
+    stats = db.get(database.CompanyCollectionStats, collection_id)
+    return stats.company_count if stats else 0
+
+
+def collection_size_column(collection_id: uuid.UUID):
+    """Scalar subquery reading a collection's counter inside another statement"""
+    company_count = (
+        select(database.CompanyCollectionStats.company_count)
+        .where(database.CompanyCollectionStats.collection_id == collection_id)
+        .scalar_subquery()
+    )
+    return func.coalesce(company_count, 0).label("total_count")
+
+
+def capped_count(query: Query, cap: Optional[int]) -> tuple[int, bool]:
+    """
+    Count the rows of `query`, stopping after `cap` + 1 rows.
+    Returns (count, exact); count is `cap` when the real count is larger.
+    """
+    if cap is None:
+        return query.with_entities(func.count()).scalar(), True
+
+    matching = query.with_entities(literal(1)).limit(cap + 1).subquery()
+    count = query.session.query(func.count()).select_from(matching).scalar()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+def total_count(
+    query: Query,
+    collection_id: Union[uuid.UUID, str],
+    search: Optional[str] = None,
+    version: Optional[str] = None,
+) -> tuple[int, bool]:
+    """
+    Total rows for a collection page. Unfiltered collections come from the
+    maintained counters; everything else is a capped count cached briefly by
+    (collection, search, version). Pass the collection's version tag so a count
+    taken before a write is never served for a page of the new version.
+    Returns (count, exact).
+    """
+    if not search and collection_id != ALL_COMPANIES:
+        return collection_size(query.session, collection_id), True
+
+    key = (str(collection_id), search or "", version)
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1], cached[2]
+
+    count, exact = capped_count(query, SEARCH_COUNT_CAP if search else None)
+
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            # Drop expired entries first, then the oldest ones
+            for stale_key in [k for k, v in _count_cache.items() if v[0] <= now]:
+                del _count_cache[stale_key]
+            while len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+                del _count_cache[next(iter(_count_cache))]
+        _count_cache[key] = (now + COUNT_CACHE_TTL_SECONDS, count, exact)
+
+    return count, exact
@@ -5,10 +5,12 @@ from datetime import datetime
 from typing import Union
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
@@ -16,16 +18,35 @@ from sqlalchemy import (
     func,
 )
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from backend.db import pool
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# Same database through asyncpg, for the read-heavy async routes
+ASYNC_SQLALCHEMY_DATABASE_URL = make_url(SQLALCHEMY_DATABASE_URL).set(
+    drivername="postgresql+asyncpg"
+)
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
+    **pool.engine_options(),
 )
+pool.instrument(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    **pool.engine_options(is_async=True),
+)
+pool.instrument(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -35,6 +56,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 Base = declarative_base()
 
 
@@ -83,6 +109,52 @@ class CompanyCollectionAssociation(Base):
     )
 
 
+class CompanyCollectionStats(Base):
+    __tablename__ = "company_collection_stats"
+
+    collection_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("company_collections.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # Maintained by statement triggers on company_collection_associations
+    company_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+
+class TransferJob(Base):
+    __tablename__ = "transfer_jobs"
+
+    id: Column[uuid.UUID] = Column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    source_collection_id = Column(
+        UUID(as_uuid=True), ForeignKey("company_collections.id"), nullable=True
+    )
+    collection_id = Column(
+        UUID(as_uuid=True), ForeignKey("company_collections.id"), nullable=False
+    )  # Collection companies are added to, or removed from for removal jobs
+    job_type = Column(
+        String, default="transfer", server_default="transfer", nullable=False
+    )  # transfer, removal
+
+    created_at: Column[datetime] = Column(
+        DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False
+    )
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Set while admission control holds the job back; cleared once it is started
+    deferred_at = Column(DateTime, nullable=True)
+
+    # Maintained in the same transaction as the item status changes
+    total_count = Column(Integer, default=0, server_default="0", nullable=False)
+    pending_count = Column(Integer, default=0, server_default="0", nullable=False)
+    processing_count = Column(Integer, default=0, server_default="0", nullable=False)
+    success_count = Column(Integer, default=0, server_default="0", nullable=False)
+    error_count = Column(Integer, default=0, server_default="0", nullable=False)
+    cancelled_count = Column(Integer, default=0, server_default="0", nullable=False)
+    dead_letter_count = Column(Integer, default=0, server_default="0", nullable=False)
+
+
 class TransferJobItem(Base):
     __tablename__ = "transfer_job_items"
 
@@ -105,10 +177,26 @@ class TransferJobItem(Base):
 
     status = Column(
         String, default="pending", index=True
-    )  # pending, processing, success, error
+    )  # pending, processing, success, error, cancelled, dead_letter
     error_message = Column(String, nullable=True)
 
     last_attempt_at = Column(DateTime, nullable=True)
     attempt_count = Column(Integer, default=0)
+    # Failed items are retried until attempt_count reaches this, then dead-lettered
+    max_attempts = Column(Integer, default=5, server_default="5", nullable=False)
 
     is_cancelled = Column(Boolean, default=False)
+
+    # Set by a trigger (schema.setup_transfer_item_stamps) on every change
+    updated_at: Column[datetime] = Column(
+        DateTime,
+        server_default=func.now(),
+        nullable=False,
+    )
+    # Grows with every change, in commit order within a job, so clients can ask
+    # for what changed since a poll. Set by the same trigger
+    change_seq = Column(BigInteger, server_default="0", nullable=False)
+
+    __table_args__ = (
+        Index("ix_transfer_job_items_job_id_change_seq", "job_id", "change_seq"),
+    )
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+# "queue" keeps a pool per process; "null" opens a connection per checkout and
+# leaves pooling to PgBouncer (transaction pooling)
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a pooled connection is replaced; -1 keeps them forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true")
+
+POOL_MODES = ("queue", "null")
+
+
+class PoolTelemetry:
+    """Checkout counters for one engine's pool, shared by every thread using it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.connects = 0
+            self.timeouts = 0
+            self.peak_checked_out = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+            self._checked_out = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self._checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self._checked_out)
+
+    def record_checkin(self):
+        with self._lock:
+            self._checked_out = max(self._checked_out - 1, 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "checked_out": self._checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6)
+                if self.checkouts
+                else 0.0,
+            }
+
+
+class _TimedPoolMixin:
+    """Times how long callers wait for a connection to free up"""
+
+    telemetry: PoolTelemetry
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.telemetry.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.telemetry.record_wait(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async: bool = False) -> dict[str, Any]:
+    """Keyword arguments for create_engine / create_async_engine from the env"""
+    if DB_POOL_MODE not in POOL_MODES:
+        raise ValueError(f"Unsupported DB_POOL_MODE: {DB_POOL_MODE}")
+
+    if DB_POOL_MODE == "null":
+        options: dict[str, Any] = {"poolclass": NullPool}
+        if is_async:
+            # PgBouncer in transaction mode can't keep asyncpg's prepared statements
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+            }
+        return options
+
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def instrument(engine: Engine) -> PoolTelemetry:
+    """Attach checkout telemetry to an engine's pool"""
+    telemetry = PoolTelemetry()
+    engine.pool.telemetry = telemetry
+
+    @event.listens_for(engine, "engine_disposed")
+    def on_disposed(engine):
+        # dispose() swaps in a fresh pool; counters restart with it
+        engine.pool.telemetry = telemetry
+        telemetry.reset()
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        telemetry.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        telemetry.record_checkout()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        telemetry.record_checkin()
+
+    return telemetry
+
+
+def pool_status(engine: Engine) -> dict[str, Any]:
+    """Current saturation of an engine's pool plus its checkout telemetry"""
+    pool = engine.pool
+    status: dict[str, Any] = {"mode": DB_POOL_MODE, "pool_class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                # Negative until the pool has opened `size` connections
+                "overflow": pool.overflow(),
+                "max_overflow": DB_MAX_OVERFLOW,
+            }
+        )
+
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        status["telemetry"] = telemetry.snapshot()
+
+    return status
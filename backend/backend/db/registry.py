@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.db import database
+
+# Other processes pick up collection changes after at most this many seconds
+COLLECTION_REGISTRY_TTL_SECONDS = float(
+    os.getenv("COLLECTION_REGISTRY_TTL_SECONDS", "60")
+)
+# An id that was still unknown after a refresh is not looked up again for this
+# long, so requests for a missing collection don't each reload the registry
+COLLECTION_REGISTRY_MISS_TTL_SECONDS = float(
+    os.getenv("COLLECTION_REGISTRY_MISS_TTL_SECONDS", "5")
+)
+COLLECTION_REGISTRY_MAX_MISSES = 1024
+
+LIKED = "liked"
+IGNORED = "ignored"
+MY_LIST = "my_list"
+
+# Well-known roles and the collection names they are seeded with
+COLLECTION_ROLES = {
+    LIKED: "Liked Companies List",
+    IGNORED: "Companies to Ignore List",
+    MY_LIST: "My List",
+}
+
+
+class CollectionRegistry:
+    """In-process map of collection metadata and well-known roles to ids"""
+
+    def __init__(self, ttl_seconds: float, miss_ttl_seconds: float):
+        self._ttl_seconds = ttl_seconds
+        self._miss_ttl_seconds = miss_ttl_seconds
+        self._lock = threading.Lock()
+        self._names: dict[uuid.UUID, str] = {}
+        self._roles: dict[str, uuid.UUID] = {}
+        self._expires_at = 0.0
+        # Unknown collection id -> when it may be looked up again
+        self._misses: dict[uuid.UUID, float] = {}
+
+    def refresh(self, db: Session):
+        collections = (
+            db.query(
+                database.CompanyCollection.id,
+                database.CompanyCollection.collection_name,
+            )
+            .order_by(
+                database.CompanyCollection.created_at, database.CompanyCollection.id
+            )
+            .all()
+        )
+
+        names = {
+            collection.id: collection.collection_name for collection in collections
+        }
+        roles = {}
+        for role, collection_name in COLLECTION_ROLES.items():
+            # The oldest collection wins if a name was ever duplicated
+            matches = [
+                collection
+                for collection in collections
+                if collection.collection_name == collection_name
+            ]
+            if matches:
+                roles[role] = matches[0].id
+
+        with self._lock:
+            self._names = names
+            self._roles = roles
+            self._expires_at = time.monotonic() + self._ttl_seconds
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0.0
+            self._misses = {}
+
+    def _ensure_fresh(self, db: Session):
+        if time.monotonic() >= self._expires_at:
+            self.refresh(db)
+
+    def role_id(self, db: Session, role: str) -> Optional[uuid.UUID]:
+        """Id of the collection playing a well-known role, if it exists"""
+        self._ensure_fresh(db)
+        return self._roles.get(role)
+
+    def collection_name(self, db: Session, collection_id: uuid.UUID) -> Optional[str]:
+        """Name of a collection, or None if it does not exist"""
+        self._ensure_fresh(db)
+        if collection_id in self._names:
+            return self._names[collection_id]
+
+        now = time.monotonic()
+        with self._lock:
+            recently_missing = self._misses.get(collection_id, 0.0) > now
+        if recently_missing:
+            return None
+
+        # Possibly created by another process since the last refresh
+        self.refresh(db)
+        if collection_id in self._names:
+            return self._names[collection_id]
+
+        with self._lock:
+            if len(self._misses) >= COLLECTION_REGISTRY_MAX_MISSES:
+                self._misses = {
+                    missing_id: expires_at
+                    for missing_id, expires_at in self._misses.items()
+                    if expires_at > now
+                }
+                if len(self._misses) >= COLLECTION_REGISTRY_MAX_MISSES:
+                    self._misses.pop(next(iter(self._misses)))
+            self._misses[collection_id] = now + self._miss_ttl_seconds
+        return None
+
+    def collections(self, db: Session) -> list[tuple[uuid.UUID, str]]:
+        self._ensure_fresh(db)
+        return list(self._names.items())
+
+
+collection_registry = CollectionRegistry(
+    COLLECTION_REGISTRY_TTL_SECONDS, COLLECTION_REGISTRY_MISS_TTL_SECONDS
+)
+
+
+@event.listens_for(database.CompanyCollection, "after_insert")
+@event.listens_for(database.CompanyCollection, "after_update")
+@event.listens_for(database.CompanyCollection, "after_delete")
+def _invalidate_collection_registry(mapper, connection, target):
+    collection_registry.invalidate()
@@ -0,0 +1,153 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.db import search
+
+
+def setup_schema(db: Session):
+    """
+    Create the functions, triggers and indexes that create_all can't express.
+    Safe to run on every startup.
+    """
+    setup_collection_counters(db)
+    setup_transfer_columns(db)
+    setup_transfer_item_stamps(db)
+    search.setup_trigram_index(db)
+    db.commit()
+
+
+def setup_transfer_columns(db: Session):
+    """Add columns create_all won't add to transfer tables that already exist"""
+    db.execute(
+        text("""
+ALTER TABLE transfer_jobs
+ADD COLUMN IF NOT EXISTS job_type varchar NOT NULL DEFAULT 'transfer';
+ALTER TABLE transfer_jobs
+ADD COLUMN IF NOT EXISTS dead_letter_count integer NOT NULL DEFAULT 0;
+ALTER TABLE transfer_jobs
+ADD COLUMN IF NOT EXISTS deferred_at timestamp;
+ALTER TABLE transfer_job_items
+ADD COLUMN IF NOT EXISTS updated_at timestamp NOT NULL DEFAULT now();
+ALTER TABLE transfer_job_items
+ADD COLUMN IF NOT EXISTS max_attempts integer NOT NULL DEFAULT 5;
+ALTER TABLE transfer_job_items
+ADD COLUMN IF NOT EXISTS change_seq bigint NOT NULL DEFAULT 0;
+CREATE SEQUENCE IF NOT EXISTS transfer_job_item_change_seq;
+DROP INDEX IF EXISTS ix_transfer_job_items_job_id_updated_at;
+CREATE INDEX IF NOT EXISTS ix_transfer_job_items_job_id_change_seq
+ON transfer_job_items (job_id, change_seq);
+    """)
+    )
+
+
+def setup_transfer_item_stamps(db: Session):
+    """
+    Stamp every transfer item change with the next change_seq, taken under the
+    job's row lock. Writers of a job's items hold that lock until they commit
+    (record_status_changes updates the row), so a job's sequence numbers become
+    visible in order and a reader's highest one is a safe cursor.
+    """
+    db.execute(
+        text("""
+CREATE OR REPLACE FUNCTION stamp_transfer_item_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Free when the writer already holds it; no row yet while a job is created
+    PERFORM 1 FROM transfer_jobs WHERE id = NEW.job_id FOR NO KEY UPDATE;
+    NEW.change_seq := nextval('transfer_job_item_change_seq');
+    NEW.updated_at := now() AT TIME ZONE 'utc';
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE OR REPLACE TRIGGER stamp_transfer_item_updated_at_trigger
+BEFORE INSERT OR UPDATE ON transfer_job_items
+FOR EACH ROW
+EXECUTE FUNCTION stamp_transfer_item_updated_at();
+    """)
+    )
+
+
+def setup_collection_counters(db: Session):
+    """Keep company_collection_stats in step with the association table"""
+    db.execute(
+        text("""
+CREATE OR REPLACE FUNCTION count_inserted_associations()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO company_collection_stats (collection_id, company_count)
+    SELECT collection_id, count(*) FROM inserted_rows GROUP BY collection_id
+    ON CONFLICT (collection_id) DO UPDATE
+    SET company_count = company_collection_stats.company_count
+        + EXCLUDED.company_count;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+    """)
+    )
+
+    db.execute(
+        text("""
+CREATE OR REPLACE FUNCTION count_deleted_associations()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE company_collection_stats
+    SET company_count = company_collection_stats.company_count - deleted.count
+    FROM (
+        SELECT collection_id, count(*) AS count
+        FROM deleted_rows GROUP BY collection_id
+    ) AS deleted
+    WHERE company_collection_stats.collection_id = deleted.collection_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+    """)
+    )
+
+    triggers_exist = db.execute(
+        text("""
+SELECT count(*) FROM pg_trigger
+WHERE tgname IN ('count_inserted_associations_trigger',
+                 'count_deleted_associations_trigger')
+    """)
+    ).scalar()
+    if triggers_exist == 2:
+        return
+
+    # First run: block writers while the triggers are created and backfilled
+    db.execute(
+        text("LOCK TABLE company_collection_associations IN SHARE ROW EXCLUSIVE MODE")
+    )
+    db.execute(
+        text("""
+DROP TRIGGER IF EXISTS count_inserted_associations_trigger
+ON company_collection_associations;
+CREATE TRIGGER count_inserted_associations_trigger
+AFTER INSERT ON company_collection_associations
+REFERENCING NEW TABLE AS inserted_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_inserted_associations();
+    """)
+    )
+    db.execute(
+        text("""
+DROP TRIGGER IF EXISTS count_deleted_associations_trigger
+ON company_collection_associations;
+CREATE TRIGGER count_deleted_associations_trigger
+AFTER DELETE ON company_collection_associations
+REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_deleted_associations();
+    """)
+    )
+    db.execute(
+        text("""
+INSERT INTO company_collection_stats (collection_id, company_count)
+SELECT company_collections.id, count(company_collection_associations.id)
+FROM company_collections
+LEFT JOIN company_collection_associations
+    ON company_collection_associations.collection_id = company_collections.id
+GROUP BY company_collections.id
+ON CONFLICT (collection_id) DO UPDATE
+SET company_count = EXCLUDED.company_count;
+    """)
+    )
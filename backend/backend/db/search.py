@@ -0,0 +1,73 @@
+from typing import Optional
+
+from sqlalchemy import Float, case, cast, func, text
+from sqlalchemy.orm import Session
+
+from backend.db import database
+
+_trigram_available: Optional[bool] = None
+
+
+def setup_trigram_index(db: Session):
+    """Enable pg_trgm and index company names for substring search"""
+    global _trigram_available
+
+    try:
+        with db.begin_nested():
+            db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            db.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_companies_company_name_trgm "
+                    "ON companies USING gin (company_name gin_trgm_ops)"
+                )
+            )
+        _trigram_available = True
+    except Exception as e:
+        print(f"pg_trgm unavailable, company search will not be indexed: {e}")
+        _trigram_available = False
+
+
+def trigram_available(db: Session) -> bool:
+    global _trigram_available
+
+    if _trigram_available is None:
+        _trigram_available = bool(
+            db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).scalar()
+        )
+    return _trigram_available
+
+
+def _escape_like(search: str) -> str:
+    return search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def company_name_filter(search: str):
+    """Case-insensitive substring match, served by the trigram index"""
+    return database.Company.company_name.ilike(f"%{_escape_like(search)}%", escape="\\")
+
+
+def relevance_sort_columns(db: Session, search: str) -> tuple:
+    """
+    Ascending sort columns that put exact-prefix matches first, then the
+    closest matches by trigram similarity (or match position without pg_trgm)
+    """
+    company_name = database.Company.company_name
+    prefix_rank = case(
+        (company_name.ilike(f"{_escape_like(search)}%", escape="\\"), 0),
+        else_=1,
+    ).label("prefix_rank")
+
+    if trigram_available(db):
+        # Negated so that ascending order puts the most similar names first;
+        # double precision so the value survives a round trip through a cursor
+        closeness = (-cast(func.similarity(company_name, search), Float)).label(
+            "closeness"
+        )
+    else:
+        closeness = func.strpos(func.lower(company_name), search.lower()).label(
+            "closeness"
+        )
+
+    return prefix_rank, closeness
@@ -0,0 +1,309 @@
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.orm import Session
+
+from backend import cache
+from backend.db.database import TransferJob, TransferJobItem
+
+# Job types: companies added to the job's collection, or removed from it
+TRANSFER = "transfer"
+REMOVAL = "removal"
+
+JOB_STATUSES = (
+    "pending",
+    "processing",
+    "success",
+    "error",
+    "cancelled",
+    "dead_letter",
+)
+
+# Item statuses that still have work left to do
+ACTIVE_STATUSES = ("pending", "processing")
+
+# Session.info key collecting the jobs a transaction changed
+_CHANGED_JOBS = "changed_transfer_jobs"
+
+
+def _mark_changed(db: Session, job_id: uuid.UUID):
+    db.info.setdefault(_CHANGED_JOBS, set()).add(job_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_job_versions(session: Session):
+    # Only once committed, so a reader never pairs a new version with old rows
+    job_ids = session.info.pop(_CHANGED_JOBS, None)
+    if job_ids:
+        cache.bump_transfer_job_versions(*job_ids)
+
+
+def add_transfer_job(
+    db: Session,
+    job_id: uuid.UUID,
+    source_collection_id: Optional[uuid.UUID],
+    collection_id: uuid.UUID,
+    total_count: int,
+    job_type: str = TRANSFER,
+    deferred: bool = False,
+) -> TransferJob:
+    """
+    Create the job row for a job whose items were all created as pending.
+    A deferred job waits for admission control to start it.
+    """
+    job = TransferJob(
+        id=job_id,
+        source_collection_id=source_collection_id,
+        collection_id=collection_id,
+        job_type=job_type,
+        total_count=total_count,
+        pending_count=total_count,
+    )
+    if total_count == 0:
+        job.finished_at = datetime.utcnow()
+    elif deferred:
+        job.deferred_at = datetime.utcnow()
+    db.add(job)
+    _mark_changed(db, job_id)
+    return job
+
+
+def admit_job(db: Session, job: TransferJob):
+    """Start a deferred job inside the caller's transaction"""
+    job.deferred_at = None
+    # Responses carry `deferred`, so their ETag must move with it
+    _mark_changed(db, job.id)
+
+
+def record_status_changes(
+    db: Session, job_id: uuid.UUID, changes: Counter, awaiting_retry: bool = False
+):
+    """
+    Apply item status transitions to the job counters inside the caller's
+    transaction. `changes` maps (old_status, new_status) to a number of items;
+    None as the new status means the items were deleted. `awaiting_retry` keeps
+    the job unfinished because the new errors are about to be requeued.
+    """
+    _mark_changed(db, job_id)
+
+    deltas = Counter()
+    total_delta = 0
+    for (old_status, new_status), count in changes.items():
+        deltas[old_status] -= count
+        if new_status is None:
+            total_delta -= count
+        else:
+            deltas[new_status] += count
+
+    values = {
+        f"{status}_count": getattr(TransferJob, f"{status}_count") + delta
+        for status, delta in deltas.items()
+        if delta and status in JOB_STATUSES
+    }
+    if total_delta:
+        values["total_count"] = TransferJob.total_count + total_delta
+
+    # Even with every count unchanged (e.g. an error retried into another
+    # error), whether the job is finished may still change
+    now = datetime.utcnow()
+    remaining = sum(
+        getattr(TransferJob, f"{status}_count") + deltas[status]
+        for status in ACTIVE_STATUSES
+    )
+    if any(
+        deltas[status] > 0
+        for status in ("processing", "success", "error", "dead_letter")
+    ):
+        values["started_at"] = func.coalesce(TransferJob.started_at, now)
+    if awaiting_retry:
+        values["finished_at"] = None
+    else:
+        values["finished_at"] = case(
+            (remaining == 0, func.coalesce(TransferJob.finished_at, now)),
+            else_=None,
+        )
+
+    db.execute(
+        update(TransferJob)
+        .where(TransferJob.id == job_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_item_status(
+    db: Session,
+    item: TransferJobItem,
+    status: str,
+    error_message: Optional[str] = None,
+    awaiting_retry: bool = False,
+):
+    """
+    Record an attempt on one locked item that left it in `status`, moving the
+    job counters in the caller's transaction
+    """
+    record_status_changes(
+        db,
+        item.job_id,
+        Counter({(item.status, status): 1}),
+        awaiting_retry=awaiting_retry,
+    )
+    item.status = status
+    item.error_message = error_message
+    item.last_attempt_at = datetime.utcnow()
+    item.attempt_count = (item.attempt_count or 0) + 1
+
+
+def settle_job(db: Session, job_id: uuid.UUID):
+    """
+    Mark a job finished inside the caller's transaction if it has no active
+    items left, e.g. once errors kept unfinished for a retry won't be retried.
+    """
+    _mark_changed(db, job_id)
+    db.execute(
+        update(TransferJob)
+        .where(
+            TransferJob.id == job_id,
+            TransferJob.finished_at.is_(None),
+            TransferJob.pending_count + TransferJob.processing_count == 0,
+        )
+        .values(finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cancel_items(db: Session, job_id: uuid.UUID) -> int:
+    """
+    Cancel every unfinished item of a job with a single UPDATE inside the
+    caller's transaction, counting them per previous status in SQL so huge
+    jobs never load their items. Items a worker holds locked are skipped
+    rather than waited for; that worker finishes them or sweeps them once it
+    sees the cancel flag. Returns the number of cancelled items.
+    """
+    previous = (
+        select(TransferJobItem.id, TransferJobItem.status.label("previous_status"))
+        .where(
+            TransferJobItem.job_id == job_id,
+            TransferJobItem.status.in_(ACTIVE_STATUSES),
+        )
+        .with_for_update(skip_locked=True)
+        .subquery()
+    )
+    cancelled = (
+        update(TransferJobItem)
+        .where(TransferJobItem.id == previous.c.id)
+        .values(status="cancelled", is_cancelled=True)
+        .returning(previous.c.previous_status)
+        .cte("cancelled")
+    )
+    changes = Counter(
+        {
+            (previous_status, "cancelled"): count
+            for previous_status, count in db.execute(
+                select(cancelled.c.previous_status, func.count()).group_by(
+                    cancelled.c.previous_status
+                )
+            )
+        }
+    )
+    record_status_changes(db, job_id, changes)
+    return sum(changes.values())
+
+
+def requeue_failed_items(
+    db: Session, job_id: uuid.UUID, company_ids: Optional[list[int]] = None
+) -> tuple[list[tuple[int, int]], int]:
+    """
+    Move a job's failed items (optionally only `company_ids`) back to pending
+    when they have attempts left and to dead_letter otherwise, inside the
+    caller's transaction. Returns ((company id, attempt count) of every requeued
+    item, number of dead-lettered items).
+    """
+    failed = (
+        TransferJobItem.job_id == job_id,
+        TransferJobItem.status == "error",
+        TransferJobItem.is_cancelled == False,
+    )
+    if company_ids is not None:
+        failed += (TransferJobItem.company_id.in_(company_ids),)
+
+    dead_lettered = db.execute(
+        update(TransferJobItem)
+        .where(*failed, TransferJobItem.attempt_count >= TransferJobItem.max_attempts)
+        .values(status="dead_letter")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    requeued = db.execute(
+        update(TransferJobItem)
+        .where(*failed, TransferJobItem.attempt_count < TransferJobItem.max_attempts)
+        .values(status="pending", error_message=None)
+        .returning(TransferJobItem.company_id, TransferJobItem.attempt_count)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    record_status_changes(
+        db,
+        job_id,
+        Counter(
+            {
+                ("error", "dead_letter"): dead_lettered,
+                ("error", "pending"): len(requeued),
+            }
+        ),
+    )
+    return [tuple(row) for row in requeued], dead_lettered
+
+
+def change_cursor(db: Session, job_id: uuid.UUID) -> int:
+    """
+    The latest change_seq of a job's items. Later changes always get a higher
+    one (see schema.setup_transfer_item_stamps), so it is a cursor for them.
+    """
+    return db.scalar(
+        select(func.coalesce(func.max(TransferJobItem.change_seq), 0)).where(
+            TransferJobItem.job_id == job_id
+        )
+    )
+
+
+def job_counters(job: TransferJob) -> dict[str, Any]:
+    """A job's counters under the names job status responses use"""
+    return {
+        "total_items": job.total_count,
+        **{
+            f"{status}_count": getattr(job, f"{status}_count")
+            for status in JOB_STATUSES
+        },
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def publish_progress(
+    db: Session, job_id: uuid.UUID, company_ids: Optional[list[int]] = None
+):
+    """
+    Push the current status of `company_ids` and the job counters to the job's
+    event stream. Call after committing.
+    """
+    if company_ids:
+        rows = (
+            db.query(TransferJobItem.company_id, TransferJobItem.status)
+            .filter(
+                TransferJobItem.job_id == job_id,
+                TransferJobItem.company_id.in_(company_ids),
+            )
+            .all()
+        )
+        statuses = defaultdict(list)
+        for company_id, status in rows:
+            statuses[status].append(company_id)
+        cache.publish_job_event(job_id, "items", {"statuses": statuses})
+
+    job = db.get(TransferJob, job_id)
+    if job:
+        cache.publish_job_event(job_id, "counters", job_counters(job))
@@ -1,12 +1,21 @@
 import uuid
+from typing import Any, Callable, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.db import database
-from backend.routes.companies import CompanyBatchOutput, CompanyOutput
+from backend import cache
+from backend.db import counts, database, registry
+from backend.db import search as search_backend
+from backend.db.registry import collection_registry
+from backend.routes import etags
+from backend.routes.companies import (
+    CompanyBatchOutput,
+    CompanyOutput,
+    fetch_company_page,
+)
 
 router = APIRouter(
     prefix="/collections",
@@ -28,184 +37,226 @@ class AllCompaniesOutput(BaseModel):
     collection_name: str = "All Companies"
     companies: list[CompanyOutput]
     total: int
+    total_is_exact: bool = True
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+async def serve_cached_page(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    scope: Union[uuid.UUID, str],
+    params: dict[str, Any],
+    build_page: Callable[[Session, Optional[str]], BaseModel],
+    output_model: type[BaseModel],
+):
+    """
+    Serve a collection page from the Redis cache, building it on a miss.
+    Pages depend on their collection, the liked list and any member_of collections;
+    their versions also make the ETag, so revalidation never reaches Postgres.
+    `build_page` gets the collection's own version tag for its total count.
+    """
+    liked_collection_id = await db.run_sync(
+        lambda session: collection_registry.role_id(session, registry.LIKED)
+    )
+    dependencies = [liked_collection_id, *(params.get("member_of") or [])]
+    tag = await cache.collection_page_tag(
+        scope, [dependency for dependency in dependencies if dependency], params
+    )
+
+    etag = etags.strong_etag(tag)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+    etags.set_etag(response, etag)
+
+    cached = await cache.get_page(scope, tag)
+    if cached is not None:
+        return output_model.model_validate_json(cached)
+
+    count_version = await cache.version_tag(
+        [cache.collection_version_key(scope)], {"scope": str(scope)}
+    )
+    # The sync page builder runs on the asyncpg connection without a thread
+    page = await db.run_sync(build_page, count_version)
+    await cache.set_page(scope, tag, page.model_dump_json())
+    return page
 
 
 @router.get("", response_model=list[CompanyCollectionMetadata])
-def get_all_collection_metadata(
-    db: Session = Depends(database.get_db),
+async def get_all_collection_metadata(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    collections = db.query(database.CompanyCollection).all()
+    collections = await db.run_sync(collection_registry.collections)
+
+    etag = etags.strong_etag(etags.content_tag(sorted(collections)))
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+    etags.set_etag(response, etag)
 
     return [
         CompanyCollectionMetadata(
-            id=collection.id,
-            collection_name=collection.collection_name,
+            id=collection_id,
+            collection_name=collection_name,
         )
-        for collection in collections
+        for collection_id, collection_name in collections
     ]
 
 
 @router.get("/all-companies", response_model=AllCompaniesOutput)
-def get_all_companies(
+async def get_all_companies(
+    request: Request,
+    response: Response,
     offset: int = Query(
         0, description="The number of items to skip from the beginning"
     ),
     limit: int = Query(10, description="The number of items to fetch"),
     search: str = Query(None, description="Search by company name"),
-    db: Session = Depends(database.get_db),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from a previous page (overrides offset)"
+    ),
+    sort: Optional[str] = Query(
+        None,
+        description="Sort key: id, company_name or relevance (default when searching)",
+    ),
+    member_of: Optional[list[uuid.UUID]] = Query(
+        None, description="Report membership in these collections"
+    ),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     """Get all companies regardless of collection associations"""
-    # Query all companies directly
-    query = db.query(
-        database.Company.id,
-        database.Company.company_name,
-        func.count().over().label("total_count"),
-    ).select_from(database.Company)
-
-    if search:
-        search_filter = database.Company.company_name.ilike(f"%{search}%")
-        query = query.filter(search_filter)
-
-    query = query.order_by(database.Company.id).offset(offset).limit(limit)
-    results = query.all()
-
-    if not results:
-        return AllCompaniesOutput(
-            companies=[],
-            total=0,
-        )
 
-    total_count = results[0].total_count
-    company_ids = [result.id for result in results]
-
-    # Get liked companies for these companies
-    liked_list = (
-        db.query(database.CompanyCollection)
-        .filter(database.CompanyCollection.collection_name == "Liked Companies List")
-        .first()
-    )
-
-    liked_companies = set()
-
-    if liked_list:
-        liked_associations = (
-            db.query(database.CompanyCollectionAssociation.company_id)
-            .filter(database.CompanyCollectionAssociation.company_id.in_(company_ids))
-            .filter(
-                database.CompanyCollectionAssociation.collection_id == liked_list.id
-            )
-            .all()
+    def build_page(
+        session: Session, count_version: Optional[str]
+    ) -> AllCompaniesOutput:
+        # Query all companies directly
+        query = session.query(
+            database.Company.id,
+            database.Company.company_name,
+        ).select_from(database.Company)
+
+        if search:
+            search_filter = search_backend.company_name_filter(search)
+            query = query.filter(search_filter)
+
+        page = fetch_company_page(
+            query,
+            counts.ALL_COMPANIES,
+            search=search,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
+            member_of=member_of,
+            count_version=count_version,
         )
-        liked_companies = {assoc.company_id for assoc in liked_associations}
 
-    companies = [
-        CompanyOutput(
-            id=result.id,
-            company_name=result.company_name,
-            liked=result.id in liked_companies,
-        )
-        for result in results
-    ]
+        return AllCompaniesOutput(**dict(page))
 
-    return AllCompaniesOutput(
-        companies=companies,
-        total=total_count,
+    params = dict(
+        offset=offset,
+        limit=limit,
+        search=search,
+        cursor=cursor,
+        sort=sort,
+        member_of=member_of,
+    )
+    return await serve_cached_page(
+        request,
+        response,
+        db,
+        counts.ALL_COMPANIES,
+        params,
+        build_page,
+        AllCompaniesOutput,
     )
 
 
 @router.get("/{collection_id}", response_model=CompanyCollectionOutput)
-def get_company_collection_by_id(
+async def get_company_collection_by_id(
+    request: Request,
+    response: Response,
     collection_id: uuid.UUID,
     offset: int = Query(
         0, description="The number of items to skip from the beginning"
     ),
     limit: int = Query(10, description="The number of items to fetch"),
     search: str = Query(None, description="Search by company name"),
-    db: Session = Depends(database.get_db),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from a previous page (overrides offset)"
+    ),
+    sort: Optional[str] = Query(
+        None,
+        description="Sort key: id, company_name or relevance (default when searching)",
+    ),
+    member_of: Optional[list[uuid.UUID]] = Query(
+        None, description="Report membership in these collections"
+    ),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    # First, check if the collection exists
-    collection = (
-        db.query(database.CompanyCollection)
-        .filter(database.CompanyCollection.id == collection_id)
-        .first()
-    )
-
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-
-    # Single query to get companies and total count
-    query = (
-        db.query(
-            database.Company.id,
-            database.Company.company_name,
-            database.CompanyCollection.collection_name,
-            func.count().over().label("total_count"),
-        )
-        .select_from(database.CompanyCollectionAssociation)
-        .join(
-            database.Company,
-            database.CompanyCollectionAssociation.company_id == database.Company.id,
-        )
-        .join(
-            database.CompanyCollection,
-            database.CompanyCollectionAssociation.collection_id
-            == database.CompanyCollection.id,
+    def build_page(
+        session: Session, count_version: Optional[str]
+    ) -> CompanyCollectionOutput:
+        # First, check if the collection exists
+        collection_name = collection_registry.collection_name(session, collection_id)
+
+        if collection_name is None:
+            raise HTTPException(status_code=404, detail="Collection not found")
+
+        query = (
+            session.query(
+                database.Company.id,
+                database.Company.company_name,
+            )
+            .select_from(database.CompanyCollectionAssociation)
+            .join(
+                database.Company,
+                database.CompanyCollectionAssociation.company_id == database.Company.id,
+            )
+            .filter(
+                database.CompanyCollectionAssociation.collection_id == collection_id
+            )
         )
-        .filter(database.CompanyCollectionAssociation.collection_id == collection_id)
-    )
-
-    if search:
-        search_filter = database.Company.company_name.ilike(f"%{search}%")
 
-        query = query.filter(search_filter)
-
-    query = query.order_by(database.Company.id).offset(offset).limit(limit)
-
-    results = query.all()
+        if search:
+            search_filter = search_backend.company_name_filter(search)
+
+            query = query.filter(search_filter)
+
+        page = fetch_company_page(
+            query,
+            collection_id,
+            search=search,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+            offset=offset,
+            member_of=member_of,
+            count_version=count_version,
+        )
 
-    if not results:
-        # Collection exists but is empty
         return CompanyCollectionOutput(
             id=collection_id,
-            collection_name=collection.collection_name,
-            companies=[],
-            total=0,
+            collection_name=collection_name,
+            **dict(page),
         )
 
-    total_count = results[0].total_count
-    company_ids = [result.id for result in results]
-
-    liked_list = (
-        db.query(database.CompanyCollection)
-        .filter(database.CompanyCollection.collection_name == "Liked Companies List")
-        .first()
+    params = dict(
+        offset=offset,
+        limit=limit,
+        search=search,
+        cursor=cursor,
+        sort=sort,
+        member_of=member_of,
     )
-
-    liked_companies = set()
-
-    if liked_list:
-        liked_associations = (
-            db.query(database.CompanyCollectionAssociation.company_id)
-            .filter(database.CompanyCollectionAssociation.company_id.in_(company_ids))
-            .filter(
-                database.CompanyCollectionAssociation.collection_id == liked_list.id
-            )
-            .all()
-        )
-        liked_companies = {assoc.company_id for assoc in liked_associations}
-
-    companies = [
-        CompanyOutput(
-            id=result.id,
-            company_name=result.company_name,
-            liked=result.id in liked_companies,
-        )
-        for result in results
-    ]
-
-    return CompanyCollectionOutput(
-        id=collection_id,
-        collection_name=collection.collection_name,
-        companies=companies,
-        total=total_count,
+    return await serve_cached_page(
+        request,
+        response,
+        db,
+        collection_id,
+        params,
+        build_page,
+        CompanyCollectionOutput,
     )
@@ -1,8 +1,16 @@
+import uuid
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, func, literal, select
+from sqlalchemy.orm import Query as OrmQuery
+from sqlalchemy.orm import Session, aliased
 
-from backend.db import database
+from backend import cache
+from backend.db import counts, database, registry
+from backend.db.registry import collection_registry
+from backend.routes import pagination
 
 router = APIRouter(
     prefix="/companies",
@@ -14,11 +22,15 @@ class CompanyOutput(BaseModel):
     id: int
     company_name: str
     liked: bool
+    member_of: Optional[list[uuid.UUID]] = None
 
 
 class CompanyBatchOutput(BaseModel):
     companies: list[CompanyOutput]
     total: int
+    total_is_exact: bool = True
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class ToggleLikeResponse(BaseModel):
@@ -27,39 +39,111 @@ class ToggleLikeResponse(BaseModel):
     message: str
 
 
-def fetch_companies_with_liked(
-    db: Session, company_ids: list[int]
-) -> list[CompanyOutput]:
-    liked_list = (
-        db.query(database.CompanyCollection)
-        .filter(database.CompanyCollection.collection_name == "Liked Companies List")
-        .first()
+def liked_column(db: Session):
+    """Correlated EXISTS telling whether each selected company is liked"""
+    liked_list_id = collection_registry.role_id(db, registry.LIKED)
+    if not liked_list_id:
+        return literal(False).label("liked")
+
+    liked = aliased(database.CompanyCollectionAssociation)
+    return (
+        exists()
+        .where(liked.company_id == database.Company.id)
+        .where(liked.collection_id == liked_list_id)
+        .label("liked")
     )
 
-    liked_associations = (
-        db.query(database.CompanyCollectionAssociation)
-        .filter(database.Company.id.in_(company_ids))
-        .filter(
-            database.CompanyCollectionAssociation.collection_id == liked_list.id,
+
+def member_of_column(collection_ids: list[uuid.UUID]):
+    """Correlated subquery listing which of `collection_ids` hold each company"""
+    member = aliased(database.CompanyCollectionAssociation)
+    return (
+        select(func.array_agg(member.collection_id))
+        .where(member.company_id == database.Company.id)
+        .where(member.collection_id.in_(collection_ids))
+        .scalar_subquery()
+        .label("member_of")
+    )
+
+
+def fetch_company_page(
+    query: OrmQuery,
+    collection_id,
+    search: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    member_of: Optional[list[uuid.UUID]] = None,
+    count_version: Optional[str] = None,
+) -> CompanyBatchOutput:
+    """
+    Build one page of companies from `query` (selecting company id and name).
+    The liked flag, requested memberships and, for unfiltered collections, the
+    total are computed in the page statement itself.
+    """
+    db = query.session
+
+    page_query = query.add_columns(liked_column(db))
+    if member_of:
+        page_query = page_query.add_columns(member_of_column(member_of))
+
+    total, total_is_exact = None, True
+    if not search and collection_id != counts.ALL_COMPANIES:
+        page_query = page_query.add_columns(
+            counts.collection_size_column(collection_id)
         )
-        .all()
+    else:
+        total, total_is_exact = counts.total_count(
+            query, collection_id, search, version=count_version
+        )
+
+    rows, next_cursor, prev_cursor = pagination.keyset_page(
+        page_query,
+        pagination.sort_columns(db, sort, search),
+        limit,
+        cursor=cursor,
+        offset=offset,
     )
 
-    liked_companies = {association.company_id for association in liked_associations}
+    if total is None:
+        total = (
+            rows[0].total_count if rows else counts.collection_size(db, collection_id)
+        )
 
-    companies = (
-        db.query(database.Company).filter(database.Company.id.in_(company_ids)).all()
+    return CompanyBatchOutput(
+        companies=[
+            CompanyOutput(
+                id=row.id,
+                company_name=row.company_name,
+                liked=row.liked,
+                member_of=(row.member_of or []) if member_of else None,
+            )
+            for row in rows
+        ],
+        total=total,
+        total_is_exact=total_is_exact,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
     )
 
-    results = [(company, company.id in liked_companies) for company in companies]
+
+def fetch_companies_with_liked(
+    db: Session, company_ids: list[int]
+) -> list[CompanyOutput]:
+    rows = (
+        db.query(database.Company.id, database.Company.company_name, liked_column(db))
+        .filter(database.Company.id.in_(company_ids))
+        .all()
+    )
 
     return [
         CompanyOutput(
-            id=company.id,
-            company_name=company.company_name,
-            liked=True if liked else False,
+            id=row.id,
+            company_name=row.company_name,
+            liked=row.liked,
         )
-        for company, liked in results
+        for row in rows
     ]
 
 
@@ -69,16 +153,23 @@ def get_companies(
         0, description="The number of items to skip from the beginning"
     ),
     limit: int = Query(10, description="The number of items to fetch"),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from a previous page (overrides offset)"
+    ),
+    member_of: Optional[list[uuid.UUID]] = Query(
+        None, description="Report membership in these collections"
+    ),
     db: Session = Depends(database.get_db),
 ):
-    results = db.query(database.Company).offset(offset).limit(limit).all()
-
-    count = db.query(database.Company).count()
-    companies = fetch_companies_with_liked(db, [company.id for company in results])
-
-    return CompanyBatchOutput(
-        companies=companies,
-        total=count,
+    query = db.query(database.Company.id, database.Company.company_name)
+
+    return fetch_company_page(
+        query,
+        counts.ALL_COMPANIES,
+        limit=limit,
+        cursor=cursor,
+        offset=offset,
+        member_of=member_of,
     )
 
 
@@ -97,13 +188,9 @@ def toggle_company_like(
         raise HTTPException(status_code=404, detail="Company not found")
 
     # Get the Liked Companies List collection
-    liked_collection = (
-        db.query(database.CompanyCollection)
-        .filter(database.CompanyCollection.collection_name == "Liked Companies List")
-        .first()
-    )
+    liked_collection_id = collection_registry.role_id(db, registry.LIKED)
 
-    if not liked_collection:
+    if not liked_collection_id:
         raise HTTPException(
             status_code=500, detail="Liked Companies List collection not found"
         )
@@ -113,7 +200,7 @@ def toggle_company_like(
         db.query(database.CompanyCollectionAssociation)
         .filter(
             database.CompanyCollectionAssociation.company_id == company_id,
-            database.CompanyCollectionAssociation.collection_id == liked_collection.id,
+            database.CompanyCollectionAssociation.collection_id == liked_collection_id,
         )
         .first()
     )
@@ -122,6 +209,7 @@ def toggle_company_like(
         # Remove from liked collection
         db.delete(existing_association)
         db.commit()
+        cache.bump_collection_versions(liked_collection_id)
         return ToggleLikeResponse(
             company_id=company_id,
             liked=False,
@@ -130,10 +218,11 @@ def toggle_company_like(
     else:
         # Add to liked collection
         new_association = database.CompanyCollectionAssociation(
-            company_id=company_id, collection_id=liked_collection.id
+            company_id=company_id, collection_id=liked_collection_id
         )
         db.add(new_association)
         db.commit()
+        cache.bump_collection_versions(liked_collection_id)
         return ToggleLikeResponse(
             company_id=company_id, liked=True, message="Company added to liked list"
         )
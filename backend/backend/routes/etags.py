@@ -0,0 +1,46 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+# Browsers must revalidate on every use so a changed version is seen at once
+CACHE_CONTROL = "no-cache"
+
+
+def content_tag(value: Any) -> str:
+    """Tag for a small value that is already in memory"""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def strong_etag(tag: Optional[str]) -> Optional[str]:
+    return f'"{tag}"' if tag else None
+
+
+def matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether the request's If-None-Match already names this representation"""
+    if etag is None:
+        return False
+
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
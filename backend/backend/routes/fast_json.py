@@ -0,0 +1,14 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson response for trusted rows read straight from the database.
+    Anything orjson can't encode natively (asyncpg's UUID type) goes through str.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from backend import admission
+from backend.db import database, pool
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+class PoolMetricsOutput(BaseModel):
+    sync_pool: dict
+    async_pool: dict
+
+
+@router.get("/db-pool", response_model=PoolMetricsOutput)
+def get_db_pool_metrics():
+    """Connection pool saturation for this API process"""
+    return PoolMetricsOutput(
+        sync_pool=pool.pool_status(database.engine),
+        async_pool=pool.pool_status(database.async_engine.sync_engine),
+    )
+
+
+class AdmissionMetricsOutput(BaseModel):
+    outstanding_items: int
+    active_jobs: int
+    deferred_jobs: int
+    # None for a queue whose depth couldn't be read from the broker
+    queue_depth: dict[str, Optional[int]]
+    db_active_connections: int
+    limits: dict[str, int]
+    overload_action: str
+
+
+@router.get("/admission", response_model=AdmissionMetricsOutput)
+def get_admission_metrics(db: Session = Depends(database.get_db)):
+    """Transfer load measured by admission control, next to its limits"""
+    return AdmissionMetricsOutput(**admission.utilization(db))
@@ -0,0 +1,117 @@
+import base64
+import json
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import Label
+
+from backend.db import database
+from backend.db import search as search_backend
+
+# Sort keys a page can be ordered by; company id is always the tie-breaker
+SORT_KEYS = ("id", "company_name", "relevance")
+
+
+def sort_columns(db: Session, sort: Optional[str], search: Optional[str]) -> tuple:
+    """
+    Resolve a sort key to the ascending columns a page seeks on (before id).
+    Searches default to relevance, everything else to id.
+    """
+    if sort is None:
+        sort = "relevance" if search else "id"
+
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort: {sort}")
+
+    if sort == "company_name":
+        return (database.Company.company_name,)
+    if sort == "relevance" and search:
+        return search_backend.relevance_sort_columns(db, search)
+    return ()
+
+
+def encode_cursor(direction: str, values: list[Any]) -> str:
+    """Build an opaque cursor pointing just past (or before) a row"""
+    payload = json.dumps({"d": direction, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, list[Any]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload["d"], payload["v"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return direction, values
+
+
+def keyset_page(
+    query: Query,
+    sort_columns: tuple,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> tuple[list, Optional[str], Optional[str]]:
+    """
+    Fetch one page of `query` (which must select company id and name) seeking on
+    (*sort_columns, id). Without a cursor the page starts at `offset`.
+    Returns (rows, next_cursor, prev_cursor).
+    """
+    # Computed sort keys are selected under their label so cursors can carry them
+    for column in sort_columns:
+        if isinstance(column, Label):
+            query = query.add_columns(column)
+
+    labels = [column.key for column in (*sort_columns, database.Company.id)]
+    columns = [
+        column.element if isinstance(column, Label) else column
+        for column in (*sort_columns, database.Company.id)
+    ]
+    direction, values = decode_cursor(cursor) if cursor else ("next", None)
+
+    if values is not None:
+        if len(values) != len(columns):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if direction == "next":
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+
+    if direction == "next":
+        query = query.order_by(*columns)
+        if values is None:
+            query = query.offset(offset)
+    else:
+        query = query.order_by(*(column.desc() for column in columns))
+
+    # One extra row tells us whether another page exists past this one
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    def row_values(row) -> list[Any]:
+        return [getattr(row, label) for label in labels]
+
+    if direction == "next":
+        has_next = has_more
+        has_prev = values is not None or offset > 0
+    else:
+        has_next = True
+        has_prev = has_more
+
+    next_cursor = encode_cursor("next", row_values(rows[-1])) if has_next else None
+    prev_cursor = encode_cursor("prev", row_values(rows[0])) if has_prev else None
+
+    return rows, next_cursor, prev_cursor
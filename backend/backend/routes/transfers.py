@@ -1,13 +1,32 @@
+import json
+import os
+import time
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+import redis
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.db import database
-from backend.tasks.transfer_tasks import process_transfer_job
+from backend import admission, cache
+from backend.db import bulk, counts, database, transfer_jobs
+from backend.routes import etags
+from backend.routes.fast_json import FastJSONResponse
+from backend.tasks.transfer_tasks import (
+    BULK_TRANSFER_THRESHOLD,
+    process_bulk_transfer_job,
+    job_routing,
+    process_transfer_job,
+    revoke_job_tasks,
+)
+
+# Seconds between keep-alive comments on an idle job event stream
+JOB_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("JOB_EVENTS_HEARTBEAT_SECONDS", "15"))
 
 router = APIRouter(
     prefix="/transfers",
@@ -19,16 +38,25 @@ class TransferJobCreate(BaseModel):
     company_ids: list[int]
     source_collection_id: Optional[uuid.UUID] = None
     collection_id: uuid.UUID
+    # Share of the workers against other running jobs: batches per scheduler round
+    weight: int = 1
 
 
 class TransferJobCreateForCollection(BaseModel):
     source_collection_id: uuid.UUID
     collection_id: uuid.UUID
+    weight: int = 1
+    # Companies of the collection to leave out, e.g. rows deselected under select all
+    exclude_company_ids: list[int] = []
 
 
 class RemoveCompaniesRequest(BaseModel):
-    company_ids: list[int]
+    company_ids: list[int] = []
     collection_id: uuid.UUID
+    # Remove every company matching `search` instead of listing company_ids
+    all_matching: bool = False
+    search: Optional[str] = None
+    exclude_company_ids: list[int] = []
 
 
 class TransferJobItemResponse(BaseModel):
@@ -42,22 +70,70 @@ class TransferJobItemResponse(BaseModel):
     created_at: datetime
     last_attempt_at: Optional[datetime]
     attempt_count: int
+    max_attempts: int
     is_cancelled: bool
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+# Database rows are trusted, so item lists skip per-row model validation:
+# rows are read as tuples and encoded straight to JSON with orjson
+ITEM_FIELDS = tuple(TransferJobItemResponse.model_fields)
+COMPACT_ITEM_FIELDS = ("id", "company_id", "status")
+ITEM_FORMATS = ("rows", "columns")
+
+
+class TransferJobItemColumns(BaseModel):
+    """Items as parallel arrays, for format=columns"""
+
+    id: list[uuid.UUID]
+    company_id: list[int]
+    status: list[str]
+
+
+def item_columns(fields: tuple[str, ...]) -> list:
+    return [getattr(database.TransferJobItem, field) for field in fields]
+
+
 class TransferJobResponse(BaseModel):
     job_id: uuid.UUID
-    items: list[TransferJobItemResponse]
+    job_type: str = transfer_jobs.TRANSFER
+    items: list[TransferJobItemResponse] = []
     total_items: int
     pending_count: int
     processing_count: int
     success_count: int
     error_count: int
     cancelled_count: int
+    dead_letter_count: int = 0
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
     celery_task_id: Optional[str] = None
+    # Held back by admission control until the transfer workers have room
+    deferred: bool = False
+    # Pass back as `since` to get only the items changed after this response
+    next_since: Optional[int] = None
+
+
+def admit_job(db: Session, item_count: int) -> bool:
+    """
+    Whether a new job can start now. False means it should be created
+    deferred; an overloaded system in reject mode answers 429 instead.
+    """
+    decision = admission.check(db, item_count)
+    if decision.admitted:
+        return True
+    if not decision.retryable:
+        raise HTTPException(status_code=413, detail=decision.reason)
+    if admission.ADMISSION_OVERLOAD_ACTION == "defer":
+        return False
+    raise HTTPException(
+        status_code=429,
+        detail=decision.reason,
+        headers={"Retry-After": str(admission.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
 
 
 @router.post("/jobs", response_model=TransferJobResponse)
@@ -67,6 +143,30 @@ def create_transfer_job(
 ):
     """Create a new transfer job with multiple company transfers"""
     job_id = uuid.uuid4()
+    start_now = admit_job(db, len(transfer_request.company_ids))
+
+    if len(transfer_request.company_ids) >= BULK_TRANSFER_THRESHOLD:
+        bulk.copy_company_ids_to_staging(db, transfer_request.company_ids)
+        item_count = bulk.merge_staged_transfer_items(
+            db,
+            job_id,
+            transfer_request.source_collection_id,
+            transfer_request.collection_id,
+        )
+        transfer_jobs.add_transfer_job(
+            db,
+            job_id,
+            transfer_request.source_collection_id,
+            transfer_request.collection_id,
+            item_count,
+            deferred=not start_now,
+        )
+        db.commit()
+
+        if not start_now:
+            return build_transfer_job_response(db, job_id)
+        celery_task = process_bulk_transfer_job.delay(str(job_id))
+        return build_transfer_job_response(db, job_id, celery_task.id)
 
     transfer_items = []
     for company_id in transfer_request.company_ids:
@@ -80,15 +180,27 @@ def create_transfer_job(
         db.add(transfer_item)
         transfer_items.append(transfer_item)
 
+    transfer_jobs.add_transfer_job(
+        db,
+        job_id,
+        transfer_request.source_collection_id,
+        transfer_request.collection_id,
+        len(transfer_items),
+        deferred=not start_now,
+    )
     db.commit()
 
-    try:
-        batch_size = 100
-        celery_task = process_transfer_job.delay(str(job_id), batch_size)
-    except Exception:
-        raise
+    if not start_now:
+        return build_transfer_job_response(db, job_id)
+
+    batch_size = 100
+    celery_task = process_transfer_job.apply_async(
+        (str(job_id), batch_size),
+        {"weight": transfer_request.weight},
+        **job_routing(len(transfer_items)),
+    )
 
-    return get_transfer_job_status(job_id, db, celery_task.id)
+    return build_transfer_job_response(db, job_id, celery_task.id)
 
 
 @router.post("/jobs/collection", response_model=TransferJobResponse)
@@ -103,12 +215,48 @@ def create_transfer_job_for_collection(
     if not transfer_request.source_collection_id:
         raise HTTPException(status_code=400, detail="Source collection ID is required")
 
+    # The maintained counter, not a scan; it only sizes the job, the items
+    # come from the associations themselves
+    source_size = counts.collection_size(db, transfer_request.source_collection_id)
+    start_now = admit_job(db, source_size)
+
+    if source_size >= BULK_TRANSFER_THRESHOLD:
+        # Stage and merge inside Postgres instead of building ORM objects
+        bulk.stage_matching_collection_company_ids(
+            db,
+            transfer_request.source_collection_id,
+            exclude_company_ids=transfer_request.exclude_company_ids,
+        )
+        item_count = bulk.merge_staged_transfer_items(
+            db,
+            job_id,
+            transfer_request.source_collection_id,
+            transfer_request.collection_id,
+        )
+        transfer_jobs.add_transfer_job(
+            db,
+            job_id,
+            transfer_request.source_collection_id,
+            transfer_request.collection_id,
+            item_count,
+            deferred=not start_now,
+        )
+        db.commit()
+
+        if not start_now:
+            return build_transfer_job_response(db, job_id)
+        celery_task = process_bulk_transfer_job.delay(str(job_id))
+        return build_transfer_job_response(db, job_id, celery_task.id)
+
     # Get companies from specific collection
     company_associations = (
         db.query(database.CompanyCollectionAssociation.company_id)
         .filter(
             database.CompanyCollectionAssociation.collection_id
-            == transfer_request.source_collection_id
+            == transfer_request.source_collection_id,
+            database.CompanyCollectionAssociation.company_id.notin_(
+                transfer_request.exclude_company_ids
+            ),
         )
         .all()
     )
@@ -126,15 +274,27 @@ def create_transfer_job_for_collection(
     ]
 
     db.bulk_save_objects(transfer_items)
+    transfer_jobs.add_transfer_job(
+        db,
+        job_id,
+        transfer_request.source_collection_id,
+        transfer_request.collection_id,
+        len(transfer_items),
+        deferred=not start_now,
+    )
     db.commit()
 
-    try:
-        batch_size = 100
-        celery_task = process_transfer_job.delay(str(job_id), batch_size)
-    except Exception:
-        raise
+    if not start_now:
+        return build_transfer_job_response(db, job_id)
 
-    return get_transfer_job_status(job_id, db, celery_task.id)
+    batch_size = 100
+    celery_task = process_transfer_job.apply_async(
+        (str(job_id), batch_size),
+        {"weight": transfer_request.weight},
+        **job_routing(len(transfer_items)),
+    )
+
+    return build_transfer_job_response(db, job_id, celery_task.id)
 
 
 @router.post("/remove")
@@ -154,34 +314,28 @@ def remove_companies_from_collection(
         if not collection:
             raise HTTPException(status_code=404, detail="Collection not found")
 
-        # Find existing associations to remove
-        associations_to_remove = (
-            db.query(database.CompanyCollectionAssociation)
-            .filter(
-                database.CompanyCollectionAssociation.company_id.in_(
-                    remove_request.company_ids
-                ),
-                database.CompanyCollectionAssociation.collection_id
-                == remove_request.collection_id,
+        if remove_request.all_matching:
+            removed_company_ids = bulk.delete_matching_collection_companies(
+                db,
+                remove_request.collection_id,
+                search=remove_request.search,
+                exclude_company_ids=remove_request.exclude_company_ids,
+            )
+        else:
+            removed_company_ids = bulk.delete_collection_companies(
+                db, remove_request.collection_id, remove_request.company_ids
             )
-            .all()
-        )
 
-        if not associations_to_remove:
+        if not removed_company_ids:
+            db.rollback()
             return {
                 "message": "No companies found in the specified collection",
                 "removed_count": 0,
                 "company_ids": [],
             }
 
-        # Get the company IDs that were actually removed
-        removed_company_ids = [assoc.company_id for assoc in associations_to_remove]
-
-        # Remove the associations
-        for association in associations_to_remove:
-            db.delete(association)
-
         db.commit()
+        cache.bump_collection_versions(remove_request.collection_id)
 
         return {
             "message": f"Successfully removed {len(removed_company_ids)} companies from collection",
@@ -198,6 +352,63 @@ def remove_companies_from_collection(
         )
 
 
+@router.post("/jobs/removal", response_model=TransferJobResponse)
+def create_removal_job(
+    remove_request: RemoveCompaniesRequest,
+    db: Session = Depends(database.get_db),
+):
+    """
+    Remove companies from a collection in the background, tracked like a
+    transfer job so large removals report progress and can be cancelled
+    """
+    collection = db.get(database.CompanyCollection, remove_request.collection_id)
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+    # Sized before staging, like the transfer routes; the request may name
+    # companies already gone, so this can only overestimate the job
+    if remove_request.all_matching:
+        requested_count = counts.collection_size(db, remove_request.collection_id)
+    else:
+        requested_count = len(set(remove_request.company_ids))
+    start_now = admit_job(db, requested_count)
+
+    job_id = uuid.uuid4()
+
+    if remove_request.all_matching:
+        bulk.stage_matching_collection_company_ids(
+            db,
+            remove_request.collection_id,
+            search=remove_request.search,
+            exclude_company_ids=remove_request.exclude_company_ids,
+        )
+    else:
+        bulk.copy_company_ids_to_staging(db, remove_request.company_ids)
+
+    # One item per company currently in the collection; the rest are no-ops
+    item_count = bulk.merge_staged_transfer_items(
+        db, job_id, None, remove_request.collection_id, members_only=True
+    )
+    transfer_jobs.add_transfer_job(
+        db,
+        job_id,
+        None,
+        remove_request.collection_id,
+        item_count,
+        job_type=transfer_jobs.REMOVAL,
+        deferred=not start_now,
+    )
+    db.commit()
+
+    celery_task_id = None
+    if item_count and start_now:
+        celery_task_id = process_transfer_job.apply_async(
+            (str(job_id),), **job_routing(item_count)
+        ).id
+
+    return build_transfer_job_response(db, job_id, celery_task_id)
+
+
 @router.post("/jobs/{job_id}/retry")
 def retry_failed_batches(job_id: uuid.UUID):
     """Retry failed batches for a job"""
@@ -216,61 +427,261 @@ def retry_failed_batches(job_id: uuid.UUID):
 
 
 @router.get("/jobs/{job_id}", response_model=TransferJobResponse)
-def get_transfer_job_status(
+async def get_transfer_job_status(
+    request: Request,
+    response: Response,
     job_id: uuid.UUID,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     celery_task_id: Optional[str] = None,
+    include_items: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    since: Optional[int] = Query(None, ge=0),
 ):
-    """Get the status of a transfer job and all its items"""
-    items = (
-        db.query(database.TransferJobItem)
-        .filter(database.TransferJobItem.job_id == job_id)
-        .all()
+    """
+    Get the status of a transfer job, optionally with a page of its items.
+    With `since` (a previous response's next_since) only the items changed
+    after it are returned, unpaginated.
+    """
+    tag = await cache.version_tag(
+        [cache.transfer_job_version_key(job_id)],
+        {
+            "job_id": str(job_id),
+            "celery_task_id": celery_task_id,
+            "include_items": include_items,
+            "offset": offset,
+            "limit": limit,
+            "since": since,
+        },
+    )
+    etag = etags.strong_etag(tag)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
+    etags.set_etag(response, etag)
+
+    return await db.run_sync(
+        build_transfer_job_response,
+        job_id,
+        celery_task_id,
+        include_items=include_items,
+        offset=offset,
+        limit=limit,
+        since=since,
     )
 
-    if not items:
-        raise HTTPException(status_code=404, detail="Transfer job not found")
 
-    status_counts = {
-        "pending": 0,
-        "processing": 0,
-        "success": 0,
-        "error": 0,
-        "cancelled": 0,
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def build_job_events_snapshot(db: Session, job_id: uuid.UUID) -> dict:
+    """Counters plus the companies still waiting, to start an event stream from"""
+    job = build_transfer_job_response(db, job_id)
+
+    active_items = {status: [] for status in transfer_jobs.ACTIVE_STATUSES}
+    rows = db.execute(
+        select(database.TransferJobItem.company_id, database.TransferJobItem.status)
+        .where(database.TransferJobItem.job_id == job_id)
+        .where(database.TransferJobItem.status.in_(transfer_jobs.ACTIVE_STATUSES))
+    )
+    for company_id, status in rows:
+        active_items[status].append(company_id)
+
+    return {
+        "job": job.model_dump(mode="json", exclude={"items"}),
+        "active_items": active_items,
     }
 
-    for item in items:
-        status_counts[item.status] += 1
+
+def job_finished(counters: dict) -> bool:
+    if any(counters[f"{status}_count"] for status in transfer_jobs.ACTIVE_STATUSES):
+        return False
+    # Errors of an unfinished job are about to be requeued
+    return counters["finished_at"] is not None or not counters["error_count"]
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_transfer_job_events(
+    request: Request,
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Server-Sent Events for a job: a snapshot of its counters and active items,
+    then item status and counter changes as batches commit. The stream ends
+    with a "done" event once no items are pending or processing.
+    """
+    pubsub = cache.get_async_redis().pubsub()
+    try:
+        # Subscribe before reading the snapshot so no change falls in between
+        await pubsub.subscribe(cache.job_events_channel(job_id))
+        snapshot = await db.run_sync(build_job_events_snapshot, job_id)
+    except redis.RedisError as e:
+        await pubsub.aclose()
+        raise HTTPException(status_code=503, detail=f"Job events unavailable: {e}")
+    except Exception:
+        await pubsub.aclose()
+        raise
+    finally:
+        # Don't hold a database connection for the life of the stream
+        await db.close()
+
+    async def events():
+        try:
+            yield format_sse("snapshot", snapshot)
+            if job_finished(snapshot["job"]):
+                yield format_sse("done", {"job_id": str(job_id)})
+                return
+
+            last_sent = time.monotonic()
+            while not await request.is_disconnected():
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+                if message is None:
+                    if time.monotonic() - last_sent >= JOB_EVENTS_HEARTBEAT_SECONDS:
+                        yield ": keep-alive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+
+                event = json.loads(message["data"])
+                event_type = event.pop("type")
+                yield format_sse(event_type, event)
+                last_sent = time.monotonic()
+
+                if event_type == "counters" and job_finished(event):
+                    yield format_sse("done", {"job_id": str(job_id)})
+                    return
+        except redis.RedisError as e:
+            # EventSource reconnects and starts again from a fresh snapshot
+            print(f"Job events stream for {job_id} lost Redis: {e}")
+        finally:
+            await pubsub.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def build_transfer_job_response(
+    db: Session,
+    job_id: uuid.UUID,
+    celery_task_id: Optional[str] = None,
+    include_items: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    since: Optional[int] = None,
+) -> TransferJobResponse:
+    job = db.get(database.TransferJob, job_id)
+
+    if job:
+        status_counts = {
+            status: getattr(job, f"{status}_count")
+            for status in transfer_jobs.JOB_STATUSES
+        }
+        total_items = job.total_count
+    else:
+        # Jobs created before transfer_jobs existed: count the items in SQL
+        rows = (
+            db.query(database.TransferJobItem.status, func.count())
+            .filter(database.TransferJobItem.job_id == job_id)
+            .group_by(database.TransferJobItem.status)
+            .all()
+        )
+
+        if not rows:
+            raise HTTPException(status_code=404, detail="Transfer job not found")
+
+        status_counts = {status: 0 for status in transfer_jobs.JOB_STATUSES}
+        for status, count in rows:
+            status_counts[status] = count
+        total_items = sum(count for _, count in rows)
+
+    items = []
+    if since is not None:
+        items = (
+            db.query(database.TransferJobItem)
+            .filter(
+                database.TransferJobItem.job_id == job_id,
+                database.TransferJobItem.change_seq > since,
+            )
+            .order_by(database.TransferJobItem.change_seq, database.TransferJobItem.id)
+            .all()
+        )
+        next_since = items[-1].change_seq if items else since
+    else:
+        next_since = transfer_jobs.change_cursor(db, job_id)
+        if include_items:
+            items_query = (
+                db.query(database.TransferJobItem)
+                .filter(database.TransferJobItem.job_id == job_id)
+                .order_by(
+                    database.TransferJobItem.created_at, database.TransferJobItem.id
+                )
+                .offset(offset)
+            )
+            if limit is not None:
+                items_query = items_query.limit(limit)
+            items = items_query.all()
 
     return TransferJobResponse(
         job_id=job_id,
+        job_type=job.job_type if job else transfer_jobs.TRANSFER,
         items=items,
-        total_items=len(items),
+        total_items=total_items,
         pending_count=status_counts["pending"],
         processing_count=status_counts["processing"],
         success_count=status_counts["success"],
         error_count=status_counts["error"],
         cancelled_count=status_counts["cancelled"],
+        dead_letter_count=status_counts["dead_letter"],
+        started_at=job.started_at if job else None,
+        finished_at=job.finished_at if job else None,
         celery_task_id=celery_task_id,
+        deferred=bool(job and job.deferred_at),
+        next_since=next_since,
     )
 
 
-@router.get("/jobs/{job_id}/items", response_model=list[TransferJobItemResponse])
+@router.get(
+    "/jobs/{job_id}/items",
+    # Rows are serialized directly; the schema documents both formats
+    response_model=None,
+    responses={
+        200: {"model": Union[list[TransferJobItemResponse], TransferJobItemColumns]}
+    },
+)
 def get_transfer_job_items(
     job_id: uuid.UUID,
+    item_format: str = Query(
+        "rows",
+        alias="format",
+        description='"rows" for one object per item, "columns" for parallel '
+        "arrays of id, company_id and status",
+    ),
     db: Session = Depends(database.get_db),
 ):
     """Get all items for a specific transfer job"""
-    items = (
-        db.query(database.TransferJobItem)
-        .filter(database.TransferJobItem.job_id == job_id)
-        .all()
-    )
+    if item_format not in ITEM_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format: {item_format}"
+        )
 
-    if not items:
+    fields = ITEM_FIELDS if item_format == "rows" else COMPACT_ITEM_FIELDS
+    rows = db.execute(
+        select(*item_columns(fields)).where(database.TransferJobItem.job_id == job_id)
+    ).all()
+
+    if not rows:
         raise HTTPException(status_code=404, detail="Transfer job not found")
 
-    return items
+    if item_format == "columns":
+        return FastJSONResponse(
+            {field: list(values) for field, values in zip(fields, zip(*rows))}
+        )
+    return FastJSONResponse([dict(zip(fields, row)) for row in rows])
 
 
 @router.put("/jobs/{job_id}/items/{item_id}/status")
@@ -282,24 +693,29 @@ def update_transfer_item_status(
     db: Session = Depends(database.get_db),
 ):
     """Update the status of a specific transfer item"""
+    if status not in transfer_jobs.JOB_STATUSES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown status {status!r}, expected one of "
+            f"{', '.join(transfer_jobs.JOB_STATUSES)}",
+        )
+
     item = (
         db.query(database.TransferJobItem)
         .filter(
             database.TransferJobItem.job_id == job_id,
             database.TransferJobItem.id == item_id,
         )
+        .with_for_update()
         .first()
     )
 
     if not item:
         raise HTTPException(status_code=404, detail="Transfer item not found")
 
-    item.status = status
-    item.error_message = error_message
-    item.last_attempt_at = datetime.utcnow()
-    item.attempt_count += 1
-
+    transfer_jobs.set_item_status(db, item, status, error_message)
     db.commit()
+    transfer_jobs.publish_progress(db, job_id, [item.company_id])
 
     return {"message": "Status updated successfully"}
 
@@ -310,70 +726,83 @@ def cancel_transfer_job(
     db: Session = Depends(database.get_db),
 ):
     """Cancel all pending items in a transfer job"""
-    items = (
-        db.query(database.TransferJobItem)
-        .filter(
-            database.TransferJobItem.job_id == job_id,
-            database.TransferJobItem.status.in_(["pending", "processing"]),
-        )
-        .all()
-    )
-
-    for item in items:
-        item.status = "cancelled"
-        item.is_cancelled = True
+    # Flag first so in-flight workers stop at their next chunk
+    cache.set_job_cancelled(job_id)
 
+    cancelled_count = transfer_jobs.cancel_items(db, job_id)
     db.commit()
 
-    return {"message": f"Cancelled {len(items)} transfer items"}
+    # Queued batches would only find cancelled items; drop them from the queue
+    revoked_count = revoke_job_tasks(job_id)
+
+    transfer_jobs.publish_progress(db, job_id)
+
+    return {
+        "message": f"Cancelled {cancelled_count} transfer items",
+        "cancelled_count": cancelled_count,
+        "revoked_batches": revoked_count,
+    }
 
 
 @router.get(
     "/companies/{company_id}/status", response_model=list[TransferJobItemResponse]
 )
-def get_company_transfer_status(
+async def get_company_transfer_status(
     company_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
     """Get all transfer statuses for a specific company"""
-    items = (
-        db.query(database.TransferJobItem)
-        .filter(database.TransferJobItem.company_id == company_id)
+    items = await db.scalars(
+        select(database.TransferJobItem)
+        .where(database.TransferJobItem.company_id == company_id)
         .order_by(database.TransferJobItem.created_at.desc())
-        .all()
     )
 
-    return items
+    return items.all()
 
 
 @router.post(
     "/companies/status", response_model=dict[int, list[TransferJobItemResponse]]
 )
-def get_companies_transfer_status(
+async def get_companies_transfer_status(
+    request: Request,
     company_ids: list[int],
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    """Get transfer statuses for multiple companies in a single query"""
-    items = (
-        db.query(database.TransferJobItem)
-        .filter(database.TransferJobItem.company_id.in_(company_ids))
-        .order_by(database.TransferJobItem.created_at.desc())
-        .all()
+    """
+    Get transfer statuses for multiple companies in a single query.
+    A read despite the POST, so it honours If-None-Match like the GET routes.
+    """
+    # Only the jobs these companies are in; the set itself is part of the tag,
+    # so a new job for one of them changes it as well
+    job_ids = await db.scalars(
+        select(database.TransferJobItem.job_id)
+        .where(database.TransferJobItem.company_id.in_(company_ids))
+        .distinct()
+    )
+    tag = await cache.version_tag(
+        [cache.transfer_job_version_key(job_id) for job_id in job_ids],
+        {"company_ids": company_ids},
     )
+    etag = etags.strong_etag(tag)
+    if etags.matches(request, etag):
+        return etags.not_modified(etag)
 
-    # Group by company_id
-    result = {}
-    for item in items:
-        if item.company_id not in result:
-            result[item.company_id] = []
-        result[item.company_id].append(item)
+    rows = await db.execute(
+        select(*item_columns(ITEM_FIELDS))
+        .where(database.TransferJobItem.company_id.in_(company_ids))
+        .order_by(database.TransferJobItem.created_at.desc())
+    )
 
     # Ensure all requested company_ids are in the result (even if empty)
-    for company_id in company_ids:
-        if company_id not in result:
-            result[company_id] = []
-
-    return result
+    result = {company_id: [] for company_id in company_ids}
+    company_id_index = ITEM_FIELDS.index("company_id")
+    for row in rows:
+        result[row[company_id_index]].append(dict(zip(ITEM_FIELDS, row)))
+
+    json_response = FastJSONResponse(result)
+    etags.set_etag(json_response, etag)
+    return json_response
 
 
 @router.get("/tasks/{task_id}/status")
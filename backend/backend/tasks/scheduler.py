@@ -0,0 +1,200 @@
+import json
+import os
+import time
+import uuid
+from typing import Union
+
+import redis
+
+from backend import cache, celery_config
+from backend.celery_app import celery_app
+
+# Release the batches of concurrent jobs round-robin instead of queueing each
+# job's batches behind the previous job's
+FAIR_SCHEDULING_ENABLED = os.getenv("TRANSFER_FAIR_SCHEDULING", "true").lower() in (
+    "1",
+    "true",
+)
+# Scheduled batches in flight per queue; enough to keep that queue's workers busy,
+# so set each to the worker processes consuming it (replicas x concurrency)
+SCHEDULER_WINDOW = int(os.getenv("TRANSFER_SCHEDULER_WINDOW", "16"))
+SCHEDULER_QUEUE_WINDOWS = {
+    celery_config.INTERACTIVE_QUEUE: int(
+        os.getenv("TRANSFER_SCHEDULER_INTERACTIVE_WINDOW", SCHEDULER_WINDOW)
+    ),
+    celery_config.BULK_QUEUE: int(
+        os.getenv("TRANSFER_SCHEDULER_BULK_WINDOW", SCHEDULER_WINDOW)
+    ),
+}
+# In-flight batches that never reported back (lost worker) free their slot after this
+SCHEDULER_STALE_SECONDS = float(os.getenv("TRANSFER_SCHEDULER_STALE_SECONDS", "600"))
+# A job of weight w gets up to w batches per round
+SCHEDULER_MAX_WEIGHT = 10
+
+JobId = Union[uuid.UUID, str]
+
+
+def _ring_key(queue: str) -> str:
+    return f"scheduler_ring:{queue}"
+
+
+def _weights_key(queue: str) -> str:
+    return f"scheduler_weights:{queue}"
+
+
+def _in_flight_key(queue: str) -> str:
+    return f"scheduler_in_flight:{queue}"
+
+
+def _lock_key(queue: str) -> str:
+    return f"scheduler_lock:{queue}"
+
+
+def _batches_key(job_id: JobId) -> str:
+    return f"scheduler_batches:{job_id}"
+
+
+def queue_window(queue: str) -> int:
+    return SCHEDULER_QUEUE_WINDOWS.get(queue, SCHEDULER_WINDOW)
+
+
+def _lock(client: redis.Redis, queue: str):
+    return client.lock(_lock_key(queue), timeout=30, blocking_timeout=5)
+
+
+def submit_batches(
+    job_id: JobId,
+    task_name: str,
+    batches: list[dict],
+    queue: str,
+    priority: int,
+    weight: int = 1,
+) -> bool:
+    """
+    Hand a job's batches to the scheduler, which releases them to `queue` in
+    turn with the other active jobs. Returns False when Redis is unavailable,
+    so the caller sends the batches itself.
+    """
+    if not batches:
+        return True
+
+    weight = max(1, min(weight, SCHEDULER_MAX_WEIGHT))
+    entries = [
+        json.dumps({"task": task_name, "priority": priority, "batch": batch})
+        for batch in batches
+    ]
+    client = cache.get_redis()
+    try:
+        with _lock(client, queue):
+            pipeline = client.pipeline()
+            pipeline.rpush(_batches_key(job_id), *entries)
+            pipeline.expire(_batches_key(job_id), cache.JOB_STATE_TTL_SECONDS)
+            # hset reports a new field, i.e. a job not in the ring yet
+            pipeline.hset(_weights_key(queue), str(job_id), weight)
+            _, _, is_new_job = pipeline.execute()
+            if is_new_job:
+                client.rpush(_ring_key(queue), str(job_id))
+    except redis.RedisError as e:
+        print(f"Scheduler unavailable, sending batches of job {job_id} directly: {e}")
+        return False
+
+    dispatch(queue)
+    return True
+
+
+def dispatch(queue: str) -> int:
+    """
+    Fill the queue's free in-flight slots, taking up to `weight` batches from
+    each active job in turn. Returns the number of batches released.
+    """
+    client = cache.get_redis()
+    released = 0
+    try:
+        with _lock(client, queue):
+            now = time.time()
+            client.zremrangebyscore(
+                _in_flight_key(queue), "-inf", now - SCHEDULER_STALE_SECONDS
+            )
+            free = queue_window(queue) - client.zcard(_in_flight_key(queue))
+
+            while free > 0:
+                # Rotate the ring: the job at the head goes to the back
+                job_id = client.lmove(_ring_key(queue), _ring_key(queue))
+                if job_id is None:
+                    break
+                job_id = job_id.decode()
+
+                weight = int(client.hget(_weights_key(queue), job_id) or 1)
+                entries = [
+                    entry
+                    for entry in (
+                        client.lpop(_batches_key(job_id))
+                        for _ in range(min(weight, free))
+                    )
+                    if entry is not None
+                ]
+                if not entries:
+                    client.lrem(_ring_key(queue), 0, job_id)
+                    client.hdel(_weights_key(queue), job_id)
+                    continue
+
+                task_ids = [_send(queue, json.loads(entry)) for entry in entries]
+                client.zadd(_in_flight_key(queue), dict.fromkeys(task_ids, now))
+                cache.add_job_task_ids(job_id, task_ids)
+                free -= len(task_ids)
+                released += len(task_ids)
+    except redis.exceptions.LockError as e:
+        # Another dispatch holds the queue; it fills the same slots
+        print(f"Scheduler busy for queue {queue}: {e}")
+    except redis.RedisError as e:
+        print(f"Scheduler dispatch failed for queue {queue}: {e}")
+
+    return released
+
+
+def _send(queue: str, entry: dict) -> str:
+    task_id = str(uuid.uuid4())
+    celery_app.tasks[entry["task"]].apply_async(
+        ({**entry["batch"], "scheduled_queue": queue},),
+        queue=queue,
+        priority=entry["priority"],
+        task_id=task_id,
+    )
+    return task_id
+
+
+def batch_finished(queue: str, task_id: str):
+    """Free a finished batch's slot and release the next batches"""
+    try:
+        cache.get_redis().zrem(_in_flight_key(queue), task_id)
+    except redis.RedisError as e:
+        print(f"Failed to release scheduler slot {task_id}: {e}")
+        return
+    dispatch(queue)
+
+
+def drop_job(job_id: JobId) -> list[str]:
+    """
+    Forget a job's unreleased batches and free the slots of its released ones,
+    which won't report back once revoked. Its ring entry goes on the next turn.
+    Returns the job's task ids, for the caller to revoke.
+    """
+    client = cache.get_redis()
+    try:
+        client.delete(_batches_key(job_id))
+    except redis.RedisError as e:
+        print(f"Failed to drop scheduled batches of job {job_id}: {e}")
+
+    # Taken after the batches are gone, so no new release is missed
+    task_ids = cache.pop_job_task_ids(job_id)
+    if not task_ids:
+        return task_ids
+    for queue in SCHEDULER_QUEUE_WINDOWS:
+        try:
+            freed = client.zrem(_in_flight_key(queue), *task_ids)
+        except redis.RedisError as e:
+            print(f"Failed to release scheduler slots of job {job_id}: {e}")
+            continue
+        if freed:
+            dispatch(queue)
+    return task_ids
@@ -1,150 +1,630 @@
+import os
+import random
+import time
 import uuid
+from collections import Counter
 from datetime import datetime
+from typing import Optional
 
 from celery import current_task
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
+from backend import cache, celery_config
 from backend.celery_app import celery_app
+from backend.db import transfer_jobs
 from backend.db.database import SessionLocal
+from backend.db.registry import collection_registry
+from backend.tasks import scheduler
 
+# Transfers at least this large are staged and merged with set-based SQL
+BULK_TRANSFER_THRESHOLD = int(os.getenv("BULK_TRANSFER_THRESHOLD", "10000"))
+# "bulk" writes each batch with set-based statements; "per_row" commits per company
+BATCH_WRITE_MODE = os.getenv("TRANSFER_BATCH_WRITE_MODE", "bulk")
+# Failed items of a batch are resubmitted on their own after a backoff
+AUTO_RETRY_FAILED_ITEMS = os.getenv("TRANSFER_AUTO_RETRY", "true").lower() in (
+    "1",
+    "true",
+)
+RETRY_BACKOFF_BASE_SECONDS = float(
+    os.getenv("TRANSFER_RETRY_BACKOFF_BASE_SECONDS", "2")
+)
+RETRY_BACKOFF_MAX_SECONDS = float(
+    os.getenv("TRANSFER_RETRY_BACKOFF_MAX_SECONDS", "300")
+)
+RETRY_BATCH_SIZE = 100
+# Jobs up to this many items run on the interactive queue, larger ones on bulk
+INTERACTIVE_MAX_ITEMS = int(os.getenv("TRANSFER_INTERACTIVE_MAX_ITEMS", "1000"))
+# Redis serves lower priorities first
+INTERACTIVE_PRIORITY = 0
+BULK_PRIORITY = 6
+# Batches handed to the scheduler per round trip while a job is planned
+SCHEDULER_SUBMIT_BATCHES = 50
+# "batches" sends one message per batch of ids; "drain" sends a few drain tasks
+# that claim chunks of pending items straight from the table
+DISPATCH_MODE = os.getenv("TRANSFER_DISPATCH_MODE", "batches")
+DRAIN_WORKERS = int(os.getenv("TRANSFER_DRAIN_WORKERS", "4"))
+# Drains and bulk merges hand over to a fresh task before the time limits hit
+DRAIN_TIME_BUDGET_SECONDS = float(
+    os.getenv("TRANSFER_DRAIN_TIME_BUDGET_SECONDS", "200")
+)
 
-@celery_app.task(bind=True, name="backend.tasks.transfer_tasks.process_transfer_batch")
-def process_transfer_batch(self, batch_data: dict):
+
+def _lock_batch_items(db, job_id: uuid.UUID, company_ids: list, collection_id):
     """
-    Process a batch of transfer items as a single unit
-    batch_data contains: {
-        'job_id': str,
-        'company_ids': List[int],
-        'source_collection_id': Optional[str],
-        'collection_id': str,
-        'batch_number': int
-    }
+    Lock a batch's live items, so a cancel either waits for this batch or takes
+    its items out of it. Returns their ids, company ids and statuses.
     """
-    db = SessionLocal()
-    try:
-        from backend.db.database import CompanyCollectionAssociation, TransferJobItem
+    from backend.db.database import TransferJobItem
 
-        job_id = batch_data["job_id"]
-        company_ids = batch_data["company_ids"]
-        source_collection_id = batch_data.get("source_collection_id")
-        collection_id = batch_data["collection_id"]
-        batch_number = batch_data["batch_number"]
+    return db.execute(
+        select(TransferJobItem.id, TransferJobItem.company_id, TransferJobItem.status)
+        .where(
+            TransferJobItem.job_id == job_id,
+            TransferJobItem.collection_id == collection_id,
+            TransferJobItem.company_id.in_(company_ids),
+            TransferJobItem.is_cancelled == False,
+        )
+        .with_for_update()
+    ).all()
 
-        print(f"Processing batch {batch_number} with {len(company_ids)} companies")
 
-        # Update task status
-        current_task.update_state(
-            state="PROGRESS",
-            meta={
-                "current": 0,
-                "total": len(company_ids),
-                "status": f"Processing batch {batch_number}...",
-            },
+def _mark_items_succeeded(db, job_id: uuid.UUID, locked_items: list):
+    """
+    Move the job counters and mark the locked items as done. Both take the job's
+    row lock, which the items' change stamps need, so call this last: only the
+    tail of a batch then waits for the job's other batches.
+    """
+    from backend.db.database import TransferJobItem
+
+    transfer_jobs.record_status_changes(
+        db, job_id, Counter((item.status, "success") for item in locked_items)
+    )
+    db.execute(
+        update(TransferJobItem)
+        .where(TransferJobItem.id.in_([item.id for item in locked_items]))
+        .values(
+            status="success",
+            error_message=None,
+            last_attempt_at=datetime.utcnow(),
+            attempt_count=TransferJobItem.attempt_count + 1,
         )
+        .execution_options(synchronize_session=False)
+    )
 
-        success_count = 0
-        error_count = 0
-        errors = []
 
-        # Bulk check which companies are already in the target collection
-        existing_associations = (
-            db.query(CompanyCollectionAssociation.company_id)
-            .filter(CompanyCollectionAssociation.company_id.in_(company_ids))
-            .filter(CompanyCollectionAssociation.collection_id == collection_id)
-            .all()
-        )
-        existing_company_ids = {assoc.company_id for assoc in existing_associations}
+def _write_batch_bulk(db, job_id: uuid.UUID, company_ids: list, collection_id):
+    """
+    Apply a whole batch with set-based statements inside the caller's
+    transaction. Returns (transferred company ids, newly inserted company ids).
+    """
+    from backend.db.database import CompanyCollectionAssociation, TransferJobItem
 
-        print(
-            f"Batch {batch_number}: {len(existing_company_ids)} companies already in target collection"
-        )
+    locked_items = _lock_batch_items(db, job_id, company_ids, collection_id)
+    if not locked_items:
+        return set(), set()
 
-        # Process each company in the batch
-        for i, company_id in enumerate(company_ids):
-            try:
-                # Get the transfer item for this company
-                transfer_item = (
-                    db.query(TransferJobItem)
-                    .filter(
-                        TransferJobItem.job_id == uuid.UUID(job_id),
-                        TransferJobItem.company_id == company_id,
-                        TransferJobItem.collection_id == collection_id,
-                    )
-                    .first()
+    # Add every missing association in one statement, sourced from the locked
+    # items so companies without a live transfer item are never inserted
+    batch_companies = (
+        select(TransferJobItem.company_id, TransferJobItem.collection_id)
+        .where(TransferJobItem.id.in_([item.id for item in locked_items]))
+        .distinct()
+    )
+    insert_stmt = (
+        pg_insert(CompanyCollectionAssociation)
+        .from_select(["company_id", "collection_id"], batch_companies)
+        .on_conflict_do_nothing(index_elements=["company_id", "collection_id"])
+        .returning(CompanyCollectionAssociation.company_id)
+    )
+    inserted_company_ids = set(db.execute(insert_stmt).scalars())
+
+    _mark_items_succeeded(db, job_id, locked_items)
+
+    return {item.company_id for item in locked_items}, inserted_company_ids
+
+
+def _remove_batch(db, job_id: uuid.UUID, company_ids: list, collection_id):
+    """
+    Remove a batch of a removal job's companies from its collection inside the
+    caller's transaction. Returns (processed company ids, removed company ids).
+    """
+    from backend.db import bulk
+
+    locked_items = _lock_batch_items(db, job_id, company_ids, collection_id)
+    if not locked_items:
+        return set(), set()
+    processed_company_ids = [item.company_id for item in locked_items]
+
+    # Only companies with an item of this job are removed
+    removed_company_ids = bulk.delete_collection_companies(
+        db, collection_id, processed_company_ids
+    )
+
+    _mark_items_succeeded(db, job_id, locked_items)
+
+    return set(processed_company_ids), set(removed_company_ids)
+
+
+def _write_batch_per_row(db, job_id: uuid.UUID, company_ids: list, collection_id):
+    """
+    Apply a batch one company at a time, isolating failures to their row.
+    Returns (success count, error count, errors).
+    """
+    from backend.db.database import CompanyCollectionAssociation, TransferJobItem
+
+    success_count = 0
+    error_count = 0
+    errors = []
+
+    # Bulk check which companies are already in the target collection
+    existing_associations = (
+        db.query(CompanyCollectionAssociation.company_id)
+        .filter(CompanyCollectionAssociation.company_id.in_(company_ids))
+        .filter(CompanyCollectionAssociation.collection_id == collection_id)
+        .all()
+    )
+    existing_company_ids = {assoc.company_id for assoc in existing_associations}
+
+    for company_id in company_ids:
+        transfer_item = None
+        try:
+            # Get the transfer item for this company
+            transfer_item = (
+                db.query(TransferJobItem)
+                .filter(
+                    TransferJobItem.job_id == job_id,
+                    TransferJobItem.company_id == company_id,
+                    TransferJobItem.collection_id == collection_id,
                 )
+                .with_for_update()
+                .first()
+            )
 
-                if not transfer_item:
-                    error_count += 1
-                    errors.append(f"Company {company_id}: Transfer item not found")
-                    continue
-
-                # Mark as processing
-                transfer_item.status = "processing"
-                transfer_item.last_attempt_at = datetime.utcnow()
-                transfer_item.attempt_count += 1
-
-                # Check if already in target collection (using pre-fetched data)
-                if company_id in existing_company_ids:
-                    # Already in collection, mark as success
-                    transfer_item.status = "success"
-                    success_count += 1
-                else:
-                    # Add to target collection
-                    new_association = CompanyCollectionAssociation(
+            if not transfer_item:
+                error_count += 1
+                errors.append(f"Company {company_id}: Transfer item not found")
+                continue
+
+            if transfer_item.is_cancelled:
+                # Cancelled while the batch ran; release the row lock and move on
+                db.rollback()
+                continue
+
+            # Add to target collection unless it is already there
+            if company_id not in existing_company_ids:
+                db.add(
+                    CompanyCollectionAssociation(
                         company_id=company_id,
                         collection_id=collection_id,
                     )
-                    db.add(new_association)
+                )
 
-                    # Mark as success
-                    transfer_item.status = "success"
-                    success_count += 1
+            transfer_jobs.set_item_status(db, transfer_item, "success")
+            db.commit()
+            success_count += 1
 
-                # Commit after each company for real-time updates
-                db.commit()
+        except Exception as e:
+            db.rollback()
+            error_count += 1
+            errors.append(f"Company {company_id}: {str(e)}")
+            print(f"Error processing company {company_id}: {e}")
 
-                # Update progress every 100 items
-                if (i + 1) % 100 == 0:
-                    current_task.update_state(
-                        state="PROGRESS",
-                        meta={
-                            "current": i + 1,
-                            "total": len(company_ids),
-                            "status": f"Batch {batch_number}: Processed {i + 1}/{len(company_ids)}...",
-                        },
-                    )
+            # Mark transfer item as error
+            if transfer_item is not None:
+                # The rollback dropped this attempt; it still counts toward retries
+                transfer_jobs.set_item_status(
+                    db,
+                    transfer_item,
+                    "error",
+                    str(e),
+                    awaiting_retry=_retries_failures(job_id),
+                )
+                db.commit()  # Commit error status
 
-            except Exception as e:
-                error_count += 1
-                errors.append(f"Company {company_id}: {str(e)}")
-                print(f"Error processing company {company_id}: {e}")
+    return success_count, error_count, errors
 
-                # Mark transfer item as error
-                if "transfer_item" in locals():
-                    transfer_item.status = "error"
-                    transfer_item.error_message = str(e)
-                    db.commit()  # Commit error status
 
-        print(
-            f"Batch {batch_number} completed: {success_count} success, {error_count} errors"
+def job_routing(total_items: Optional[int]) -> dict:
+    """Queue and priority for a job's tasks, from its size; unknown sizes are bulk"""
+    if total_items is not None and total_items <= INTERACTIVE_MAX_ITEMS:
+        return {
+            "queue": celery_config.INTERACTIVE_QUEUE,
+            "priority": INTERACTIVE_PRIORITY,
+        }
+    return {"queue": celery_config.BULK_QUEUE, "priority": BULK_PRIORITY}
+
+
+def retry_backoff_seconds(attempt_count: int) -> float:
+    """
+    Exponential backoff with equal jitter: somewhere in the upper half of
+    base * 2^(attempts - 1), so retries of contended rows spread out
+    """
+    ceiling = min(
+        RETRY_BACKOFF_MAX_SECONDS,
+        RETRY_BACKOFF_BASE_SECONDS * 2 ** max(attempt_count - 1, 0),
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _batch_task_for(job):
+    if job is not None and job.job_type == transfer_jobs.REMOVAL:
+        return process_removal_batch
+    return process_transfer_batch
+
+
+def _item_collections(db, *filters) -> Optional[tuple[Optional[str], str]]:
+    """
+    Source (or None) and target collection ids of the first job item matching
+    `filters`, or None if none does. Every item of a job shares both, so any
+    one item stands for the whole job.
+    """
+    from backend.db.database import TransferJobItem
+
+    item = (
+        db.query(TransferJobItem.source_collection_id, TransferJobItem.collection_id)
+        .filter(*filters)
+        .first()
+    )
+    if item is None:
+        return None
+    source_collection_id = (
+        str(item.source_collection_id) if item.source_collection_id else None
+    )
+    return source_collection_id, str(item.collection_id)
+
+
+def _resubmit_failed_items(
+    db, job_id: uuid.UUID, company_ids=None, publish: bool = True
+) -> dict:
+    """
+    Requeue a job's failed items (all of them, or only `company_ids`) as new
+    batches of just those ids, each delayed by the backoff of its most-tried
+    item. Items out of attempts are dead-lettered instead. Pass publish=False
+    when the caller publishes the progress itself.
+    """
+    from backend.db.database import TransferJob, TransferJobItem
+
+    job = db.get(TransferJob, job_id)
+    source_collection_id, collection_id = _item_collections(
+        db, TransferJobItem.job_id == job_id
+    )
+    requeued, dead_lettered = transfer_jobs.requeue_failed_items(
+        db, job_id, company_ids
+    )
+    db.commit()
+    if dead_lettered:
+        print(f"Job {job_id}: {dead_lettered} items moved to dead letter")
+    if not requeued:
+        if dead_lettered and publish:
+            transfer_jobs.publish_progress(db, job_id, company_ids)
+        return {"retry_count": 0, "dead_letter_count": dead_lettered, "batches": 0}
+
+    # Items that failed equally often share a batch and a delay
+    requeued.sort(key=lambda item: item[1])
+    batch_task = _batch_task_for(job)
+    routing = job_routing(job.total_count if job else None)
+    task_ids = []
+    for start in range(0, len(requeued), RETRY_BATCH_SIZE):
+        batch = requeued[start : start + RETRY_BATCH_SIZE]
+        countdown = retry_backoff_seconds(batch[-1][1])
+        batch_data = {
+            "job_id": str(job_id),
+            "company_ids": [company_id for company_id, _ in batch],
+            "source_collection_id": source_collection_id,
+            "collection_id": collection_id,
+            "batch_number": start // RETRY_BATCH_SIZE + 1,
+        }
+        task_ids.append(
+            batch_task.apply_async((batch_data,), countdown=countdown, **routing).id
         )
+    cache.add_job_task_ids(job_id, task_ids)
+
+    if publish:
+        transfer_jobs.publish_progress(
+            db, job_id, [company_id for company_id, _ in requeued]
+        )
+    print(f"Job {job_id}: resubmitted {len(requeued)} items in {len(task_ids)} batches")
+
+    return {
+        "retry_count": len(requeued),
+        "dead_letter_count": dead_lettered,
+        "batches": len(task_ids),
+        "batch_task_ids": task_ids,
+    }
+
+
+def _retries_failures(job_id: uuid.UUID) -> bool:
+    """Whether a batch's failures are requeued right after they are recorded"""
+    return AUTO_RETRY_FAILED_ITEMS and not cache.is_job_cancelled(job_id)
+
+
+def _retry_batch_failures(db, job_id: uuid.UUID, company_ids: list):
+    """
+    Resubmit what failed in a batch before its progress is published, so the
+    job never looks finished in between. A failed retry leaves the items in
+    error and lets the job finish.
+    """
+    if _retries_failures(job_id):
+        try:
+            _resubmit_failed_items(db, job_id, company_ids, publish=False)
+            return
+        except Exception as e:
+            db.rollback()
+            print(f"Failed to resubmit failed items of job {job_id}: {e}")
+    transfer_jobs.settle_job(db, job_id)
+    db.commit()
+
+
+def _cancelled_batch_result(batch_number: int, company_ids: list) -> dict:
+    print(f"Batch {batch_number} skipped: job cancelled")
+    return {
+        "status": "cancelled",
+        "message": f"Batch {batch_number} skipped: job cancelled",
+        "batch_number": batch_number,
+        "success_count": 0,
+        "error_count": 0,
+        "total_count": len(company_ids),
+        "errors": [],
+    }
+
+
+def _sweep_cancelled_job(db, job_id: uuid.UUID):
+    """
+    Cancel the items a cancel request skipped while this worker held them.
+    Call from a worker that stopped because it saw the cancel flag.
+    """
+    cancelled_count = transfer_jobs.cancel_items(db, job_id)
+    db.commit()
+    if cancelled_count:
+        print(f"Job {job_id}: cancelled {cancelled_count} items left after cancel")
+        transfer_jobs.publish_progress(db, job_id)
+
+
+def _release_scheduler_slot(task, batch_data: dict):
+    """Let the scheduler release the next batch once a scheduled one is done"""
+    if batch_data.get("scheduled_queue") and task.request.id:
+        scheduler.batch_finished(batch_data["scheduled_queue"], task.request.id)
+
+
+def revoke_job_tasks(job_id) -> int:
+    """
+    Revoke a job's queued batch tasks so workers discard them instead of
+    running them. Returns the number of tasks revoked.
+    """
+    # Batches the scheduler has not released yet never reach the queue, and
+    # the slots of released ones go to other jobs
+    task_ids = scheduler.drop_job(job_id)
+    if not task_ids:
+        return 0
+    try:
+        celery_app.control.revoke(task_ids)
+    except Exception as e:
+        # Batches still check the cancel flag before doing any work
+        print(f"Failed to revoke batch tasks for job {job_id}: {e}")
+        return 0
+    return len(task_ids)
+
+
+def _batch_savepoint(db):
+    """
+    Savepoint around a batch write. A failed write rolls back only its own
+    changes, so the rest of the transaction, including a drain's claim on the
+    batch's items, holds until the batch is marked as failed.
+    """
+    return db.begin_nested()
+
+
+def _run_transfer_batch(
+    db,
+    job_id: uuid.UUID,
+    company_ids: list,
+    collection_id: str,
+    batch_number: int,
+    write_mode: str,
+    claimed: bool = False,
+) -> dict:
+    """
+    Transfer a batch of a job's companies and report how it went. A `claimed`
+    batch holds its items locked in the open transaction, so it is always
+    written in bulk: per-row writes commit after every company and would give
+    up the claim on the rest. If the bulk write fails, the whole batch is
+    marked as errors under that claim and the call raises.
+    """
+    print(f"Processing batch {batch_number} with {len(company_ids)} companies")
+    if claimed:
+        write_mode = "bulk"
 
-        # Determine batch status
-        if error_count == 0:
-            batch_status = "success"
-            message = f"Batch {batch_number} completed successfully: {success_count} companies transferred"
+    errors = []
+    if write_mode == "bulk":
+        try:
+            with _batch_savepoint(db):
+                transferred_company_ids, inserted_company_ids = _write_batch_bulk(
+                    db, job_id, company_ids, collection_id
+                )
+        except Exception as e:
+            if claimed:
+                print(f"Batch {batch_number} failed: {e}")
+                _mark_batch_error(
+                    db,
+                    job_id,
+                    company_ids,
+                    collection_id,
+                    str(e),
+                    awaiting_retry=_retries_failures(job_id),
+                )
+                _retry_batch_failures(db, job_id, company_ids)
+                transfer_jobs.publish_progress(db, job_id, company_ids)
+                raise
+            # Fall back to per-row isolation so one bad row can't fail the batch
+            print(f"Batch {batch_number}: bulk write failed, retrying per row: {e}")
+            write_mode = "per_row"
         else:
-            batch_status = "partial_success" if success_count > 0 else "error"
-            message = f"Batch {batch_number} completed with errors: {success_count} success, {error_count} errors"
+            db.commit()
+            success_count = len(transferred_company_ids)
+            error_count = 0
+            for company_id in company_ids:
+                if company_id not in transferred_company_ids:
+                    error_count += 1
+                    errors.append(f"Company {company_id}: No live transfer item")
+            print(
+                f"Batch {batch_number}: {len(inserted_company_ids)} companies added, "
+                f"{success_count - len(inserted_company_ids)} already in target collection"
+            )
 
-        return {
-            "status": batch_status,
-            "message": message,
-            "batch_number": batch_number,
-            "success_count": success_count,
-            "error_count": error_count,
-            "total_count": len(company_ids),
-            "errors": errors[:10] if errors else [],  # Limit error details
-        }
+    if write_mode != "bulk":
+        success_count, error_count, errors = _write_batch_per_row(
+            db, job_id, company_ids, collection_id
+        )
+
+    if error_count:
+        _retry_batch_failures(db, job_id, company_ids)
+    if success_count:
+        cache.bump_collection_versions(collection_id)
+    transfer_jobs.publish_progress(db, job_id, company_ids)
+
+    print(
+        f"Batch {batch_number} completed: {success_count} success, {error_count} errors"
+    )
+
+    # Publish progress once per batch
+    current_task.update_state(
+        state="PROGRESS",
+        meta={
+            "current": len(company_ids),
+            "total": len(company_ids),
+            "status": f"Batch {batch_number}: Processed {len(company_ids)}/{len(company_ids)}",
+        },
+    )
+
+    # Determine batch status
+    if error_count == 0:
+        batch_status = "success"
+        message = f"Batch {batch_number} completed successfully: {success_count} companies transferred"
+    else:
+        batch_status = "partial_success" if success_count > 0 else "error"
+        message = f"Batch {batch_number} completed with errors: {success_count} success, {error_count} errors"
+
+    return {
+        "status": batch_status,
+        "message": message,
+        "batch_number": batch_number,
+        "write_mode": write_mode,
+        "success_count": success_count,
+        "error_count": error_count,
+        "total_count": len(company_ids),
+        "errors": errors[:10] if errors else [],  # Limit error details
+    }
+
+
+def _run_removal_batch(
+    db, job_id: uuid.UUID, company_ids: list, collection_id: str, batch_number: int
+) -> dict:
+    """
+    Remove a batch of a removal job's companies and report how it went.
+    Raises once the failed batch's items are marked as errors.
+    """
+    print(f"Processing removal batch {batch_number} with {len(company_ids)} companies")
+
+    try:
+        with _batch_savepoint(db):
+            processed_company_ids, removed_company_ids = _remove_batch(
+                db, job_id, company_ids, collection_id
+            )
+    except Exception as e:
+        # Leave the batch retryable: its items are marked as errors
+        print(f"Removal batch {batch_number} failed: {e}")
+        _mark_batch_error(
+            db,
+            job_id,
+            company_ids,
+            collection_id,
+            str(e),
+            awaiting_retry=_retries_failures(job_id),
+        )
+        _retry_batch_failures(db, job_id, company_ids)
+        transfer_jobs.publish_progress(db, job_id, company_ids)
+        raise
+    db.commit()
+
+    if removed_company_ids:
+        cache.bump_collection_versions(collection_id)
+    transfer_jobs.publish_progress(db, job_id, company_ids)
+
+    success_count = len(processed_company_ids)
+    errors = [
+        f"Company {company_id}: No live transfer item"
+        for company_id in company_ids
+        if company_id not in processed_company_ids
+    ]
+    print(
+        f"Removal batch {batch_number}: {len(removed_company_ids)} companies removed, "
+        f"{success_count - len(removed_company_ids)} already not in collection"
+    )
+
+    current_task.update_state(
+        state="PROGRESS",
+        meta={
+            "current": len(company_ids),
+            "total": len(company_ids),
+            "status": f"Removal batch {batch_number}: Processed {len(company_ids)}/{len(company_ids)}",
+        },
+    )
+
+    if not errors:
+        batch_status = "success"
+        message = f"Removal batch {batch_number} completed successfully: {success_count} companies removed"
+    else:
+        batch_status = "partial_success" if success_count > 0 else "error"
+        message = f"Removal batch {batch_number} completed with errors: {success_count} success, {len(errors)} errors"
+
+    return {
+        "status": batch_status,
+        "message": message,
+        "batch_number": batch_number,
+        "success_count": success_count,
+        "removed_count": len(removed_company_ids),
+        "error_count": len(errors),
+        "total_count": len(company_ids),
+        "errors": errors[:10],
+    }
+
+
+@celery_app.task(bind=True, name="backend.tasks.transfer_tasks.process_transfer_batch")
+def process_transfer_batch(self, batch_data: dict):
+    """
+    Process a batch of transfer items as a single unit
+    batch_data contains: {
+        'job_id': str,
+        'company_ids': List[int],
+        'source_collection_id': Optional[str],
+        'collection_id': str,
+        'batch_number': int,
+        'write_mode': Optional[str]  # "bulk" (default) or "per_row"
+    }
+    """
+    db = SessionLocal()
+    try:
+        job_id = uuid.UUID(batch_data["job_id"])
+        company_ids = batch_data["company_ids"]
+        collection_id = batch_data["collection_id"]
+        batch_number = batch_data["batch_number"]
+        write_mode = batch_data.get("write_mode") or BATCH_WRITE_MODE
+
+        if cache.is_job_cancelled(job_id):
+            return _cancelled_batch_result(batch_number, company_ids)
+
+        # Served from the worker's preloaded registry, no query when warm
+        if collection_registry.collection_name(db, uuid.UUID(collection_id)) is None:
+            # Fail the items rather than leave them pending, or the job never ends
+            error_message = f"Collection {collection_id} not found"
+            _mark_batch_error(db, job_id, company_ids, collection_id, error_message)
+            transfer_jobs.publish_progress(db, job_id, company_ids)
+            raise ValueError(error_message)
+
+        return _run_transfer_batch(
+            db, job_id, company_ids, collection_id, batch_number, write_mode
+        )
 
     except Exception as e:
         print(f"Batch {batch_data.get('batch_number', 'unknown')} failed: {e}")
@@ -159,68 +639,323 @@ def process_transfer_batch(self, batch_data: dict):
         }
     finally:
         db.close()
+        _release_scheduler_slot(self, batch_data)
+
+
+@celery_app.task(bind=True, name="backend.tasks.transfer_tasks.process_removal_batch")
+def process_removal_batch(self, batch_data: dict):
+    """
+    Process a batch of a removal job as a single unit
+    batch_data contains: {
+        'job_id': str,
+        'company_ids': List[int],
+        'collection_id': str,  # Collection the companies are removed from
+        'batch_number': int,
+    }
+    """
+    db = SessionLocal()
+    try:
+        job_id = uuid.UUID(batch_data["job_id"])
+        company_ids = batch_data["company_ids"]
+        collection_id = batch_data["collection_id"]
+        batch_number = batch_data["batch_number"]
+
+        if cache.is_job_cancelled(job_id):
+            return _cancelled_batch_result(batch_number, company_ids)
+
+        return _run_removal_batch(db, job_id, company_ids, collection_id, batch_number)
+
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Removal batch {batch_data.get('batch_number', 'unknown')} failed: {str(e)}",
+            "batch_number": batch_data.get("batch_number", 0),
+            "success_count": 0,
+            "removed_count": 0,
+            "error_count": len(batch_data.get("company_ids", [])),
+            "total_count": len(batch_data.get("company_ids", [])),
+            "errors": [str(e)],
+        }
+    finally:
+        db.close()
+        _release_scheduler_slot(self, batch_data)
+
+
+def _mark_batch_error(
+    db,
+    job_id: uuid.UUID,
+    company_ids: list,
+    collection_id,
+    error_message: str,
+    awaiting_retry: bool = False,
+):
+    """Mark a failed batch's unfinished items as errors so they can be retried"""
+    from backend.db.database import TransferJobItem
+
+    try:
+        failed_items = db.execute(
+            update(TransferJobItem)
+            .where(
+                TransferJobItem.job_id == job_id,
+                TransferJobItem.collection_id == collection_id,
+                TransferJobItem.company_id.in_(company_ids),
+                TransferJobItem.status == "pending",
+            )
+            .values(
+                status="error",
+                error_message=error_message,
+                last_attempt_at=datetime.utcnow(),
+                attempt_count=TransferJobItem.attempt_count + 1,
+            )
+            .returning(TransferJobItem.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        transfer_jobs.record_status_changes(
+            db,
+            job_id,
+            Counter({("pending", "error"): len(failed_items)}),
+            awaiting_retry=awaiting_retry,
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Failed to mark batch items as errors: {e}")
+
+
+def _claim_pending_items(db, job_id: uuid.UUID, chunk_size: int):
+    """
+    Lock the next chunk of the job's untried pending items, skipping rows other
+    drains hold. The locks last until the chunk's transaction ends, so a crashed
+    worker's chunk simply goes back to pending. Items that already failed once
+    are left to their delayed retry batches.
+    """
+    from backend.db.database import TransferJobItem
+
+    return db.execute(
+        select(TransferJobItem.company_id, TransferJobItem.collection_id)
+        .where(
+            TransferJobItem.job_id == job_id,
+            TransferJobItem.status == "pending",
+            TransferJobItem.is_cancelled == False,
+            TransferJobItem.attempt_count == 0,
+        )
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+
+@celery_app.task(
+    bind=True,
+    name="backend.tasks.transfer_tasks.drain_transfer_job",
+    # Redeliver the drain if its worker dies; claims resume from the table
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
+def drain_transfer_job(self, job_id: str, chunk_size: int = 100):
+    """
+    Claim and process chunks of a job's pending items until none are left
+    """
+    db = SessionLocal()
+    try:
+        from backend.db.database import TransferJob
+
+        job = db.get(TransferJob, uuid.UUID(job_id))
+        is_removal = job is not None and job.job_type == transfer_jobs.REMOVAL
+
+        started = time.monotonic()
+        chunks = 0
+        processed = 0
+        handed_over = False
+        while not cache.is_job_cancelled(job_id):
+            if time.monotonic() - started > DRAIN_TIME_BUDGET_SECONDS:
+                handover = drain_transfer_job.apply_async(
+                    (job_id, chunk_size),
+                    **job_routing(job.total_count if job else None),
+                )
+                cache.add_job_task_ids(job_id, [handover.id])
+                handed_over = True
+                break
+
+            claimed = _claim_pending_items(db, uuid.UUID(job_id), chunk_size)
+            if not claimed:
+                db.rollback()
+                break
+
+            chunks += 1
+            company_ids = [item.company_id for item in claimed]
+            collection_id = str(claimed[0].collection_id)
+            try:
+                if is_removal:
+                    result = _run_removal_batch(
+                        db, uuid.UUID(job_id), company_ids, collection_id, chunks
+                    )
+                else:
+                    result = _run_transfer_batch(
+                        db,
+                        uuid.UUID(job_id),
+                        company_ids,
+                        collection_id,
+                        chunks,
+                        BATCH_WRITE_MODE,
+                        claimed=True,
+                    )
+            except Exception:
+                # The chunk's items are errors now, with retries scheduled
+                continue
+
+            if not result["success_count"] and not result["error_count"]:
+                # Nothing moved, so the next claim would get the same rows
+                print(f"Drain of job {job_id} made no progress, stopping")
+                break
+            processed += len(company_ids)
+
+        if cache.is_job_cancelled(job_id):
+            _sweep_cancelled_job(db, uuid.UUID(job_id))
+
+        print(f"Drain of job {job_id}: processed {processed} items in {chunks} chunks")
+        return {
+            "status": "handed_over" if handed_over else "success",
+            "message": f"Processed {processed} items in {chunks} chunks",
+            "chunks": chunks,
+            "processed_count": processed,
+        }
+
+    except Exception as e:
+        print(f"Error draining transfer job {job_id}: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def _send_batches(
+    job_id: str, batch_task, batches: list[dict], routing: dict, weight: int
+) -> int:
+    """
+    Hand batches to the fair scheduler, or straight to the queue when it is
+    disabled or unavailable. Returns the number of batches accepted.
+    """
+    if not batches:
+        return 0
+    if scheduler.FAIR_SCHEDULING_ENABLED and scheduler.submit_batches(
+        job_id, batch_task.name, batches, weight=weight, **routing
+    ):
+        return len(batches)
+
+    task_ids = []
+    for batch_data in batches:
+        try:
+            task_ids.append(batch_task.apply_async((batch_data,), **routing).id)
+            print(f"Started batch {batch_data['batch_number']}")
+        except Exception as e:
+            print(f"Failed to start batch {batch_data['batch_number']}: {e}")
+    cache.add_job_task_ids(job_id, task_ids)
+    return len(task_ids)
 
 
 @celery_app.task(bind=True, name="backend.tasks.transfer_tasks.process_transfer_job")
-def process_transfer_job(self, job_id: str, batch_size: int = 100):
+def process_transfer_job(
+    self,
+    job_id: str,
+    batch_size: int = 100,
+    dispatch_mode: Optional[str] = None,
+    weight: int = 1,
+):
     """
-    Process a transfer job by creating batches of companies
+    Process a transfer or removal job by creating batches of companies, or by
+    starting drain tasks that claim the batches themselves. Batches go through
+    the fair scheduler, where a job of weight w gets w batches per round.
     """
     db = SessionLocal()
     try:
-        from backend.db.database import TransferJobItem
+        from backend.db.database import TransferJob, TransferJobItem
 
-        # Get all pending items for this job
-        pending_items = (
-            db.query(TransferJobItem)
-            .filter(TransferJobItem.job_id == uuid.UUID(job_id))
-            .filter(TransferJobItem.status == "pending")
-            .filter(TransferJobItem.is_cancelled == False)
-            .all()
+        job = db.get(TransferJob, uuid.UUID(job_id))
+        if job is None:
+            return {"status": "error", "message": f"Transfer job {job_id} not found"}
+        batch_task_type = _batch_task_for(job)
+        routing = job_routing(job.total_count)
+
+        pending_filter = (
+            TransferJobItem.job_id == uuid.UUID(job_id),
+            TransferJobItem.status == "pending",
+            TransferJobItem.is_cancelled == False,
         )
 
-        if not pending_items:
+        collections = _item_collections(db, *pending_filter)
+        if not collections:
             return {"status": "success", "message": "No pending items to process"}
+        source_collection_id, collection_id = collections
 
-        total_items = len(pending_items)
-        print(f"Processing {total_items} items in batches of {batch_size}")
+        if (dispatch_mode or DISPATCH_MODE) == "drain":
+            # Enough drains to keep every chunk busy, and no more
+            drain_count = max(
+                min(DRAIN_WORKERS, -(-job.pending_count // batch_size)), 1
+            )
+            drain_tasks = [
+                drain_transfer_job.apply_async((job_id, batch_size), **routing)
+                for _ in range(drain_count)
+            ]
+            cache.add_job_task_ids(job_id, [task.id for task in drain_tasks])
+            print(f"Started {drain_count} drains for job {job_id}")
+            return {
+                "status": "started",
+                "message": f"Started {drain_count} drains in chunks of {batch_size}",
+                "dispatch_mode": "drain",
+                "drain_task_ids": [task.id for task in drain_tasks],
+            }
+
+        print(f"Processing pending items in batches of {batch_size}")
 
         # Update task status
         current_task.update_state(
             state="PROGRESS",
             meta={
                 "current": 0,
-                "total": total_items,
-                "status": f"Creating batches for {total_items} items...",
+                "total": 0,
+                "status": "Creating batches...",
             },
         )
 
-        # Group items by batch
-        batches = []
-        for i in range(0, len(pending_items), batch_size):
-            batch_items = pending_items[i : i + batch_size]
-            batch_data = {
-                "job_id": job_id,
-                "company_ids": [item.company_id for item in batch_items],
-                "source_collection_id": batch_items[0].source_collection_id
-                if batch_items
-                else None,
-                "collection_id": batch_items[0].collection_id if batch_items else None,
-                "batch_number": len(batches) + 1,
-            }
-            batches.append(batch_data)
+        # Stream company ids through a server-side cursor and dispatch each
+        # batch as soon as it is read, so memory stays flat for large jobs
+        pending_company_ids = db.execute(
+            select(TransferJobItem.company_id)
+            .where(*pending_filter)
+            .execution_options(yield_per=batch_size)
+        ).scalars()
 
-        print(f"Created {len(batches)} batches")
+        total_items = 0
+        batches_created = 0
+        batches_started = 0
+        unsent_batches = []
+        for company_ids in pending_company_ids.partitions():
+            # Stop dispatching as soon as the job is cancelled
+            if cache.is_job_cancelled(job_id):
+                print(f"Job {job_id} cancelled, stopped dispatching batches")
+                break
 
-        # Start all batches
-        batch_tasks = []
-        for batch_data in batches:
-            try:
-                batch_task = process_transfer_batch.delay(batch_data)
-                batch_tasks.append(batch_task)
-                print(f"Started batch {batch_data['batch_number']}")
-            except Exception as e:
-                print(f"Failed to start batch {batch_data['batch_number']}: {e}")
+            batches_created += 1
+            total_items += len(company_ids)
+            unsent_batches.append(
+                {
+                    "job_id": job_id,
+                    "company_ids": list(company_ids),
+                    "source_collection_id": source_collection_id,
+                    "collection_id": collection_id,
+                    "batch_number": batches_created,
+                }
+            )
+            if len(unsent_batches) >= SCHEDULER_SUBMIT_BATCHES:
+                batches_started += _send_batches(
+                    job_id, batch_task_type, unsent_batches, routing, weight
+                )
+                unsent_batches = []
+
+        batches_started += _send_batches(
+            job_id, batch_task_type, unsent_batches, routing, weight
+        )
+
+        print(f"Created {batches_created} batches")
 
         # Update task status
         current_task.update_state(
@@ -228,17 +963,16 @@ def process_transfer_job(self, job_id: str, batch_size: int = 100):
             meta={
                 "current": total_items,
                 "total": total_items,
-                "status": f"Started {len(batch_tasks)} batches",
+                "status": f"Started {batches_started} batches",
             },
         )
 
         return {
             "status": "started",
-            "message": f"Started processing {total_items} items in {len(batches)} batches",
+            "message": f"Started processing {total_items} items in {batches_created} batches",
             "total_items": total_items,
-            "batches_created": len(batches),
-            "batch_tasks_started": len(batch_tasks),
-            "batch_task_ids": [task.id for task in batch_tasks],
+            "batches_created": batches_created,
+            "batch_tasks_started": batches_started,
         }
 
     except Exception as e:
@@ -248,46 +982,196 @@ def process_transfer_job(self, job_id: str, batch_size: int = 100):
         db.close()
 
 
+@celery_app.task(
+    bind=True,
+    name="backend.tasks.transfer_tasks.process_bulk_transfer_job",
+    # Redeliver if the worker dies mid-chunk; merged chunks are already committed
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
+def process_bulk_transfer_job(self, job_id: str):
+    """
+    Process a staged transfer job with set-based statements instead of batches,
+    one committed chunk at a time
+    """
+    db = SessionLocal()
+    try:
+        from backend.db import bulk
+        from backend.db.database import TransferJob
+
+        job = db.get(TransferJob, uuid.UUID(job_id))
+        started = time.monotonic()
+        slowest_chunk = 0.0
+        chunks = 0
+        transferred_count = 0
+        inserted_count = 0
+        handed_over = False
+        while True:
+            if cache.is_job_cancelled(job_id):
+                _sweep_cancelled_job(db, uuid.UUID(job_id))
+                break
+            # Hand over before a chunk as slow as the slowest so far could
+            # run into the task time limits
+            if time.monotonic() - started + slowest_chunk > DRAIN_TIME_BUDGET_SECONDS:
+                handover = process_bulk_transfer_job.apply_async(
+                    (job_id,), **job_routing(None)
+                )
+                cache.add_job_task_ids(job_id, [handover.id])
+                handed_over = True
+                break
+
+            current_task.update_state(
+                state="PROGRESS",
+                meta={
+                    "current": transferred_count,
+                    "total": job.total_count if job else transferred_count,
+                    "status": "Merging staged transfer...",
+                },
+            )
+
+            chunk_started = time.monotonic()
+            chunk_transferred, chunk_inserted = bulk.merge_transfer_job_associations(
+                db, uuid.UUID(job_id)
+            )
+            if not chunk_transferred:
+                db.rollback()
+                break
+            transfer_jobs.record_status_changes(
+                db,
+                uuid.UUID(job_id),
+                Counter({("pending", "success"): chunk_transferred}),
+            )
+            db.commit()
+            slowest_chunk = max(slowest_chunk, time.monotonic() - chunk_started)
+
+            chunks += 1
+            transferred_count += chunk_transferred
+            inserted_count += chunk_inserted
+            if chunk_inserted and job:
+                cache.bump_collection_versions(job.collection_id)
+            transfer_jobs.publish_progress(db, uuid.UUID(job_id))
+
+        print(
+            f"Bulk job {job_id}: {transferred_count} items transferred in "
+            f"{chunks} chunks, {inserted_count} associations added"
+        )
+
+        return {
+            "status": "handed_over" if handed_over else "success",
+            "message": f"Transferred {transferred_count} items",
+            "total_items": transferred_count,
+            "inserted_count": inserted_count,
+            "chunks": chunks,
+        }
+
+    except Exception as e:
+        db.rollback()
+        print(f"Bulk transfer job {job_id} failed, falling back to batches: {e}")
+        # Jobs merged in bulk are large, so their batches stay on the bulk queue
+        celery_task = process_transfer_job.apply_async((job_id,), **job_routing(None))
+        return {
+            "status": "fallback",
+            "message": f"Bulk merge failed, processing in batches: {str(e)}",
+            "celery_task_id": celery_task.id,
+        }
+    finally:
+        db.close()
+
+
 @celery_app.task(name="backend.tasks.transfer_tasks.retry_failed_batches")
 def retry_failed_batches(job_id: str):
     """
-    Retry failed batches for a job
+    Retry the failed items of a job as new batches of just those items,
+    dead-lettering the ones that have used up their attempts
     """
     db = SessionLocal()
     try:
-        from backend.db.database import TransferJobItem
+        if cache.is_job_cancelled(job_id):
+            return {"status": "cancelled", "message": f"Job {job_id} was cancelled"}
 
-        # Get failed items that can be retried
-        failed_items = (
-            db.query(TransferJobItem)
-            .filter(TransferJobItem.job_id == uuid.UUID(job_id))
-            .filter(TransferJobItem.status == "error")
+        result = _resubmit_failed_items(db, uuid.UUID(job_id))
+        if not result["retry_count"] and not result["dead_letter_count"]:
+            return {"status": "success", "message": "No failed items to retry"}
+
+        return {
+            "status": "success",
+            "message": f"Retrying {result['retry_count']} failed items, "
+            f"{result['dead_letter_count']} moved to dead letter",
+            **result,
+        }
+
+    except Exception as e:
+        print(f"Error retrying failed batches for job {job_id}: {e}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="backend.tasks.transfer_tasks.dispatch_scheduled_batches")
+def dispatch_scheduled_batches():
+    """
+    Periodic nudge for the fair scheduler, releasing batches into slots freed
+    by batches that were lost without reporting back
+    """
+    released = {
+        queue: scheduler.dispatch(queue)
+        for queue in (celery_config.INTERACTIVE_QUEUE, celery_config.BULK_QUEUE)
+    }
+    return {"status": "success", "released": released}
+
+
+@celery_app.task(name="backend.tasks.transfer_tasks.admit_deferred_jobs")
+def admit_deferred_jobs():
+    """
+    Start jobs that admission control deferred, oldest first, for as long as
+    the limits let them in
+    """
+    from backend import admission
+    from backend.db.database import TransferJob
+
+    db = SessionLocal()
+    try:
+        deferred_jobs = (
+            db.query(TransferJob)
+            .filter(TransferJob.deferred_at.is_not(None))
+            .filter(TransferJob.finished_at.is_(None))
+            .order_by(TransferJob.deferred_at)
             .all()
         )
 
-        if not failed_items:
-            return {"status": "success", "message": "No failed items to retry"}
+        started = []
+        for job in deferred_jobs:
+            # Stop at the first job that doesn't fit so the oldest goes first
+            if not admission.check(db, job.total_count, job.deferred_at).admitted:
+                break
+            # Another run may have started it since the list was read
+            db.refresh(job, with_for_update=True)
+            if job.deferred_at is None:
+                db.commit()
+                continue
 
-        print(f"Retrying {len(failed_items)} failed items")
+            transfer_jobs.admit_job(db, job)
+            db.commit()
 
-        # Reset status to pending for retry
-        for item in failed_items:
-            item.status = "pending"
-            item.error_message = None
-        db.commit()
-
-        # Start a new job to process the retry items
-        celery_task = process_transfer_job.delay(str(job_id))
+            if (
+                job.job_type == transfer_jobs.TRANSFER
+                and job.total_count >= BULK_TRANSFER_THRESHOLD
+            ):
+                process_bulk_transfer_job.delay(str(job.id))
+            else:
+                process_transfer_job.apply_async(
+                    (str(job.id),), **job_routing(job.total_count)
+                )
+            started.append(str(job.id))
 
         return {
             "status": "success",
-            "message": f"Retrying {len(failed_items)} failed items",
-            "retry_count": len(failed_items),
-            "celery_task_id": celery_task.id,
+            "started": started,
+            "deferred_count": admission.deferred_ahead(db),
         }
 
     except Exception as e:
-        print(f"Error retrying failed batches for job {job_id}: {e}")
+        print(f"Error admitting deferred transfer jobs: {e}")
         raise
     finally:
         db.close()
@@ -302,7 +1186,7 @@ def cleanup_old_transfers():
     try:
         from datetime import timedelta
 
-        from backend.db.database import TransferJobItem
+        from backend.db.database import TransferJob, TransferJobItem
 
         # Delete transfers older than 30 days
         cutoff_date = datetime.utcnow() - timedelta(days=30)
@@ -310,13 +1194,25 @@ def cleanup_old_transfers():
         old_transfers = (
             db.query(TransferJobItem)
             .filter(TransferJobItem.created_at < cutoff_date)
-            .filter(TransferJobItem.status.in_(["success", "error"]))
+            .filter(TransferJobItem.status.in_(["success", "error", "dead_letter"]))
             .all()
         )
 
+        removed_per_job = {}
         for transfer in old_transfers:
+            removed_per_job.setdefault(transfer.job_id, Counter())[
+                (transfer.status, None)
+            ] += 1
             db.delete(transfer)
 
+        for transfer_job_id, changes in removed_per_job.items():
+            transfer_jobs.record_status_changes(db, transfer_job_id, changes)
+
+        # Drop job rows that no longer have any items
+        db.query(TransferJob).filter(TransferJob.created_at < cutoff_date).filter(
+            TransferJob.total_count <= 0
+        ).delete(synchronize_session=False)
+
         db.commit()
 
         return {
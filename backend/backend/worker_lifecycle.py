@@ -0,0 +1,41 @@
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import text
+
+from backend.db import database, pool
+from backend.db.registry import collection_registry
+
+
+def _reset_engines():
+    """
+    Give this child its own pools. The engines were created in the parent
+    before fork, so any connections they hold belong to the parent.
+    """
+    database.engine.dispose(close=False)
+    database.async_engine.sync_engine.dispose(close=False)
+
+
+def _warm_worker_state():
+    """Open a pooled connection and load the lookups batch tasks rely on"""
+    db = database.SessionLocal()
+    try:
+        # The connection goes back to the pool and stays open for later tasks
+        db.execute(text("SELECT 1"))
+        collection_registry.refresh(db)
+    finally:
+        db.close()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    _reset_engines()
+    try:
+        _warm_worker_state()
+    except Exception as e:
+        # Tasks connect and look things up lazily if warming fails
+        print(f"Worker warm-up failed: {e}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    print(f"Worker database pool at shutdown: {pool.pool_status(database.engine)}")
+    database.engine.dispose()
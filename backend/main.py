@@ -7,8 +7,8 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 from starlette.middleware.cors import CORSMiddleware
 
-from backend.db import database
-from backend.routes import collections, companies, transfers
+from backend.db import database, schema
+from backend.routes import collections, companies, metrics, transfers
 
 
 @asynccontextmanager
@@ -16,6 +16,8 @@ async def lifespan(app: FastAPI):
     database.Base.metadata.create_all(bind=database.engine)
 
     db = database.SessionLocal()
+    schema.setup_schema(db)
+
     if not db.query(database.Settings).get("seeded"):
         seed_database(db)
 
@@ -114,6 +116,7 @@ EXECUTE FUNCTION throttle_updates();
 app.include_router(companies.router)
 app.include_router(collections.router)
 app.include_router(transfers.router)
+app.include_router(metrics.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -123,4 +126,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend revalidate POST /transfers/companies/status itself and
+    # read when to retry a transfer turned away by admission control
+    expose_headers=["ETag", "Retry-After"],
 )
@@ -0,0 +1,48 @@
+"""
+Setup shared by the transfer tests.
+"""
+
+import uuid
+from collections import Counter
+
+from backend.db import transfer_jobs
+from backend.db.database import TransferJobItem
+
+
+def make_job(
+    db,
+    company_ids,
+    source_collection_id,
+    collection_id,
+    status="pending",
+    job_type=transfer_jobs.TRANSFER,
+):
+    """Create and commit a job with one item per company, all in `status`."""
+    job_id = uuid.uuid4()
+    db.add_all(
+        [
+            TransferJobItem(
+                job_id=job_id,
+                company_id=company_id,
+                source_collection_id=source_collection_id,
+                collection_id=collection_id,
+                status=status,
+            )
+            for company_id in company_ids
+        ]
+    )
+    transfer_jobs.add_transfer_job(
+        db,
+        job_id,
+        source_collection_id,
+        collection_id,
+        len(company_ids),
+        job_type=job_type,
+    )
+    if status != "pending":
+        db.flush()
+        transfer_jobs.record_status_changes(
+            db, job_id, Counter({("pending", status): len(company_ids)})
+        )
+    db.commit()
+    return job_id
@@ -35,12 +35,39 @@ def run_all_tests():
         print(f"❌ Batch tests failed: {e}")
         batch_result = 1
 
+    try:
+        from tests.test_bulk_transfers import main as run_bulk_tests
+
+        print("\n📋 Running Bulk Transfer Tests...")
+        bulk_result = run_bulk_tests()
+    except Exception as e:
+        print(f"❌ Bulk tests failed: {e}")
+        bulk_result = 1
+
+    try:
+        from tests.test_pagination import main as run_pagination_tests
+
+        print("\n📋 Running Pagination Tests...")
+        pagination_result = run_pagination_tests()
+    except Exception as e:
+        print(f"❌ Pagination tests failed: {e}")
+        pagination_result = 1
+
     print("\n" + "=" * 50)
     print("📊 Test Summary:")
     print(f"   Simple Tests: {'✅ PASSED' if simple_result == 0 else '❌ FAILED'}")
     print(f"   Batch Tests:  {'✅ PASSED' if batch_result == 0 else '❌ FAILED'}")
+    print(f"   Bulk Tests:   {'✅ PASSED' if bulk_result == 0 else '❌ FAILED'}")
+    print(
+        f"   Pagination Tests: {'✅ PASSED' if pagination_result == 0 else '❌ FAILED'}"
+    )
 
-    if simple_result == 0 and batch_result == 0:
+    if (
+        simple_result == 0
+        and batch_result == 0
+        and bulk_result == 0
+        and pagination_result == 0
+    ):
         print("\n🎉 All tests passed! Your transfer system is working correctly!")
         return 0
     else:
@@ -212,6 +212,68 @@ def test_batch_partial_success():
         db.close()
 
 
+def test_batch_bulk_write_fallback():
+    """Test that a failing bulk write falls back to per-row processing."""
+    print("\n🧪 Testing bulk write fallback to per-row processing...")
+
+    # Setup test data
+    data = create_test_data(5)
+    db = data["db"]
+
+    try:
+        job_id = uuid.uuid4()
+        transfer_items = []
+        for company in data["companies"]:
+            item = TransferJobItem(
+                job_id=job_id,
+                company_id=company.id,
+                source_collection_id=data["source_collection"].id,
+                collection_id=data["target_collection"].id,
+                status="pending",
+            )
+            db.add(item)
+            transfer_items.append(item)
+        db.commit()
+
+        batch_data = {
+            "job_id": str(job_id),
+            "company_ids": [c.id for c in data["companies"]],
+            "source_collection_id": str(data["source_collection"].id),
+            "collection_id": str(data["target_collection"].id),
+            "batch_number": 1,
+        }
+
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task, patch(
+            "backend.tasks.transfer_tasks._write_batch_bulk",
+            side_effect=RuntimeError("bulk write failed"),
+        ):
+            mock_task.update_state = MagicMock()
+            result = process_transfer_batch(batch_data)
+
+        print(f"   ✅ Batch result: {result}")
+
+        assert result["write_mode"] == "per_row", (
+            f"Expected per_row fallback, got {result['write_mode']}"
+        )
+        assert result["success_count"] == len(transfer_items), (
+            f"Expected {len(transfer_items)} successes, got {result['success_count']}"
+        )
+        assert mock_task.update_state.call_count == 1, (
+            f"Expected progress to be published once, got {mock_task.update_state.call_count}"
+        )
+
+        for item in transfer_items:
+            db.refresh(item)
+            assert item.status == "success", (
+                f"Company {item.company_id}: expected success, got {item.status}"
+            )
+
+        print("✅ Bulk write fallback test passed!")
+
+    finally:
+        db.close()
+
+
 def main():
     """Run the batch processing tests."""
     print("🚀 Testing Batch Transfer Processing")
@@ -229,6 +291,8 @@ def main():
             all_passed = False
         # Run the partial success/failure test
         test_batch_partial_success()
+        # Run the bulk write fallback test
+        test_batch_bulk_write_fallback()
     except Exception as e:
         print(f"\n❌ Test error: {e}")
         all_passed = False
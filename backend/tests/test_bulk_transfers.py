@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Test the staged (COPY / set-based) pipeline used for very large transfers.
+"""
+
+import uuid
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+
+from backend import admission, cache
+from backend.db import bulk, transfer_jobs
+from backend.db.database import (
+    Base,
+    Company,
+    CompanyCollection,
+    CompanyCollectionAssociation,
+    SessionLocal,
+    TransferJob,
+    TransferJobItem,
+    engine,
+)
+from backend.routes import transfers
+from backend.tasks import scheduler, transfer_tasks
+from backend.tasks.transfer_tasks import (
+    drain_transfer_job,
+    process_bulk_transfer_job,
+    process_removal_batch,
+    process_transfer_job,
+)
+from tests.helpers import make_job
+
+
+def create_test_data(num_companies=20):
+    """Create test data for the staged pipeline."""
+    db = SessionLocal()
+
+    try:
+        companies = [
+            Company(company_name=f"Bulk Company {i + 1}") for i in range(num_companies)
+        ]
+        db.add_all(companies)
+        db.commit()
+
+        source_collection = CompanyCollection(collection_name="Bulk Source")
+        target_collection = CompanyCollection(collection_name="Bulk Target")
+        db.add_all([source_collection, target_collection])
+        db.commit()
+
+        # Every company is in the source, the first one is already in the target
+        for company in companies:
+            db.add(
+                CompanyCollectionAssociation(
+                    company_id=company.id, collection_id=source_collection.id
+                )
+            )
+        db.add(
+            CompanyCollectionAssociation(
+                company_id=companies[0].id, collection_id=target_collection.id
+            )
+        )
+        db.commit()
+
+        return {
+            "companies": companies,
+            "source_collection": source_collection,
+            "target_collection": target_collection,
+            "db": db,
+        }
+    except Exception as e:
+        db.close()
+        raise e
+
+
+def test_staged_collection_transfer():
+    """Test staging a whole collection and merging it with set-based SQL."""
+    print("🧪 Testing staged collection transfer...")
+
+    data = create_test_data(20)
+    db = data["db"]
+
+    try:
+        job_id = uuid.uuid4()
+        bulk.stage_collection_company_ids(db, data["source_collection"].id)
+        item_count = bulk.merge_staged_transfer_items(
+            db, job_id, data["source_collection"].id, data["target_collection"].id
+        )
+        db.commit()
+
+        assert item_count == 20, f"Expected 20 staged items, got {item_count}"
+
+        # Merged in committed chunks of 7, 7 and 6 items
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(bulk, "MERGE_CHUNK_SIZE", 7),
+        ):
+            mock_task.update_state = MagicMock()
+            result = process_bulk_transfer_job(str(job_id))
+
+        print(f"   ✅ Bulk result: {result}")
+
+        assert result["chunks"] == 3, f"Expected 3 chunks, got {result['chunks']}"
+
+        assert result["total_items"] == 20, (
+            f"Expected 20 transferred items, got {result['total_items']}"
+        )
+        assert result["inserted_count"] == 19, (
+            f"Expected 19 new associations, got {result['inserted_count']}"
+        )
+
+        success_count = (
+            db.query(TransferJobItem)
+            .filter(
+                TransferJobItem.job_id == job_id, TransferJobItem.status == "success"
+            )
+            .count()
+        )
+        assert success_count == 20, f"Expected 20 successes, got {success_count}"
+
+        print("✅ Staged collection transfer test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_copy_company_ids():
+    """Test streaming an explicit id list through COPY, skipping unknown ids."""
+    print("\n🧪 Testing COPY staging of company ids...")
+
+    data = create_test_data(5)
+    db = data["db"]
+
+    try:
+        job_id = uuid.uuid4()
+        company_ids = [c.id for c in data["companies"]]
+        # Duplicates and ids that do not exist are dropped during the merge
+        bulk.copy_company_ids_to_staging(db, company_ids + company_ids[:2] + [999999])
+        item_count = bulk.merge_staged_transfer_items(
+            db, job_id, None, data["target_collection"].id
+        )
+        db.commit()
+
+        assert item_count == len(company_ids), (
+            f"Expected {len(company_ids)} staged items, got {item_count}"
+        )
+
+        print("✅ COPY staging test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_delete_collection_companies():
+    """Test chunked and filter-based removal with DELETE ... RETURNING."""
+    print("\n🧪 Testing set-based removal from a collection...")
+
+    data = create_test_data(6)
+    db = data["db"]
+
+    try:
+        source_id = data["source_collection"].id
+        company_ids = [c.id for c in data["companies"]]
+
+        # Chunks of two; the unknown id is simply not returned
+        with patch.object(bulk, "REMOVE_CHUNK_SIZE", 2):
+            removed = bulk.delete_collection_companies(
+                db, source_id, company_ids[:3] + [999999]
+            )
+        db.commit()
+
+        assert sorted(removed) == sorted(company_ids[:3]), (
+            f"Expected {company_ids[:3]} removed, got {removed}"
+        )
+
+        # Everything left matches the search; keep the excluded company
+        removed = bulk.delete_matching_collection_companies(
+            db, source_id, search="Bulk Company", exclude_company_ids=[company_ids[5]]
+        )
+        db.commit()
+
+        assert sorted(removed) == sorted(company_ids[3:5]), (
+            f"Expected {company_ids[3:5]} removed, got {removed}"
+        )
+
+        remaining = (
+            db.query(CompanyCollectionAssociation.company_id)
+            .filter(CompanyCollectionAssociation.collection_id == source_id)
+            .all()
+        )
+        assert [row.company_id for row in remaining] == [company_ids[5]], (
+            f"Expected only {company_ids[5]} left, got {remaining}"
+        )
+
+        print("✅ Set-based removal test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_removal_job():
+    """Test a background removal job from staging to its removal batches."""
+    print("\n🧪 Testing background removal job...")
+
+    data = create_test_data(6)
+    db = data["db"]
+
+    try:
+        target_id = data["target_collection"].id
+        company_ids = [c.id for c in data["companies"]]
+
+        # Only the first company is in the target; the others get no item
+        job_id = uuid.uuid4()
+        bulk.copy_company_ids_to_staging(db, company_ids)
+        item_count = bulk.merge_staged_transfer_items(
+            db, job_id, None, target_id, members_only=True
+        )
+        transfer_jobs.add_transfer_job(
+            db, job_id, None, target_id, item_count, job_type=transfer_jobs.REMOVAL
+        )
+        db.commit()
+
+        assert item_count == 1, f"Expected 1 removal item, got {item_count}"
+
+        # Admission runs before anything is staged, as for transfers
+        with (
+            patch.object(admission, "ADMISSION_MAX_JOB_ITEMS", 1),
+            patch.object(bulk, "copy_company_ids_to_staging") as mock_stage,
+        ):
+            try:
+                transfers.create_removal_job(
+                    transfers.RemoveCompaniesRequest(
+                        company_ids=company_ids, collection_id=target_id
+                    ),
+                    db,
+                )
+                rejected = None
+            except HTTPException as e:
+                rejected = e
+        assert rejected is not None and rejected.status_code == 413, (
+            f"Expected a 413 for an oversized removal, got {rejected}"
+        )
+        assert not mock_stage.called, "Expected nothing staged for a rejected job"
+
+        # The dispatcher picks the removal batch task from the job type
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(process_removal_batch, "apply_async") as mock_apply,
+            # Send straight to the queue so the batch can be inspected
+            patch.object(scheduler, "FAIR_SCHEDULING_ENABLED", False),
+            patch.object(cache, "add_job_task_ids"),
+        ):
+            mock_task.update_state = MagicMock()
+            process_transfer_job(str(job_id))
+            assert mock_apply.call_count == 1, "Expected one removal batch dispatched"
+            (batch_data,) = mock_apply.call_args.args[0]
+
+            result = process_removal_batch(batch_data)
+
+        print(f"   ✅ Removal result: {result}")
+
+        assert result["removed_count"] == 1, (
+            f"Expected 1 company removed, got {result['removed_count']}"
+        )
+
+        in_target = (
+            db.query(CompanyCollectionAssociation)
+            .filter(CompanyCollectionAssociation.collection_id == target_id)
+            .count()
+        )
+        assert in_target == 0, f"Expected an empty collection, got {in_target}"
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        assert job.success_count == 1 and job.pending_count == 0, (
+            f"Expected the job to finish, got {transfer_jobs.job_counters(job)}"
+        )
+        assert job.finished_at is not None, "Expected finished_at to be set"
+
+        print("✅ Background removal job test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_streamed_batch_planning():
+    """Test that the planner batches only pending items as it streams them."""
+    print("\n🧪 Testing streamed batch planning...")
+
+    data = create_test_data(12)
+    db = data["db"]
+
+    try:
+        source_id = data["source_collection"].id
+        target_id = data["target_collection"].id
+        company_ids = [c.id for c in data["companies"]]
+
+        job_id = make_job(db, company_ids, source_id, target_id)
+        # Two items are already done and must not be sent again
+        db.query(TransferJobItem).filter(
+            TransferJobItem.job_id == job_id,
+            TransferJobItem.company_id.in_(company_ids[:2]),
+        ).update({"status": "success"})
+        db.commit()
+
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(
+                transfer_tasks.process_transfer_batch, "apply_async"
+            ) as mock_apply,
+            patch.object(scheduler, "FAIR_SCHEDULING_ENABLED", False),
+            patch.object(cache, "add_job_task_ids"),
+        ):
+            mock_task.update_state = MagicMock()
+            result = process_transfer_job(str(job_id), 4)
+        print(f"   ✅ Planner: {result['message']}")
+
+        batches = [call.args[0][0] for call in mock_apply.call_args_list]
+        assert [len(batch["company_ids"]) for batch in batches] == [4, 4, 2], (
+            f"Expected batches of 4, 4 and 2, got {batches}"
+        )
+        planned = sorted(
+            company_id for batch in batches for company_id in batch["company_ids"]
+        )
+        assert planned == company_ids[2:], f"Expected the pending items, got {planned}"
+        assert {
+            (batch["source_collection_id"], batch["collection_id"]) for batch in batches
+        } == {(str(source_id), str(target_id))}, "Expected the job's collections"
+        assert [batch["batch_number"] for batch in batches] == [1, 2, 3]
+
+        print("✅ Streamed batch planning test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_job_routing():
+    """Test that job size picks the queue and priority of its batches."""
+    print("\n🧪 Testing queue routing by job size...")
+
+    data = create_test_data(3)
+    db = data["db"]
+
+    try:
+        interactive = transfer_tasks.job_routing(transfer_tasks.INTERACTIVE_MAX_ITEMS)
+        bulk_routing = transfer_tasks.job_routing(
+            transfer_tasks.INTERACTIVE_MAX_ITEMS + 1
+        )
+        assert interactive == {"queue": "interactive", "priority": 0}, interactive
+        assert bulk_routing == {"queue": "bulk", "priority": 6}, bulk_routing
+        # A job of unknown size never competes with interactive work
+        assert transfer_tasks.job_routing(None) == bulk_routing
+
+        job_id = make_job(
+            db,
+            [c.id for c in data["companies"]],
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(
+                transfer_tasks.process_transfer_batch, "apply_async"
+            ) as mock_apply,
+            patch.object(scheduler, "FAIR_SCHEDULING_ENABLED", False),
+            patch.object(cache, "add_job_task_ids"),
+            # The same three items now count as a bulk job
+            patch.object(transfer_tasks, "INTERACTIVE_MAX_ITEMS", 2),
+        ):
+            mock_task.update_state = MagicMock()
+            process_transfer_job(str(job_id))
+        assert mock_apply.call_args.kwargs == bulk_routing, (
+            f"Expected the bulk queue, got {mock_apply.call_args.kwargs}"
+        )
+
+        print("✅ Queue routing test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_drain_transfer_job():
+    """Test drains claiming chunks with SKIP LOCKED instead of batch messages."""
+    print("\n🧪 Testing claim-based drain...")
+
+    data = create_test_data(20)
+    db = data["db"]
+    other = SessionLocal()
+
+    try:
+        source_id = data["source_collection"].id
+        target_id = data["target_collection"].id
+
+        job_id = make_job(db, [c.id for c in data["companies"]], source_id, target_id)
+
+        # The planner only sends drain tasks, one per chunk up to the limit
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(drain_transfer_job, "apply_async") as mock_apply,
+            patch.object(cache, "add_job_task_ids"),
+        ):
+            mock_task.update_state = MagicMock()
+            planned = process_transfer_job(str(job_id), 5, dispatch_mode="drain")
+        print(f"   ✅ Planner: {planned['message']}")
+        assert mock_apply.call_count == 4, f"Expected 4 drains, got {mock_apply}"
+        # A 20-item job is small enough for the interactive queue
+        assert mock_apply.call_args.kwargs["queue"] == "interactive", (
+            f"Expected the interactive queue, got {mock_apply.call_args.kwargs}"
+        )
+
+        # Another worker holds five items; the drain skips them
+        held = (
+            other.query(TransferJobItem.id)
+            .filter(TransferJobItem.job_id == job_id)
+            .limit(5)
+            .with_for_update()
+            .all()
+        )
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            result = drain_transfer_job(str(job_id), 5)
+        print(f"   ✅ Drain: {result['message']}")
+        assert result["processed_count"] == 15, (
+            f"Expected 15 drained items, got {result['processed_count']}"
+        )
+
+        # Once released, the held items are claimed like any others
+        other.rollback()
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            result = drain_transfer_job(str(job_id), 5)
+        assert result["processed_count"] == len(held), (
+            f"Expected {len(held)} drained items, got {result['processed_count']}"
+        )
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        assert (job.success_count, job.pending_count) == (20, 0), (
+            f"Expected all 20 items transferred, got {transfer_jobs.job_counters(job)}"
+        )
+
+        print("✅ Claim-based drain test passed!")
+        return True
+
+    finally:
+        other.close()
+        db.close()
+
+
+def test_drain_failure_keeps_claim():
+    """Test that a drain fails a chunk it could not write without releasing it."""
+    print("\n🧪 Testing drain chunk failure...")
+
+    from backend.tasks import transfer_tasks
+
+    data = create_test_data(10)
+    db = data["db"]
+    other = SessionLocal()
+
+    try:
+        source_id = data["source_collection"].id
+        target_id = data["target_collection"].id
+
+        job_id = make_job(db, [c.id for c in data["companies"]], source_id, target_id)
+
+        # Items another drain could claim while a failed chunk is marked
+        claimable = []
+        mark_batch_error = transfer_tasks._mark_batch_error
+
+        def mark_while_claimed(*args, **kwargs):
+            claimable.append(
+                len(transfer_tasks._claim_pending_items(other, job_id, 100))
+            )
+            other.rollback()
+            return mark_batch_error(*args, **kwargs)
+
+        with (
+            patch("backend.tasks.transfer_tasks.current_task") as mock_task,
+            patch.object(
+                transfer_tasks,
+                "_write_batch_bulk",
+                side_effect=RuntimeError("bulk write failed"),
+            ),
+            patch.object(
+                transfer_tasks, "_mark_batch_error", side_effect=mark_while_claimed
+            ),
+            # Per-row writes would commit, so drains write in bulk regardless
+            patch.object(transfer_tasks, "BATCH_WRITE_MODE", "per_row"),
+            patch.object(
+                transfer_tasks.process_transfer_batch, "apply_async"
+            ) as mock_apply,
+        ):
+            mock_task.update_state = MagicMock()
+            mock_apply.return_value.id = "retry-batch"
+            result = drain_transfer_job(str(job_id), 5)
+        print(f"   ✅ Drain: {result['message']}")
+
+        # The chunk being failed stays locked, untried items stay claimable
+        assert claimable == [5, 0], f"Expected [5, 0] claimable, got {claimable}"
+        assert mock_apply.call_count == 2, f"Expected 2 retries, got {mock_apply}"
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        assert (job.pending_count, job.success_count) == (10, 0), (
+            f"Expected all 10 items requeued, got {transfer_jobs.job_counters(job)}"
+        )
+
+        print("✅ Drain chunk failure test passed!")
+        return True
+
+    finally:
+        other.close()
+        db.close()
+
+
+def test_fair_scheduling():
+    """Test that the scheduler interleaves the batches of concurrent jobs."""
+    print("\n🧪 Testing fair batch scheduling...")
+
+    queue = f"test-fair-{uuid.uuid4()}"
+    job_a, job_b = str(uuid.uuid4()), str(uuid.uuid4())
+    released = []
+
+    def record(queue, entry):
+        released.append(entry["batch"]["job_id"])
+        return str(uuid.uuid4())
+
+    try:
+        with patch.object(scheduler, "_send", side_effect=record):
+            # Nothing is released while the window is full
+            with patch.object(scheduler, "SCHEDULER_WINDOW", 0):
+                for job_id, weight in ((job_a, 1), (job_b, 2)):
+                    batches = [{"job_id": job_id, "batch_number": n} for n in range(4)]
+                    assert scheduler.submit_batches(
+                        job_id, "test.batch", batches, queue, 0, weight=weight
+                    ), "Expected the scheduler to accept the batches"
+
+            # Job B has weight 2, so it gets two batches per round
+            with patch.object(scheduler, "SCHEDULER_WINDOW", 6):
+                scheduler.dispatch(queue)
+                assert released == [job_a, job_b, job_b, job_a, job_b, job_b], (
+                    f"Expected interleaved batches, got {released}"
+                )
+
+                # A finished batch frees its slot for the next one in turn
+                in_flight = cache.get_redis().zrange(
+                    scheduler._in_flight_key(queue), 0, 0
+                )
+                scheduler.batch_finished(queue, in_flight[0].decode())
+                assert released[6:] == [job_a], f"Expected job A next, got {released}"
+
+        print("✅ Fair scheduling test passed!")
+        return True
+
+    finally:
+        client = cache.get_redis()
+        client.delete(
+            scheduler._ring_key(queue),
+            scheduler._weights_key(queue),
+            scheduler._in_flight_key(queue),
+            scheduler._batches_key(job_a),
+            scheduler._batches_key(job_b),
+        )
+
+
+def test_drop_job_frees_slots():
+    """Test that dropping a job hands its in-flight slots to other jobs."""
+    print("\n🧪 Testing scheduler slots of a dropped job...")
+
+    queue = f"test-drop-{uuid.uuid4()}"
+    job_a, job_b = str(uuid.uuid4()), str(uuid.uuid4())
+    released = {}
+
+    def record(queue, entry):
+        task_id = str(uuid.uuid4())
+        released[task_id] = entry["batch"]["job_id"]
+        return task_id
+
+    try:
+        with (
+            patch.object(scheduler, "_send", side_effect=record),
+            patch.object(scheduler, "SCHEDULER_QUEUE_WINDOWS", {queue: 1}),
+        ):
+            for job_id in (job_a, job_b):
+                batches = [{"job_id": job_id, "batch_number": n} for n in range(2)]
+                scheduler.submit_batches(job_id, "test.batch", batches, queue, 0)
+            assert list(released.values()) == [job_a], (
+                f"Expected one batch of job A, got {released}"
+            )
+
+            # Revoked batches never report back, so the drop frees their slots
+            task_ids = scheduler.drop_job(job_a)
+            assert task_ids == list(released)[:1], (
+                f"Expected job A's task, got {task_ids}"
+            )
+            assert list(released.values()) == [job_a, job_b], (
+                f"Expected job B in the freed slot, got {released}"
+            )
+
+        print("✅ Dropped job slot test passed!")
+        return True
+
+    finally:
+        client = cache.get_redis()
+        client.delete(
+            scheduler._ring_key(queue),
+            scheduler._weights_key(queue),
+            scheduler._in_flight_key(queue),
+            scheduler._batches_key(job_a),
+            scheduler._batches_key(job_b),
+            cache.job_tasks_key(job_a),
+            cache.job_tasks_key(job_b),
+        )
+
+
+def main():
+    """Run the staged pipeline tests."""
+    print("🚀 Testing Bulk Transfer Pipeline")
+    print("=" * 50)
+
+    Base.metadata.create_all(engine)
+
+    all_passed = True
+
+    try:
+        test_staged_collection_transfer()
+        test_copy_company_ids()
+        test_delete_collection_companies()
+        test_removal_job()
+        test_streamed_batch_planning()
+        test_job_routing()
+        test_drain_transfer_job()
+        test_drain_failure_keeps_claim()
+        test_fair_scheduling()
+        test_drop_job_frees_slots()
+    except Exception as e:
+        print(f"\n❌ Test error: {e}")
+        all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Test collection pages: keyset cursors, totals, search ranking, the single page
+statement, ETags on the async routes, pool telemetry and the collection
+registry.
+"""
+
+import asyncio
+import uuid
+from unittest.mock import patch
+
+from fastapi import HTTPException, Response
+from sqlalchemy import event, text
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from backend import cache
+from backend.db import counts, database, pool
+from backend.db import search as search_backend
+from backend.db.database import (
+    Base,
+    Company,
+    CompanyCollection,
+    CompanyCollectionAssociation,
+    SessionLocal,
+    engine,
+)
+from backend.db.registry import collection_registry
+from backend.routes import collections, companies, pagination
+
+
+def create_test_companies():
+    """Companies sharing a few names, so pages have to break ties on id."""
+    db = SessionLocal()
+
+    try:
+        prefix = f"Paging {uuid.uuid4().hex[:8]}"
+        # Three names, each used by several companies
+        companies = [
+            Company(company_name=f"{prefix} {name}")
+            for name in ("B", "A", "C", "A", "B", "A", "C")
+        ]
+        db.add_all(companies)
+        db.commit()
+
+        return {"companies": companies, "prefix": prefix, "db": db}
+    except Exception as e:
+        db.close()
+        raise e
+
+
+def test_cursor_round_trip():
+    """Test that cursors decode to what was encoded and bad ones are rejected."""
+    print("🧪 Testing cursor round trip...")
+
+    values = ["Acme, Inc. ±", 0.25, 42]
+    for direction in ("next", "prev"):
+        cursor = pagination.encode_cursor(direction, values)
+        assert "=" not in cursor, f"Cursor should be unpadded: {cursor}"
+        assert pagination.decode_cursor(cursor) == (direction, values)
+
+    for bad_cursor in (
+        "not a cursor",
+        pagination.encode_cursor("sideways", [1]),
+        "eyJkIjoibmV4dCJ9",  # {"d":"next"} without values
+    ):
+        try:
+            pagination.decode_cursor(bad_cursor)
+        except HTTPException as e:
+            assert e.status_code == 400, f"Expected 400, got {e.status_code}"
+        else:
+            raise AssertionError(f"Cursor {bad_cursor!r} should be rejected")
+
+    print("✅ Cursor round trip test passed!")
+    return True
+
+
+def test_duplicate_sort_keys():
+    """Test that pages sorted by a repeated name neither skip nor repeat rows."""
+    print("\n🧪 Testing page boundaries with duplicate sort keys...")
+
+    data = create_test_companies()
+    db = data["db"]
+
+    try:
+        query = db.query(Company.id, Company.company_name).filter(
+            Company.company_name.like(f"{data['prefix']}%")
+        )
+        sort_columns = pagination.sort_columns(db, "company_name", None)
+        expected = [
+            company.id
+            for company in sorted(
+                data["companies"], key=lambda c: (c.company_name, c.id)
+            )
+        ]
+
+        # Forward with a page size that splits each run of equal names
+        pages = []
+        cursor = None
+        while True:
+            rows, next_cursor, prev_cursor = pagination.keyset_page(
+                query, sort_columns, 2, cursor=cursor
+            )
+            pages.append([row.id for row in rows])
+            assert (prev_cursor is None) == (cursor is None), (
+                "Only the first page should lack a prev cursor"
+            )
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+
+        forward = [company_id for page in pages for company_id in page]
+        assert forward == expected, f"Expected {expected}, got {forward}"
+        assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+        # Back from the last page returns the same pages in reverse
+        backward = []
+        while prev_cursor is not None:
+            rows, _, prev_cursor = pagination.keyset_page(
+                query, sort_columns, 2, cursor=prev_cursor
+            )
+            backward.insert(0, [row.id for row in rows])
+        assert backward == pages[:-1], f"Expected {pages[:-1]}, got {backward}"
+
+        # An offset start continues seamlessly into cursor pages
+        rows, next_cursor, prev_cursor = pagination.keyset_page(
+            query, sort_columns, 3, offset=3
+        )
+        assert [row.id for row in rows] == expected[3:6]
+        assert prev_cursor is not None
+        rows, next_cursor, _ = pagination.keyset_page(
+            query, sort_columns, 3, cursor=next_cursor
+        )
+        assert [row.id for row in rows] == expected[6:]
+        assert next_cursor is None
+
+        print("✅ Duplicate sort key test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_search_total_follows_version():
+    """Test that a cached search total is not reused for a newer collection version."""
+    print("\n🧪 Testing search totals across collection versions...")
+
+    data = create_test_companies()
+    db = data["db"]
+
+    try:
+        search = data["prefix"]
+        query = db.query(Company.id, Company.company_name).filter(
+            Company.company_name.like(f"{search}%")
+        )
+
+        before = counts.total_count(query, counts.ALL_COMPANIES, search, version="v1")
+        db.add(Company(company_name=f"{search} D"))
+        db.commit()
+
+        # Same version: the brief in-memory cache may answer
+        cached = counts.total_count(query, counts.ALL_COMPANIES, search, version="v1")
+        # A write bumps the version, which must not see the old count
+        after = counts.total_count(query, counts.ALL_COMPANIES, search, version="v2")
+
+        assert before == cached == (7, True), f"Expected 7 before, got {before}"
+        assert after == (8, True), f"Expected 8 after the write, got {after}"
+
+        print("✅ Search total version test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def create_test_collection(company_count=3):
+    """A collection holding `company_count` new companies."""
+    db = SessionLocal()
+
+    try:
+        prefix = f"Paging {uuid.uuid4().hex[:8]}"
+        collection = CompanyCollection(collection_name=prefix)
+        companies = [
+            Company(company_name=f"{prefix} {n}") for n in range(company_count)
+        ]
+        db.add_all([collection, *companies])
+        db.commit()
+
+        db.add_all(
+            CompanyCollectionAssociation(
+                company_id=company.id, collection_id=collection.id
+            )
+            for company in companies
+        )
+        db.commit()
+
+        return {"collection": collection, "companies": companies, "db": db}
+    except Exception as e:
+        db.close()
+        raise e
+
+
+def test_collection_counter():
+    """Test that collection sizes follow inserts and deletes, and counts cap."""
+    print("\n🧪 Testing maintained collection counters...")
+
+    data = create_test_collection(3)
+    db = data["db"]
+
+    try:
+        collection_id = data["collection"].id
+        assert counts.collection_size(db, collection_id) == 3
+
+        db.query(CompanyCollectionAssociation).filter(
+            CompanyCollectionAssociation.collection_id == collection_id,
+            CompanyCollectionAssociation.company_id == data["companies"][0].id,
+        ).delete()
+        db.commit()
+        size = counts.collection_size(db, collection_id)
+        assert size == 2, f"Expected 2 after a delete, got {size}"
+
+        # Unfiltered totals come from the counter, searches are capped
+        query = db.query(CompanyCollectionAssociation).filter(
+            CompanyCollectionAssociation.collection_id == collection_id
+        )
+        assert counts.total_count(query, collection_id) == (2, True)
+        assert counts.capped_count(query, 1) == (1, False)
+        assert counts.capped_count(query, 2) == (2, True)
+
+        print("✅ Collection counter test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_relevance_search():
+    """Test that search ranks prefix matches first and pages by relevance."""
+    print("\n🧪 Testing ranked company search...")
+
+    db = SessionLocal()
+
+    try:
+        term = uuid.uuid4().hex[:10]
+        # Expected order: the prefix match, then the closest other matches
+        names = [f"{term} Alpha", f"Beta {term}", f"Gamma Holdings {term}"]
+        companies = [Company(company_name=name) for name in reversed(names)]
+        db.add_all([*companies, Company(company_name=f"{term[:-1]} Other")])
+        db.commit()
+        expected = sorted(companies, key=lambda c: names.index(c.company_name))
+
+        query = db.query(Company.id, Company.company_name).filter(
+            search_backend.company_name_filter(term.upper())
+        )
+        sort_columns = pagination.sort_columns(db, None, term.upper())
+
+        found = []
+        cursor = None
+        while True:
+            rows, cursor, _ = pagination.keyset_page(
+                query, sort_columns, 1, cursor=cursor
+            )
+            found.extend(row.id for row in rows)
+            if cursor is None:
+                break
+        assert found == [c.id for c in expected], (
+            f"Expected {[c.company_name for c in expected]}, got {found}"
+        )
+
+        # LIKE wildcards in the search are matched literally
+        wildcard = db.query(Company.id).filter(
+            search_backend.company_name_filter(f"{term}_")
+        )
+        assert wildcard.count() == 0, "Expected '_' to match only itself"
+
+        print("✅ Ranked search test passed!")
+        return True
+
+    finally:
+        db.close()
+
+
+def test_single_statement_page():
+    """Test that a collection page, liked flags included, is one statement."""
+    print("\n🧪 Testing single-statement collection pages...")
+
+    data = create_test_collection(3)
+    liked = create_test_collection(1)
+    db = data["db"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    try:
+        collection_id = data["collection"].id
+        liked_id = liked["collection"].id
+        liked_company_id = data["companies"][1].id
+        db.add(
+            CompanyCollectionAssociation(
+                company_id=liked_company_id, collection_id=liked_id
+            )
+        )
+        db.commit()
+
+        query = (
+            db.query(Company.id, Company.company_name)
+            .select_from(CompanyCollectionAssociation)
+            .join(Company, CompanyCollectionAssociation.company_id == Company.id)
+            .filter(CompanyCollectionAssociation.collection_id == collection_id)
+        )
+        event.listen(engine, "before_cursor_execute", record)
+        with patch.object(collection_registry, "role_id", return_value=liked_id):
+            page = companies.fetch_company_page(
+                query, collection_id, member_of=[liked_id]
+            )
+        event.remove(engine, "before_cursor_execute", record)
+
+        assert len(statements) == 1, f"Expected one statement, got {statements}"
+        assert page.total == 3, f"Expected a total of 3, got {page.total}"
+        assert [c.id for c in page.companies if c.liked] == [liked_company_id]
+        assert [c.member_of for c in page.companies] == [[], [liked_id], []]
+
+        print("✅ Single-statement page test passed!")
+        return True
+
+    finally:
+        if event.contains(engine, "before_cursor_execute", record):
+            event.remove(engine, "before_cursor_execute", record)
+        liked["db"].close()
+        db.close()
+
+
+def test_async_page_etag():
+    """Test the async collection route, its ETag and the 304 revalidation."""
+    print("\n🧪 Testing async collection pages and ETags...")
+
+    data = create_test_collection(2)
+    db = data["db"]
+    collection_id = data["collection"].id
+
+    def request(etag=None):
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        return Request({"type": "http", "headers": headers})
+
+    async def read_page(etag=None):
+        response = Response()
+        async with database.AsyncSessionLocal() as async_db:
+            page = await collections.get_company_collection_by_id(
+                request(etag),
+                response,
+                collection_id,
+                offset=0,
+                limit=10,
+                search=None,
+                cursor=None,
+                sort=None,
+                member_of=None,
+                db=async_db,
+            )
+        return page, response.headers.get("etag")
+
+    async def pages():
+        try:
+            first, etag = await read_page()
+            revalidated, _ = await read_page(etag)
+
+            # A write bumps the collection version, so the old tag goes stale
+            extra = Company(company_name="Paging extra")
+            db.add(extra)
+            db.commit()
+            db.add(
+                CompanyCollectionAssociation(
+                    company_id=extra.id, collection_id=collection_id
+                )
+            )
+            db.commit()
+            cache.bump_collection_versions(collection_id)
+            changed, new_etag = await read_page(etag)
+            return first, etag, revalidated, changed, new_etag
+        finally:
+            # Pooled asyncpg connections belong to this loop
+            await database.async_engine.dispose()
+
+    try:
+        first, etag, revalidated, changed, new_etag = asyncio.run(pages())
+
+        assert etag is not None, "Expected an ETag on the page"
+        assert [c.id for c in first.companies] == [c.id for c in data["companies"]]
+        assert first.total == 2, f"Expected a total of 2, got {first.total}"
+        assert revalidated.status_code == 304, "Expected 304 for a matching ETag"
+        assert new_etag not in (None, etag), "Expected a new ETag after the write"
+        assert changed.total == 3, f"Expected a total of 3, got {changed.total}"
+
+        print("✅ Async page ETag test passed!")
+        return True
+
+    finally:
+        cache._async_cache_redis = None
+        db.close()
+
+
+def test_pool_telemetry():
+    """Test that pool status reports checkouts and the configured pool mode."""
+    print("\n🧪 Testing connection pool telemetry...")
+
+    before = pool.pool_status(engine)["telemetry"]["checkouts"]
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        status = pool.pool_status(engine)
+        assert status["checked_out"] >= 1, f"Expected a checkout, got {status}"
+        assert status["telemetry"]["checked_out"] >= 1
+    finally:
+        db.close()
+
+    after = pool.pool_status(engine)["telemetry"]["checkouts"]
+    assert after > before, f"Expected more checkouts than {before}, got {after}"
+
+    # PgBouncer mode leaves pooling and prepared statements to the bouncer
+    with patch.object(pool, "DB_POOL_MODE", "null"):
+        options = pool.engine_options(is_async=True)
+    assert options["poolclass"] is NullPool
+    assert options["connect_args"]["statement_cache_size"] == 0
+    with patch.object(pool, "DB_POOL_MODE", "bouncy"):
+        try:
+            pool.engine_options()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Expected an unknown pool mode to be rejected")
+
+    print("✅ Pool telemetry test passed!")
+    return True
+
+
+def test_evicted_version_changes_tag():
+    """Test that a version counter lost from Redis never brings back an old tag."""
+    print("\n🧪 Testing version tags across a lost counter...")
+
+    key = cache.collection_version_key(f"test-{uuid.uuid4()}")
+    client = cache.get_cache_redis()
+
+    async def tags():
+        seen = [await cache.version_tag([key], {})]
+        cache._bump_versions([key])
+        seen.append(await cache.version_tag([key], {}))
+        # Evicted, then read: the counter restarts where an old tag had it
+        client.delete(key)
+        seen.append(await cache.version_tag([key], {}))
+        # Evicted, then written before any read
+        client.delete(key)
+        cache._bump_versions([key])
+        seen.append(await cache.version_tag([key], {}))
+        return seen
+
+    try:
+        seen = asyncio.run(tags())
+        assert None not in seen, f"Expected tags, got {seen}"
+        assert len(set(seen)) == len(seen), f"A tag came back: {seen}"
+
+        print("✅ Lost version counter test passed!")
+        return True
+
+    finally:
+        client.delete(key)
+        # The async client belongs to the loop that just closed
+        cache._async_cache_redis = None
+
+
+def test_registry_misses():
+    """Test that unknown collection ids don't reload the registry on every lookup."""
+    print("\n🧪 Testing collection registry misses...")
+
+    db = SessionLocal()
+    collection = None
+    try:
+        missing_id = uuid.uuid4()
+        with patch.object(
+            collection_registry, "refresh", wraps=collection_registry.refresh
+        ) as refresh:
+            collection_registry.collection_name(db, missing_id)
+            refreshes = refresh.call_count
+            for _ in range(5):
+                assert collection_registry.collection_name(db, missing_id) is None
+            assert refresh.call_count == refreshes, (
+                f"Expected no more refreshes than {refreshes}, got {refresh.call_count}"
+            )
+
+        # Creating the collection clears the misses it might be among
+        collection = CompanyCollection(id=missing_id, collection_name="Registry Test")
+        db.add(collection)
+        db.commit()
+        name = collection_registry.collection_name(db, missing_id)
+        assert name == "Registry Test", f"Expected the new collection, got {name}"
+
+        print("✅ Collection registry miss test passed!")
+        return True
+
+    finally:
+        if collection is not None:
+            db.delete(collection)
+            db.commit()
+        db.close()
+
+
+def main():
+    """Run the collection page tests."""
+    print("🚀 Testing Collection Pages")
+    print("=" * 50)
+
+    Base.metadata.create_all(engine)
+
+    all_passed = True
+
+    try:
+        test_cursor_round_trip()
+        test_duplicate_sort_keys()
+        test_search_total_follows_version()
+        test_collection_counter()
+        test_relevance_search()
+        test_single_statement_page()
+        test_async_page_etag()
+        test_pool_telemetry()
+        test_evicted_version_changes_tag()
+        test_registry_misses()
+    except Exception as e:
+        print(f"\n❌ Test error: {e}")
+        all_passed = False
+
+    return 0 if all_passed else 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -6,16 +6,23 @@ Simple test to verify transfers are working.
 import uuid
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy import text
+
+from backend import cache
+from backend.celery_app import celery_app
+from backend.db import transfer_jobs
 from backend.db.database import (
     Base,
     Company,
     CompanyCollection,
     CompanyCollectionAssociation,
     SessionLocal,
+    TransferJob,
     TransferJobItem,
     engine,
 )
 from backend.tasks.transfer_tasks import process_transfer_batch
+from tests.helpers import make_job
 
 
 def setup_test_data():
@@ -235,6 +242,841 @@ def test_already_in_collection():
         db.close()
 
 
+def test_job_counters():
+    """Test that job counters follow the item status changes."""
+    print("\n🧪 Testing transfer job counters...")
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+
+            batch_data = {
+                "job_id": str(job_id),
+                "company_ids": company_ids[:1],
+                "source_collection_id": str(data["source_collection"].id),
+                "collection_id": str(data["target_collection"].id),
+                "batch_number": 1,
+            }
+            process_transfer_batch(batch_data)
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        print(
+            f"   After first batch: {job.pending_count} pending, {job.success_count} success"
+        )
+        if (job.pending_count, job.success_count, job.finished_at) != (1, 1, None):
+            return False
+
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            process_transfer_batch(dict(batch_data, company_ids=company_ids[1:]))
+
+        db.refresh(job)
+        print(
+            f"   After second batch: {job.pending_count} pending, {job.success_count} success"
+        )
+
+        return (
+            job.total_count == 2
+            and job.pending_count == 0
+            and job.success_count == 2
+            and job.started_at is not None
+            and job.finished_at is not None
+        )
+
+    finally:
+        db.close()
+
+
+def test_unchanged_counts_settle_job():
+    """Test that a transition leaving the counts as they were still settles the job."""
+    print("\n🧪 Testing job settling without count changes...")
+
+    from collections import Counter
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        job_id = make_job(
+            db,
+            [data["company1"].id],
+            data["source_collection"].id,
+            data["target_collection"].id,
+            status="error",
+        )
+        job = db.get(TransferJob, job_id)
+        retried = Counter({("error", "error"): 1})
+
+        # A failed retry that will be retried again keeps the job open
+        transfer_jobs.record_status_changes(db, job_id, retried, awaiting_retry=True)
+        db.commit()
+        db.refresh(job)
+        awaiting = job.finished_at
+
+        # The last failed retry finishes it
+        transfer_jobs.record_status_changes(db, job_id, retried)
+        db.commit()
+        db.refresh(job)
+        print(f"   Finished while awaiting retry: {awaiting}, after: {job.finished_at}")
+
+        return awaiting is None and job.finished_at is not None and job.error_count == 1
+
+    finally:
+        db.close()
+
+
+def test_job_status_since():
+    """Test that job status with `since` only returns the changed items."""
+    print("\n🧪 Testing job status changes since a cursor...")
+
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        # The status response seeds the cursor without sending any item
+        first = transfers.build_transfer_job_response(db, job_id)
+        print(f"   Initial read: cursor {first.next_since}")
+
+        # A transaction left open elsewhere must not hold the cursor back
+        idle = SessionLocal()
+        idle.query(TransferJob).filter(TransferJob.id == job_id).all()
+
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            process_transfer_batch(
+                {
+                    "job_id": str(job_id),
+                    "company_ids": company_ids[:1],
+                    "source_collection_id": str(data["source_collection"].id),
+                    "collection_id": str(data["target_collection"].id),
+                    "batch_number": 1,
+                }
+            )
+
+        # Every poll is a request of its own, in a transaction of its own
+        db.commit()
+        second = transfers.build_transfer_job_response(
+            db, job_id, since=first.next_since
+        )
+        print(f"   After one batch: {[item.company_id for item in second.items]}")
+
+        db.commit()
+        third = transfers.build_transfer_job_response(
+            db, job_id, since=second.next_since
+        )
+        print(f"   Idle read: {len(third.items)} items")
+        idle.close()
+
+        return (
+            first.items == []
+            and first.next_since is not None
+            and second.next_since > first.next_since
+            and [item.company_id for item in second.items] == company_ids[:1]
+            and second.items[0].status == "success"
+            and second.success_count == 1
+            and third.items == []
+        )
+
+    finally:
+        db.close()
+
+
+def test_update_item_status():
+    """Test that a manual item status update is validated and moves the job."""
+    print("\n🧪 Testing manual item status update...")
+
+    from fastapi import HTTPException
+
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+        item = (
+            db.query(TransferJobItem)
+            .filter(TransferJobItem.job_id == job_id)
+            .order_by(TransferJobItem.company_id)
+            .first()
+        )
+
+        try:
+            transfers.update_transfer_item_status(job_id, item.id, "done", db=db)
+            return False
+        except HTTPException as e:
+            print(f"   Unknown status: {e.status_code}")
+            if e.status_code != 422:
+                return False
+
+        version_key = cache.transfer_job_version_key(job_id)
+        version_before = cache.get_cache_redis().get(version_key)
+        transfers.update_transfer_item_status(job_id, item.id, "error", "manual", db=db)
+        version_after = cache.get_cache_redis().get(version_key)
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        db.refresh(item)
+        print(f"   Counters: {job.pending_count} pending, {job.error_count} error")
+
+        return (
+            (job.pending_count, job.error_count) == (1, 1)
+            and (item.status, item.error_message, item.attempt_count)
+            == ("error", "manual", 1)
+            and version_after != version_before
+        )
+
+    finally:
+        db.close()
+
+
+def test_job_events_published():
+    """Test that a committed batch publishes its item and counter events."""
+    print("\n🧪 Testing job progress events...")
+
+    import json
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+    pubsub = cache.get_redis().pubsub()
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+        pubsub.subscribe(cache.job_events_channel(job_id))
+        pubsub.get_message(timeout=1.0)  # The subscribe confirmation
+
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            process_transfer_batch(
+                {
+                    "job_id": str(job_id),
+                    "company_ids": company_ids[:1],
+                    "source_collection_id": str(data["source_collection"].id),
+                    "collection_id": str(data["target_collection"].id),
+                    "batch_number": 1,
+                }
+            )
+
+        events = {}
+        while message := pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=1.0
+        ):
+            event = json.loads(message["data"])
+            events[event.pop("type")] = event
+        print(f"   Events: {sorted(events)}")
+
+        return (
+            events["items"]["statuses"] == {"success": company_ids[:1]}
+            and events["counters"]["success_count"] == 1
+            and events["counters"]["pending_count"] == 1
+        )
+
+    finally:
+        pubsub.close()
+        db.close()
+
+
+def test_job_items_formats():
+    """Test that job items come back as rows or as parallel columns."""
+    print("\n🧪 Testing job item response formats...")
+
+    import orjson
+    from fastapi import HTTPException
+
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        rows = orjson.loads(
+            transfers.get_transfer_job_items(job_id, item_format="rows", db=db).body
+        )
+        columns = orjson.loads(
+            transfers.get_transfer_job_items(job_id, item_format="columns", db=db).body
+        )
+        print(f"   Columns: {sorted(columns)}")
+
+        try:
+            transfers.get_transfer_job_items(job_id, item_format="xml", db=db)
+            return False
+        except HTTPException as e:
+            if e.status_code != 400:
+                return False
+
+        return (
+            sorted(row["company_id"] for row in rows) == company_ids
+            and {row["status"] for row in rows} == {"pending"}
+            and set(rows[0]) == set(transfers.ITEM_FIELDS)
+            and set(columns) == {"id", "company_id", "status"}
+            and sorted(columns["company_id"]) == company_ids
+            and columns["status"] == ["pending", "pending"]
+            and sorted(columns["id"]) == sorted(row["id"] for row in rows)
+        )
+
+    finally:
+        db.close()
+
+
+def test_companies_status_etag():
+    """Test that company statuses only go stale with the jobs of those companies."""
+    print("\n🧪 Testing company status ETags...")
+
+    import asyncio
+
+    from starlette.requests import Request
+
+    from backend.db.database import AsyncSessionLocal, async_engine
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+    company1_id, company2_id = data["company1"].id, data["company2"].id
+    collection_ids = (data["source_collection"].id, data["target_collection"].id)
+
+    async def etag(company_ids):
+        async with AsyncSessionLocal() as async_db:
+            response = await transfers.get_companies_transfer_status(
+                Request({"type": "http", "headers": []}), company_ids, db=async_db
+            )
+        return response.headers.get("etag")
+
+    async def etags():
+        try:
+            other_job_id = make_job(db, [company1_id], *collection_ids)
+            first = await etag([company2_id])
+            # Another company's job changes
+            cache.bump_transfer_job_versions(other_job_id)
+            unrelated = await etag([company2_id])
+            # A job for the requested company appears
+            make_job(db, [company2_id], *collection_ids)
+            related = await etag([company2_id])
+            return first, unrelated, related
+        finally:
+            # Pooled asyncpg connections belong to this loop
+            await async_engine.dispose()
+
+    try:
+        first, unrelated, related = asyncio.run(etags())
+        print(f"   ETags: {first}, {unrelated}, {related}")
+        return first is not None and first == unrelated and related != first
+
+    finally:
+        # The async client belongs to the loop that just closed
+        cache._async_cache_redis = None
+        db.close()
+
+
+def test_missing_target_collection():
+    """Test that a batch for a vanished target fails its items instead of hanging."""
+    print("\n🧪 Testing batch with a missing target collection...")
+
+    from backend.db.registry import collection_registry
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        batch_data = {
+            "job_id": str(job_id),
+            "company_ids": company_ids,
+            "source_collection_id": str(data["source_collection"].id),
+            "collection_id": str(data["target_collection"].id),
+            "batch_number": 1,
+        }
+        with patch.object(collection_registry, "collection_name", return_value=None):
+            result = process_transfer_batch(batch_data)
+        print(f"   Batch: {result['message']}")
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+
+        return (
+            result["status"] == "error"
+            and (job.pending_count, job.error_count) == (0, 2)
+            and job.finished_at is not None
+        )
+
+    finally:
+        db.close()
+
+
+def test_cancel_job():
+    """Test that a cancel stops queued and in-flight batches of the job."""
+    print("\n🧪 Testing cooperative job cancellation...")
+
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+        cache.add_job_task_ids(job_id, ["queued-batch"])
+
+        with patch.object(celery_app.control, "revoke") as mock_revoke:
+            result = transfers.cancel_transfer_job(job_id, db)
+        print(f"   Cancel: {result}")
+
+        batch_data = {
+            "job_id": str(job_id),
+            "company_ids": company_ids,
+            "source_collection_id": str(data["source_collection"].id),
+            "collection_id": str(data["target_collection"].id),
+            "batch_number": 1,
+        }
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            # The cancel flag skips the batch without touching the database
+            flagged = process_transfer_batch(batch_data)
+            # Without the flag the cancelled items are still left alone
+            with patch.object(cache, "is_job_cancelled", return_value=False):
+                unflagged = process_transfer_batch(batch_data)
+        print(f"   Batches: {flagged['status']}, {unflagged['status']}")
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        transferred = (
+            db.query(CompanyCollectionAssociation)
+            .filter(
+                CompanyCollectionAssociation.collection_id
+                == data["target_collection"].id
+            )
+            .count()
+        )
+
+        return (
+            result["cancelled_count"] == 2
+            and result["revoked_batches"] == 1
+            and mock_revoke.call_args.args[0] == ["queued-batch"]
+            and flagged["status"] == "cancelled"
+            and unflagged["success_count"] == 0
+            and job.cancelled_count == 2
+            and job.success_count == 0
+            and job.finished_at is not None
+            and transferred == 0
+        )
+
+    finally:
+        db.close()
+
+
+def test_cancel_skips_locked_items():
+    """Test that a cancel doesn't wait on items a worker holds, which sweeps them."""
+    print("\n🧪 Testing cancel while a worker holds items...")
+
+    from backend.tasks.transfer_tasks import process_bulk_transfer_job
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+    worker_db = SessionLocal()
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        # A worker has locked the first item, as a merge chunk would
+        worker_db.query(TransferJobItem).filter(
+            TransferJobItem.job_id == job_id,
+            TransferJobItem.company_id == company_ids[0],
+        ).with_for_update().one()
+
+        cache.set_job_cancelled(job_id)
+        cancelled_count = transfer_jobs.cancel_items(db, job_id)
+        db.commit()
+        print(f"   Cancelled while locked: {cancelled_count}")
+
+        # The worker lets go without finishing; its next step sees the flag
+        worker_db.rollback()
+        with patch("backend.tasks.transfer_tasks.current_task") as mock_task:
+            mock_task.update_state = MagicMock()
+            result = process_bulk_transfer_job(str(job_id))
+        print(f"   Bulk task: {result['message']}")
+
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+
+        return (
+            cancelled_count == 1
+            and result["total_items"] == 0
+            and (job.pending_count, job.cancelled_count) == (0, 2)
+            and job.finished_at is not None
+        )
+
+    finally:
+        worker_db.close()
+        db.close()
+
+
+def test_retry_failed_items():
+    """Test that retries resubmit only failed items and dead-letter exhausted ones."""
+    print("\n🧪 Testing targeted retries with backoff...")
+
+    from backend.tasks import transfer_tasks
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+            status="error",
+        )
+        # One item has attempts left, the other has used all of them
+        for company_id, attempt_count in zip(company_ids, (1, 5)):
+            db.query(TransferJobItem).filter(
+                TransferJobItem.job_id == job_id,
+                TransferJobItem.company_id == company_id,
+            ).update({"attempt_count": attempt_count})
+        db.commit()
+
+        with patch.object(
+            transfer_tasks.process_transfer_batch, "apply_async"
+        ) as mock_apply:
+            mock_apply.return_value.id = "retry-batch"
+            result = transfer_tasks.retry_failed_batches(str(job_id))
+        print(f"   Retry: {result['message']}")
+
+        ((batch_data,),), options = mock_apply.call_args
+        job = db.get(TransferJob, job_id)
+        db.refresh(job)
+        dead_letter = (
+            db.query(TransferJobItem.company_id)
+            .filter(
+                TransferJobItem.job_id == job_id,
+                TransferJobItem.status == "dead_letter",
+            )
+            .scalar()
+        )
+
+        return (
+            mock_apply.call_count == 1
+            and batch_data["company_ids"] == company_ids[:1]
+            # First retry waits between half and all of the base backoff
+            and 1 <= options["countdown"] <= 2
+            and dead_letter == company_ids[1]
+            and (job.pending_count, job.error_count, job.dead_letter_count) == (1, 0, 1)
+        )
+
+    finally:
+        db.close()
+
+
+def test_failed_batch_requeued_before_progress():
+    """Test that a failed batch is requeued before its progress goes out."""
+    print("\n🧪 Testing progress of a failed batch...")
+
+    from backend.routes.transfers import job_finished
+    from backend.tasks import transfer_tasks
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        company_ids = [data["company1"].id, data["company2"].id]
+        job_id = make_job(
+            db,
+            company_ids,
+            data["source_collection"].id,
+            data["target_collection"].id,
+        )
+
+        # What a subscriber would see at each publish
+        published = []
+
+        def record_progress(session, published_job_id, _company_ids=None):
+            job = session.get(TransferJob, published_job_id)
+            session.refresh(job)
+            published.append(transfer_jobs.job_counters(job))
+
+        with (
+            patch.object(
+                transfer_tasks, "_remove_batch", side_effect=RuntimeError("boom")
+            ),
+            patch.object(
+                transfer_tasks.process_transfer_batch, "apply_async"
+            ) as mock_apply,
+            patch.object(
+                transfer_jobs, "publish_progress", side_effect=record_progress
+            ),
+        ):
+            mock_apply.return_value.id = "retry-batch"
+            try:
+                transfer_tasks._run_removal_batch(
+                    db, job_id, company_ids, str(data["target_collection"].id), 1
+                )
+            except RuntimeError:
+                pass
+            else:
+                raise AssertionError("The failed batch should raise")
+
+        print(f"   Published: {published}")
+
+        # An error awaiting its retry keeps the job unfinished
+        awaiting_retry = {
+            **published[0],
+            "pending_count": 0,
+            "error_count": 2,
+            "finished_at": None,
+        }
+
+        return (
+            mock_apply.call_count == 1
+            and len(published) == 1
+            and published[0]["pending_count"] == 2
+            and published[0]["finished_at"] is None
+            and not job_finished(published[0])
+            and not job_finished(awaiting_retry)
+        )
+
+    finally:
+        db.close()
+
+
+def test_collection_transfer_job():
+    """Test that a whole-collection job is sized from the collection's counter."""
+    print("\n🧪 Testing whole-collection transfer job...")
+
+    from backend.routes import transfers
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        transfer_request = transfers.TransferJobCreateForCollection(
+            source_collection_id=data["source_collection"].id,
+            collection_id=data["target_collection"].id,
+        )
+
+        # With a threshold of one, the single source company makes a bulk job
+        with (
+            patch.object(transfers, "BULK_TRANSFER_THRESHOLD", 1),
+            patch.object(transfers.process_bulk_transfer_job, "delay") as mock_delay,
+            patch.object(transfers.process_transfer_job, "apply_async") as mock_apply,
+        ):
+            mock_delay.return_value.id = "bulk-task"
+            job = transfers.create_transfer_job_for_collection(transfer_request, db)
+        print(f"   Job: {job.total_items} items, task {job.celery_task_id}")
+
+        # Rows deselected under select all are left out on either path
+        excluding_request = transfer_request.model_copy(
+            update={"exclude_company_ids": [data["company1"].id]}
+        )
+        excluded = []
+        for threshold in (1, 10**9):
+            with (
+                patch.object(transfers, "BULK_TRANSFER_THRESHOLD", threshold),
+                patch.object(transfers.process_bulk_transfer_job, "delay") as delay,
+                patch.object(transfers.process_transfer_job, "apply_async") as apply,
+            ):
+                delay.return_value.id = apply.return_value.id = "task"
+                excluded.append(
+                    transfers.create_transfer_job_for_collection(
+                        excluding_request, db
+                    ).total_items
+                )
+        print(f"   Excluding the only company: {excluded} items")
+
+        return (
+            mock_delay.called
+            and not mock_apply.called
+            and job.total_items == 1
+            and job.pending_count == 1
+            and excluded == [0, 0]
+        )
+
+    finally:
+        db.close()
+
+
+def test_admission_control():
+    """Test that an overloaded system rejects or defers new jobs."""
+    print("\n🧪 Testing admission control...")
+
+    from fastapi import HTTPException
+
+    from backend import admission
+    from backend.routes import transfers
+    from backend.tasks import transfer_tasks
+
+    # Setup test data
+    data = setup_test_data()
+    db = data["db"]
+
+    try:
+        transfer_request = transfers.TransferJobCreate(
+            company_ids=[data["company1"].id, data["company2"].id],
+            source_collection_id=data["source_collection"].id,
+            collection_id=data["target_collection"].id,
+        )
+
+        # Any job above one item is subject to the limits, none of which fit
+        with (
+            patch.object(admission, "INTERACTIVE_MAX_ITEMS", 1),
+            patch.object(admission, "ADMISSION_MAX_ACTIVE_JOBS", 0),
+        ):
+            try:
+                transfers.create_transfer_job(transfer_request, db)
+                rejected = None
+            except HTTPException as e:
+                rejected = e
+            print(f"   Rejected: {rejected.status_code} {rejected.detail}")
+
+            with (
+                patch.object(admission, "ADMISSION_OVERLOAD_ACTION", "defer"),
+                patch.object(
+                    transfer_tasks.process_transfer_job, "apply_async"
+                ) as mock_apply,
+            ):
+                deferred = transfers.create_transfer_job(transfer_request, db)
+                usage = admission.utilization(db)
+            print(f"   Deferred: {deferred.deferred}, {usage['deferred_jobs']} waiting")
+
+        with (
+            patch.object(admission, "INTERACTIVE_MAX_ITEMS", 1),
+            patch.object(admission, "ADMISSION_MAX_ACTIVE_JOBS", 10**9),
+            patch.object(admission, "ADMISSION_MAX_OUTSTANDING_ITEMS", 10**12),
+            patch.object(admission, "ADMISSION_OVERLOAD_ACTION", "defer"),
+        ):
+            # There is room now, but a new job must not overtake the waiting one
+            behind = transfers.create_transfer_job(transfer_request, db)
+
+            # The decision holds a lock until the job it admits is committed
+            admission.check(db, 2)
+            other = SessionLocal()
+            lock_holders = other.execute(
+                text(
+                    "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND objid = :key AND granted AND pid = :pid"
+                ),
+                {
+                    "key": admission.ADMISSION_LOCK_KEY,
+                    "pid": db.execute(text("SELECT pg_backend_pid()")).scalar(),
+                },
+            ).scalar()
+            other.close()
+            db.rollback()
+        print(f"   Behind: {behind.deferred}, lock holders {lock_holders}")
+
+        # Once there is room the deferred jobs are started, oldest first
+        version_key = cache.transfer_job_version_key(deferred.job_id)
+        version_before = cache.get_cache_redis().get(version_key)
+        with (
+            patch.object(admission, "ADMISSION_MAX_ACTIVE_JOBS", 10**9),
+            patch.object(admission, "ADMISSION_MAX_OUTSTANDING_ITEMS", 10**12),
+            patch.object(
+                transfer_tasks.process_transfer_job, "apply_async"
+            ) as mock_admit,
+        ):
+            admitted = transfer_tasks.admit_deferred_jobs()
+        print(f"   Admitted: {admitted}")
+
+        job = db.get(TransferJob, deferred.job_id)
+        db.refresh(job)
+        started_job_ids = [call.args[0][0] for call in mock_admit.call_args_list]
+        # Cached job responses still saying "deferred" are invalidated
+        version_after = cache.get_cache_redis().get(version_key)
+
+        return (
+            rejected is not None
+            and rejected.status_code == 429
+            and rejected.headers["Retry-After"]
+            == str(admission.ADMISSION_RETRY_AFTER_SECONDS)
+            and deferred.deferred
+            and deferred.celery_task_id is None
+            and not mock_apply.called
+            and usage["deferred_jobs"] >= 1
+            and behind.deferred
+            and lock_holders == 1
+            and started_job_ids.index(str(job.id))
+            < started_job_ids.index(str(behind.job_id))
+            and str(job.id) in admitted["started"]
+            and job.deferred_at is None
+            and version_after != version_before
+        )
+
+    finally:
+        db.close()
+
+
 def main():
     """Run all transfer tests."""
     print("🚀 Testing Transfer Functionality")
@@ -247,6 +1089,20 @@ def main():
         ("Single Transfer", test_single_transfer),
         ("Transfer Job", test_transfer_job),
         ("Already in Collection", test_already_in_collection),
+        ("Job Counters", test_job_counters),
+        ("Unchanged Counts Settle Job", test_unchanged_counts_settle_job),
+        ("Job Status Since", test_job_status_since),
+        ("Update Item Status", test_update_item_status),
+        ("Job Events Published", test_job_events_published),
+        ("Job Items Formats", test_job_items_formats),
+        ("Companies Status ETag", test_companies_status_etag),
+        ("Missing Target Collection", test_missing_target_collection),
+        ("Cancel Job", test_cancel_job),
+        ("Cancel Skips Locked Items", test_cancel_skips_locked_items),
+        ("Retry Failed Items", test_retry_failed_items),
+        ("Failed Batch Progress", test_failed_batch_requeued_before_progress),
+        ("Collection Transfer Job", test_collection_transfer_job),
+        ("Admission Control", test_admission_control),
     ]
 
     passed = 0
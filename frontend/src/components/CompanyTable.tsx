@@ -1,7 +1,6 @@
 import { useState, useEffect, useRef } from "react";
 import { DataGrid } from "@mui/x-data-grid";
 import { getCollectionsById, toggleCompanyLike } from "../utils/jam-api";
-import { removeCompaniesFromCollection } from "../utils/transfer-api";
 import { getCompanyTableColumns } from "./CompanyTableColumns";
 import { CompanyTableComponentProps } from "../types";
 import { Collection } from "../types";
@@ -27,6 +26,8 @@ const CompanyTable = ({
   const [selectedCompanyIds, setSelectedCompanyIds] = useState<number[]>([]);
   const [refreshTrigger, setRefreshTrigger] = useState<number>(0);
   const [selectAllToggle, setSelectAllToggle] = useState<boolean>(false);
+  // Rows unchecked while select all is on; every other company stays selected
+  const [excludedCompanyIds, setExcludedCompanyIds] = useState<number[]>([]);
   const previousCollectionIdRef = useRef<string>();
 
   // Custom hooks
@@ -37,18 +38,29 @@ const CompanyTable = ({
     handleContextMenu,
     handleCloseContextMenu,
   } = useContextMenu();
-  const { isTransferring, currentJobId, initiateTransfer, resetTransfer } =
-    useTransfer(showToast, (targetCollection) => {
-      // Refresh the UI when transfers to the "Liked Companies List" complete
-      if (targetCollection.collection_name === "Liked Companies List") {
-        setRefreshTrigger((prev) => prev + 1);
-      }
-    });
+  const {
+    isTransferring,
+    currentJobId,
+    initiateTransfer,
+    initiateRemoval,
+    removeCompanies,
+    resetTransfer,
+  } = useTransfer(showToast, (targetCollection) => {
+    // Refresh the UI when transfers to the "Liked Companies List" or
+    // removals from the collection on screen complete
+    if (
+      targetCollection.collection_name === "Liked Companies List" ||
+      targetCollection.id === selectedCollectionId
+    ) {
+      setRefreshTrigger((prev) => prev + 1);
+    }
+  });
   const {
     response,
     setResponse,
     total,
     setTotal,
+    totalIsExact,
     loadTime,
     searchQuery,
     handleSearchChange,
@@ -74,6 +86,7 @@ const CompanyTable = ({
     ) {
       setSelectedCompanyIds([]);
       setSelectAllToggle(false);
+      setExcludedCompanyIds([]);
     }
 
     previousCollectionIdRef.current = selectedCollectionId;
@@ -101,12 +114,17 @@ const CompanyTable = ({
   const handleDeleteCompany = async (companyId: number) => {
     const company = response.find((c) => c.id === companyId);
     const companyName = company?.company_name || "this company";
+    const collection = collections.find((c) => c.id === selectedCollectionId);
+    if (!collection) {
+      return;
+    }
 
     try {
-      await removeCompaniesFromCollection({
-        company_ids: [companyId],
-        collection_id: selectedCollectionId,
-      });
+      const removed = await removeCompanies([companyId], collection);
+      if (!removed) {
+        // Started as a removal job, which refreshes the table when done
+        return;
+      }
 
       setResponse((prev) => prev.filter((company) => company.id !== companyId));
       setSelectedCompanyIds((prev) => prev.filter((id) => id !== companyId));
@@ -163,18 +181,21 @@ const CompanyTable = ({
     companyIds: number[],
     targetCollection: Collection,
     sourceCollectionId: string,
-    isSelectAllToggle?: boolean
+    isSelectAllToggle?: boolean,
+    excludedCompanyIds?: number[]
   ) => {
     initiateTransfer(
       companyIds,
       targetCollection,
       sourceCollectionId,
-      isSelectAllToggle
+      isSelectAllToggle,
+      excludedCompanyIds
     );
   };
 
   const handleToggleStateChange = (enabled: boolean) => {
     setSelectAllToggle(enabled);
+    setExcludedCompanyIds([]);
     if (!enabled) {
       // Clear selection when toggle is disabled
       setSelectedCompanyIds([]);
@@ -197,10 +218,14 @@ const CompanyTable = ({
         collections={collections}
         currentCollectionId={currentCollectionId}
         initiateTransfer={handleInitiateTransfer}
+        initiateRemoval={initiateRemoval}
+        removeCompanies={removeCompanies}
+        excludedCompanyIds={excludedCompanyIds}
         onDeselectAll={onDeselectAll}
         onSelectAll={onSelectAll}
         onClearSelection={onDeselectAll}
         total={total}
+        totalIsExact={totalIsExact}
         loadTime={loadTime}
         searchQuery={searchQuery}
         onSearchChange={handleSearchChange}
@@ -221,14 +246,21 @@ const CompanyTable = ({
             rowCount={total}
             pagination
             checkboxSelection
-            disableRowSelectionOnClick={selectAllToggle}
             onRowSelectionModelChange={(newSelection) => {
-              // Don't allow selection changes when toggle is enabled
-              if (selectAllToggle) return;
-
               const newIds = (newSelection as (number | string)[]).map(Number);
               const currentPageIds = response.map((company) => company.id);
 
+              if (selectAllToggle) {
+                // Under select all, track the rows unchecked on this page
+                setExcludedCompanyIds([
+                  ...excludedCompanyIds.filter(
+                    (id) => !currentPageIds.includes(id)
+                  ),
+                  ...currentPageIds.filter((id) => !newIds.includes(id)),
+                ]);
+                return;
+              }
+
               // Remove current page IDs from existing selection
               const selectionWithoutCurrentPage = selectedCompanyIds.filter(
                 (id) => !currentPageIds.includes(id)
@@ -244,7 +276,9 @@ const CompanyTable = ({
             }}
             rowSelectionModel={
               selectAllToggle
-                ? []
+                ? response
+                    .map((company) => company.id)
+                    .filter((id) => !excludedCompanyIds.includes(id))
                 : selectedCompanyIds.filter((id) =>
                     response.some((company) => company.id === id)
                   )
@@ -331,13 +365,6 @@ const CompanyTable = ({
               "& .MuiDataGrid-columnSeparator": {
                 display: "none !important",
               },
-              // Disable checkboxes when toggle is enabled
-              ...(selectAllToggle && {
-                "& .MuiDataGrid-checkboxInput": {
-                  opacity: 0.5,
-                  pointerEvents: "none",
-                },
-              }),
             }}
             hideFooter={true}
             hideFooterPagination={true}
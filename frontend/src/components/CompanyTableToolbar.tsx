@@ -10,11 +10,12 @@ import { CompanyTableToolbarComponentProps } from "../types";
 import ModernButton from "./ui/ModernButton";
 import SearchBar from "./ui/SearchBar";
 import ManageCollectionsPopover from "./ManageCollectionsPopover";
-import { removeCompaniesFromCollection } from "../utils/transfer-api";
 import KeyboardArrowDownIcon from "@mui/icons-material/KeyboardArrowDown";
 
-function formatResultsCount(count: number | undefined) {
+function formatResultsCount(count: number | undefined, isExact = true) {
   if (!count) return "";
+  // An inexact total is the search cap: at least this many match
+  if (!isExact) return `${count.toLocaleString()}+ results`;
   if (count >= 1000) {
     const thousands = count / 1000;
     return `${
@@ -37,10 +38,14 @@ const CompanyTableToolbar = ({
   collections,
   currentCollectionId,
   initiateTransfer,
+  initiateRemoval,
+  removeCompanies,
+  excludedCompanyIds,
   onDeselectAll,
   onClearSelection,
   onRefresh,
   total,
+  totalIsExact,
   loadTime,
   searchQuery,
   onSearchChange,
@@ -50,6 +55,7 @@ const CompanyTableToolbar = ({
   const [manageCollectionsAnchorEl, setManageCollectionsAnchorEl] =
     useState<null | HTMLElement>(null);
   const manageCollectionsOpen = Boolean(manageCollectionsAnchorEl);
+  const selectAllCount = Math.max((total ?? 0) - excludedCompanyIds.length, 0);
 
   const handleManageCollectionsOpen = (
     event: React.MouseEvent<HTMLButtonElement>
@@ -80,21 +86,46 @@ const CompanyTableToolbar = ({
             selectedCompanyIds,
             targetCollection,
             isAllCompaniesView ? "all-companies" : currentCollectionId,
-            selectAllToggle
+            selectAllToggle,
+            excludedCompanyIds
           );
         }
       } else if (update.action === "remove" && !isAllCompaniesView) {
         // Only allow remove operations when not in "All Companies" view
-        await removeCompaniesFromCollection({
-          company_ids: selectedCompanyIds,
-          collection_id: update.collectionId,
-        });
+        const collection = collections.find(
+          (c) => c.id === update.collectionId
+        );
+        if (
+          collection &&
+          selectAllToggle &&
+          update.collectionId === currentCollectionId
+        ) {
+          // "Select all" covers every company of the current view, which the
+          // server matches itself and removes in the background
+          await initiateRemoval(
+            {
+              collection_id: update.collectionId,
+              all_matching: true,
+              search: searchQuery || undefined,
+              exclude_company_ids: excludedCompanyIds,
+            },
+            collection
+          );
+          onClearSelection();
+          continue;
+        }
+
+        if (!collection) {
+          continue;
+        }
+        const removed = await removeCompanies(selectedCompanyIds, collection);
 
         // Clear selection after successful remove
         onClearSelection();
 
-        // Refresh the UI after remove operation
-        if (onRefresh) {
+        // Refresh the UI after remove operation; a removal job refreshes it
+        // once it finishes
+        if (removed && onRefresh) {
           onRefresh();
         }
       }
@@ -162,7 +193,7 @@ const CompanyTableToolbar = ({
               }}
             >
               {selectAllToggle
-                ? `${total} selected`
+                ? `${selectAllCount} selected`
                 : `${selectedCount} selected`}
             </Typography>
 
@@ -259,7 +290,7 @@ const CompanyTableToolbar = ({
           color="text.secondary"
           sx={{ fontWeight: "bold" }}
         >
-          {formatResultsCount(total)}
+          {formatResultsCount(total, totalIsExact)}
           {loadTime && (
             <span
               style={{ fontSize: "0.75rem", opacity: 0.7, marginLeft: "4px" }}
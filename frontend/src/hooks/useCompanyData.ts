@@ -1,8 +1,16 @@
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 import { Company } from "../types";
 import { getCollectionsById } from "../utils/jam-api";
 import { useSearch } from "../utils/useApi";
 
+interface FetchedPage {
+  key: string;
+  page: number;
+  cursor?: string;
+  nextCursor?: string | null;
+  prevCursor?: string | null;
+}
+
 export const useCompanyData = (
   selectedCollectionId: string,
   currentPage: number,
@@ -12,6 +20,10 @@ export const useCompanyData = (
 ) => {
   const [response, setResponse] = useState<Company[]>([]);
   const [total, setTotal] = useState<number>();
+  const [totalIsExact, setTotalIsExact] = useState<boolean>(true);
+  // Cursors of the page on screen, so stepping to a neighbouring page seeks
+  // instead of making the server skip `offset` rows
+  const lastPageRef = useRef<FetchedPage | null>(null);
   const [loadTime, setLoadTime] = useState<number | null>(null);
 
   // Search functionality
@@ -33,22 +45,53 @@ export const useCompanyData = (
 
   const fetchData = useCallback(async () => {
     const startTime = performance.now();
+    const key = `${selectedCollectionId}|${currentPageSize}|${
+      debouncedSearchQuery ?? ""
+    }`;
+    const last = lastPageRef.current;
+    let cursor: string | undefined;
+    if (last && last.key === key) {
+      if (currentPage === last.page + 1) {
+        cursor = last.nextCursor ?? undefined;
+      } else if (currentPage === last.page - 1) {
+        cursor = last.prevCursor ?? undefined;
+      } else if (currentPage === last.page) {
+        // A refresh re-reads the same page the same way
+        cursor = last.cursor;
+      }
+    }
+
     try {
       const newResponse = await getCollectionsById(
         selectedCollectionId,
         offset,
         currentPageSize,
-        debouncedSearchQuery
+        debouncedSearchQuery,
+        cursor
       );
       const endTime = performance.now();
       const duration = endTime - startTime;
       setLoadTime(duration);
       setResponse(newResponse.companies);
       setTotal(newResponse.total);
+      setTotalIsExact(newResponse.total_is_exact ?? true);
+      lastPageRef.current = {
+        key,
+        page: currentPage,
+        cursor,
+        nextCursor: newResponse.next_cursor,
+        prevCursor: newResponse.prev_cursor,
+      };
     } catch (error) {
       console.error("Error fetching data:", error);
     }
-  }, [selectedCollectionId, offset, currentPageSize, debouncedSearchQuery]);
+  }, [
+    selectedCollectionId,
+    currentPage,
+    offset,
+    currentPageSize,
+    debouncedSearchQuery,
+  ]);
 
   useEffect(() => {
     fetchData();
@@ -70,6 +113,7 @@ export const useCompanyData = (
     setResponse,
     total,
     setTotal,
+    totalIsExact,
     loadTime,
     searchQuery,
     debouncedSearchQuery,
@@ -2,7 +2,10 @@ import { useState, useEffect } from "react";
 import { RowStatus, RowStatuses, Company } from "../types";
 import {
   getCompaniesTransferStatus,
-  getTransferJobStatus,
+  getTransferJobChanges,
+  getTransferJobEventsUrl,
+  TransferJobItemsEvent,
+  TransferJobSnapshotEvent,
 } from "../utils/transfer-api";
 
 const createRowStatuses = (): RowStatuses => ({});
@@ -65,36 +68,109 @@ export const useRowStatus = (
   useEffect(() => {
     if (!currentJobId || !isTransferring) return;
 
-    const pollInterval = setInterval(async () => {
-      try {
-        const jobStatus = await getTransferJobStatus(currentJobId);
+    let pollInterval: ReturnType<typeof setInterval> | undefined;
+    let activeStatuses: RowStatuses = {};
 
-        const newStatuses: RowStatuses = {};
-        let hasActiveTransfers = false;
-
-        jobStatus.items.forEach((item) => {
-          if (item.status === "pending" || item.status === "processing") {
-            newStatuses[item.company_id] = item.status as RowStatus;
-            hasActiveTransfers = true;
+    const finish = () => {
+      setRowStatuses({});
+      if (resetTransfer) {
+        resetTransfer();
+      }
+    };
+
+    // Fallback when the event stream can't be opened: poll for changed items
+    const startPolling = () => {
+      // Seeded by the first poll's status response, so it never downloads
+      // every item of the job
+      let since: number | undefined;
+
+      pollInterval = setInterval(async () => {
+        try {
+          const changes = await getTransferJobChanges(currentJobId, since);
+          if (typeof changes.next_since === "number") {
+            since = changes.next_since;
           }
-        });
 
-        setRowStatuses(newStatuses);
-
-        // If no active transfers remain, reset the transfer state
-        if (!hasActiveTransfers && resetTransfer) {
-          resetTransfer();
+          const statuses: Record<string, number[]> = {};
+          changes.items.forEach((item) => {
+            statuses[item.status] = [
+              ...(statuses[item.status] || []),
+              item.company_id,
+            ];
+          });
+          applyStatuses(statuses);
+
+          // If no active transfers remain, reset the transfer state; errors
+          // of an unfinished job are about to be retried
+          if (
+            changes.pending_count + changes.processing_count === 0 &&
+            (changes.finished_at || changes.error_count === 0)
+          ) {
+            clearInterval(pollInterval);
+            finish();
+          }
+        } catch (error) {
+          console.error("Failed to poll job status:", error);
+          clearInterval(pollInterval);
+          // If there's an error, also reset the transfer state
+          if (resetTransfer) {
+            resetTransfer();
+          }
         }
-      } catch (error) {
-        console.error("Failed to poll job status:", error);
-        // If there's an error, also reset the transfer state
-        if (resetTransfer) {
-          resetTransfer();
+      }, 2000);
+    };
+
+    const applyStatuses = (statuses: Record<string, number[]>) => {
+      const next = { ...activeStatuses };
+      for (const [status, companyIds] of Object.entries(statuses)) {
+        for (const companyId of companyIds) {
+          if (status === "pending" || status === "processing") {
+            next[companyId] = status as RowStatus;
+          } else {
+            delete next[companyId];
+          }
         }
       }
-    }, 2000);
+      activeStatuses = next;
+      setRowStatuses(next);
+    };
+
+    const events = new EventSource(getTransferJobEventsUrl(currentJobId));
+
+    events.addEventListener("snapshot", (event) => {
+      const snapshot: TransferJobSnapshotEvent = JSON.parse(
+        (event as MessageEvent).data
+      );
+      activeStatuses = {};
+      applyStatuses(snapshot.active_items);
+    });
+
+    events.addEventListener("items", (event) => {
+      const update: TransferJobItemsEvent = JSON.parse(
+        (event as MessageEvent).data
+      );
+      applyStatuses(update.statuses);
+    });
+
+    events.addEventListener("done", () => {
+      events.close();
+      finish();
+    });
+
+    events.onerror = () => {
+      // EventSource retries dropped streams itself; it only gives up when
+      // the endpoint refuses the stream
+      if (events.readyState === EventSource.CLOSED && !pollInterval) {
+        startPolling();
+      }
+    };
 
-    return () => clearInterval(pollInterval);
+    return () => {
+      events.close();
+      if (pollInterval) {
+        clearInterval(pollInterval);
+      }
+    };
   }, [currentJobId, isTransferring, resetTransfer]);
 
   const updateStatus = (rowId: number, status: RowStatus) => {
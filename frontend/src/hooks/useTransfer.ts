@@ -1,8 +1,15 @@
 import { useState } from "react";
 import { Collection } from "../types";
 import {
+  INTERACTIVE_MAX_ITEMS,
+  RemoveCompaniesRequest,
+  RemoveCompaniesResponse,
+  TransferBusyError,
+  TransferJobResponse,
+  createRemovalJob,
   createTransferJob,
   createTransferJobForCollection,
+  removeCompaniesFromCollection,
 } from "../utils/transfer-api";
 
 export const useTransfer = (
@@ -14,11 +21,29 @@ export const useTransfer = (
   const [lastTransferTarget, setLastTransferTarget] =
     useState<Collection | null>(null);
 
+  const notifyDeferred = (job: TransferJobResponse) => {
+    if (job.deferred) {
+      showToast("Transfers are busy, this job will start shortly", "info");
+    }
+  };
+
+  const notifyBusy = (error: unknown, fallback: string) => {
+    if (error instanceof TransferBusyError) {
+      const wait = error.retryAfterSeconds
+        ? ` Try again in ${error.retryAfterSeconds} seconds.`
+        : "";
+      showToast(`Transfers are busy.${wait}`, "info");
+    } else {
+      showToast(fallback, "error");
+    }
+  };
+
   const initiateTransfer = async (
     companyIds: number[],
     targetCollection: Collection,
     sourceCollectionId: string,
-    isSelectAllToggle?: boolean
+    isSelectAllToggle?: boolean,
+    excludedCompanyIds?: number[]
   ) => {
     setIsTransferring(true);
     setLastTransferTarget(targetCollection);
@@ -31,6 +56,7 @@ export const useTransfer = (
         transferJob = await createTransferJobForCollection({
           source_collection_id: sourceCollectionId,
           collection_id: targetCollection.id,
+          exclude_company_ids: excludedCompanyIds,
         });
       } else {
         // Use regular transfer with selected company IDs
@@ -41,12 +67,52 @@ export const useTransfer = (
       }
 
       setCurrentJobId(transferJob.job_id);
+      notifyDeferred(transferJob);
     } catch (error) {
       console.error("Failed to initiate transfer:", error);
       setIsTransferring(false);
       setLastTransferTarget(null);
-      showToast("Failed to initiate transfer", "error");
+      notifyBusy(error, "Failed to initiate transfer");
+    }
+  };
+
+  // Removals run as jobs too, so they share the progress and completion flow
+  const initiateRemoval = async (
+    removeRequest: RemoveCompaniesRequest,
+    collection: Collection
+  ) => {
+    setIsTransferring(true);
+    setLastTransferTarget(collection);
+
+    try {
+      const removalJob = await createRemovalJob(removeRequest);
+      setCurrentJobId(removalJob.job_id);
+      notifyDeferred(removalJob);
+    } catch (error) {
+      console.error("Failed to initiate removal:", error);
+      setIsTransferring(false);
+      setLastTransferTarget(null);
+      notifyBusy(error, "Failed to remove companies");
+    }
+  };
+
+  // Removes listed companies in the request while they are few enough, and
+  // as a removal job otherwise; resolves to null when a job was started
+  const removeCompanies = async (
+    companyIds: number[],
+    collection: Collection
+  ): Promise<RemoveCompaniesResponse | null> => {
+    if (companyIds.length > INTERACTIVE_MAX_ITEMS) {
+      await initiateRemoval(
+        { company_ids: companyIds, collection_id: collection.id },
+        collection
+      );
+      return null;
     }
+    return removeCompaniesFromCollection({
+      company_ids: companyIds,
+      collection_id: collection.id,
+    });
   };
 
   const resetTransfer = () => {
@@ -66,6 +132,8 @@ export const useTransfer = (
     currentJobId,
     lastTransferTarget,
     initiateTransfer,
+    initiateRemoval,
+    removeCompanies,
     resetTransfer,
   };
 };
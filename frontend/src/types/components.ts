@@ -1,4 +1,8 @@
 import { Collection } from "./models";
+import {
+  RemoveCompaniesRequest,
+  RemoveCompaniesResponse,
+} from "../utils/transfer-api";
 
 export interface SidebarComponentProps {
   collections: Collection[];
@@ -27,13 +31,26 @@ export interface CompanyTableToolbarComponentProps {
     companyIds: number[],
     targetCollection: Collection,
     sourceCollectionId: string,
-    isSelectAllToggle?: boolean
+    isSelectAllToggle?: boolean,
+    excludedCompanyIds?: number[]
   ) => void;
+  initiateRemoval: (
+    removeRequest: RemoveCompaniesRequest,
+    collection: Collection
+  ) => void;
+  removeCompanies: (
+    companyIds: number[],
+    collection: Collection
+  ) => Promise<RemoveCompaniesResponse | null>;
+  // Rows unchecked while select all is on
+  excludedCompanyIds: number[];
   onSelectAll: () => Promise<void>;
   onDeselectAll: () => void;
   onClearSelection: () => void;
   onRefresh?: () => void;
   total?: number;
+  // False when total is only a lower bound (the search count cap)
+  totalIsExact?: boolean;
   loadTime?: number | null;
   searchQuery: string;
   onSearchChange: (query: string) => void;
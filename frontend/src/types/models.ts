@@ -11,6 +11,10 @@ const CollectionSchema = z.object({
   collection_name: z.string(),
   companies: z.array(CompanySchema),
   total: z.number(),
+  // False when total is an estimate for a large search
+  total_is_exact: z.boolean().optional(),
+  next_cursor: z.string().nullish(),
+  prev_cursor: z.string().nullish(),
 });
 
 const CompanyBatchResponseSchema = z.object({
@@ -25,7 +25,9 @@ export async function getCollectionsById(
   id: string,
   offset?: number,
   limit?: number,
-  search?: string
+  search?: string,
+  // Keyset cursor from an adjacent page; the server ignores offset with it
+  cursor?: string
 ): Promise<Collection> {
   try {
     // Handle the special "all-companies" case
@@ -35,6 +37,7 @@ export async function getCollectionsById(
         offset,
         limit,
         search,
+        cursor,
       },
     });
     return response.data;
@@ -106,7 +109,9 @@ export const createTransferJob = async (
 export const getTransferJobStatus = async (
   jobId: string
 ): Promise<TransferJobResponse> => {
-  const response = await fetch(`${BASE_URL}/transfers/jobs/${jobId}`);
+  const response = await fetch(
+    `${BASE_URL}/transfers/jobs/${jobId}?include_items=true`
+  );
 
   if (!response.ok) {
     throw new Error(
@@ -1,19 +1,32 @@
 const API_BASE_URL = "http://localhost:8000";
 
+// Mirrors TRANSFER_INTERACTIVE_MAX_ITEMS on the server: removing more companies
+// than this runs as a background job instead of inside the request
+export const INTERACTIVE_MAX_ITEMS = 1000;
+
 export interface TransferJobCreate {
   company_ids: number[];
   source_collection_id?: string;
   collection_id: string;
+  // Batches per scheduler round against other running jobs
+  weight?: number;
 }
 
 export interface TransferJobCreateForCollection {
   source_collection_id: string;
   collection_id: string;
+  weight?: number;
+  // Companies to leave out, e.g. rows deselected under select all
+  exclude_company_ids?: number[];
 }
 
 export interface RemoveCompaniesRequest {
-  company_ids: number[];
+  company_ids?: number[];
   collection_id: string;
+  // Remove every company of the collection matching `search` instead
+  all_matching?: boolean;
+  search?: string;
+  exclude_company_ids?: number[];
 }
 
 export interface RemoveCompaniesResponse {
@@ -32,11 +45,13 @@ export interface TransferJobItemResponse {
   created_at: string;
   last_attempt_at?: string;
   attempt_count: number;
+  max_attempts: number;
   is_cancelled: boolean;
 }
 
 export interface TransferJobResponse {
   job_id: string;
+  job_type?: "transfer" | "removal";
   items: TransferJobItemResponse[];
   total_items: number;
   pending_count: number;
@@ -44,8 +59,37 @@ export interface TransferJobResponse {
   success_count: number;
   error_count: number;
   cancelled_count: number;
+  dead_letter_count: number;
+  finished_at?: string | null;
+  // Held back by admission control until the workers have room
+  deferred?: boolean;
+  // Change cursor: pass back as `since` for only the items changed after it
+  next_since?: number;
 }
 
+// Admission control turned the job away (429); try again after `retryAfterSeconds`
+export class TransferBusyError extends Error {
+  retryAfterSeconds: number | null;
+
+  constructor(message: string, retryAfterSeconds: number | null) {
+    super(message);
+    this.name = "TransferBusyError";
+    this.retryAfterSeconds = retryAfterSeconds;
+  }
+}
+
+const throwIfBusy = async (response: Response) => {
+  if (response.status !== 429) {
+    return;
+  }
+  const retryAfter = Number(response.headers.get("Retry-After"));
+  const { detail } = await response.json().catch(() => ({ detail: undefined }));
+  throw new TransferBusyError(
+    detail ?? "Transfers are at capacity",
+    Number.isFinite(retryAfter) && retryAfter > 0 ? retryAfter : null
+  );
+};
+
 export interface CeleryTaskStatus {
   state: string;
   current: number;
@@ -65,6 +109,7 @@ export const createTransferJob = async (
     body: JSON.stringify(transferRequest),
   });
 
+  await throwIfBusy(response);
   if (!response.ok) {
     throw new Error(`Failed to create transfer job: ${response.statusText}`);
   }
@@ -83,6 +128,7 @@ export const createTransferJobForCollection = async (
     body: JSON.stringify(transferRequest),
   });
 
+  await throwIfBusy(response);
   if (!response.ok) {
     throw new Error(
       `Failed to create transfer job for collection: ${response.statusText}`
@@ -110,10 +156,31 @@ export const removeCompaniesFromCollection = async (
   return response.json();
 };
 
+export const createRemovalJob = async (
+  removeRequest: RemoveCompaniesRequest
+): Promise<TransferJobResponse> => {
+  const response = await fetch(`${API_BASE_URL}/transfers/jobs/removal`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(removeRequest),
+  });
+
+  await throwIfBusy(response);
+  if (!response.ok) {
+    throw new Error(`Failed to create removal job: ${response.statusText}`);
+  }
+
+  return response.json();
+};
+
 export const getTransferJobStatus = async (
   jobId: string
 ): Promise<TransferJobResponse> => {
-  const response = await fetch(`${API_BASE_URL}/transfers/jobs/${jobId}`);
+  const response = await fetch(
+    `${API_BASE_URL}/transfers/jobs/${jobId}?include_items=true`
+  );
 
   if (!response.ok) {
     throw new Error(
@@ -124,6 +191,42 @@ export const getTransferJobStatus = async (
   return response.json();
 };
 
+export type TransferJobCounters = Omit<TransferJobResponse, "job_id" | "items">;
+
+export interface TransferJobSnapshotEvent {
+  job: TransferJobCounters & { job_id: string };
+  active_items: Record<string, number[]>;
+}
+
+export interface TransferJobItemsEvent {
+  statuses: Record<string, number[]>;
+}
+
+// Server-Sent Events: "snapshot", then "items" / "counters" as batches commit,
+// and "done" once nothing is pending or processing
+export const getTransferJobEventsUrl = (jobId: string): string =>
+  `${API_BASE_URL}/transfers/jobs/${jobId}/events`;
+
+// Only the items changed after `since` (a previous response's next_since);
+// without it, just the counters and a cursor to start from
+export const getTransferJobChanges = async (
+  jobId: string,
+  since?: number
+): Promise<TransferJobResponse> => {
+  const query = since === undefined ? "" : `?since=${since}`;
+  const response = await fetch(
+    `${API_BASE_URL}/transfers/jobs/${jobId}${query}`
+  );
+
+  if (!response.ok) {
+    throw new Error(
+      `Failed to get transfer job changes: ${response.statusText}`
+    );
+  }
+
+  return response.json();
+};
+
 export const updateTransferItemStatus = async (
   jobId: string,
   itemId: string,
@@ -164,24 +267,50 @@ export const getCompanyTransferStatus = async (
   return response.json();
 };
 
+// Browsers don't cache POST responses, so keep the last one per request body
+// and revalidate it with If-None-Match
+const MAX_CACHED_STATUS_RESPONSES = 50;
+const companiesStatusCache = new Map<
+  string,
+  { etag: string; data: Record<number, TransferJobItemResponse[]> }
+>();
+
 export const getCompaniesTransferStatus = async (
   companyIds: number[]
 ): Promise<Record<number, TransferJobItemResponse[]>> => {
+  const body = JSON.stringify(companyIds);
+  const cached = companiesStatusCache.get(body);
+
   const response = await fetch(`${API_BASE_URL}/transfers/companies/status`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
+      ...(cached ? { "If-None-Match": cached.etag } : {}),
     },
-    body: JSON.stringify(companyIds),
+    body,
   });
 
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+
   if (!response.ok) {
     throw new Error(
       `Failed to get companies transfer status: ${response.statusText}`
     );
   }
 
-  return response.json();
+  const data = await response.json();
+  const etag = response.headers.get("ETag");
+  companiesStatusCache.delete(body);
+  if (etag) {
+    if (companiesStatusCache.size >= MAX_CACHED_STATUS_RESPONSES) {
+      companiesStatusCache.delete(companiesStatusCache.keys().next().value!);
+    }
+    companiesStatusCache.set(body, { etag, data });
+  }
+
+  return data;
 };
 
 export const cancelTransferJob = async (jobId: string): Promise<void> => {